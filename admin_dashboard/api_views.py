@@ -17,6 +17,7 @@ from users.models import User
 from products.models import Product, Category
 from orders.models import Order
 from payments.models import Payment
+from currencies.services import CurrencyConverter
 
 
 class MobileAdminStatsAPI(APIView):
@@ -27,10 +28,11 @@ class MobileAdminStatsAPI(APIView):
         # Today's stats
         today = timezone.now().date()
         today_orders = Order.objects.filter(created_at__date=today).count()
-        today_revenue = Order.objects.filter(
+        converter = CurrencyConverter()
+        today_revenue = converter.total(Order.objects.filter(
             created_at__date=today,
             payment_status='paid'
-        ).aggregate(total=Sum('grand_total'))['total'] or 0
+        ))
 
         # Quick stats
         stats = {
@@ -40,9 +42,8 @@ class MobileAdminStatsAPI(APIView):
             },
             'overall': {
                 'total_orders': Order.objects.count(),
-                'total_revenue': float(Order.objects.filter(payment_status='paid').aggregate(
-                    total=Sum('grand_total')
-                )['total'] or 0),
+                'total_revenue': float(converter.total(
+                    Order.objects.filter(payment_status='paid'))),
                 'pending_orders': Order.objects.filter(status='pending').count(),
                 'total_customers': User.objects.filter(role='customer').count(),
             }
@@ -60,7 +61,7 @@ class MobileOrderListAPI(APIView):
         page = int(request.GET.get('page', 1))
         page_size = 20
 
-        queryset = Order.objects.all().select_related('user').prefetch_related('items')
+        queryset = Order.objects.all().select_related('user').with_summary()
 
         if status_filter:
             queryset = queryset.filter(status=status_filter)
@@ -71,7 +72,8 @@ class MobileOrderListAPI(APIView):
         end_idx = start_idx + page_size
 
         orders = queryset.order_by('-created_at')[start_idx:end_idx]
-        serializer = OrderManagementSerializer(orders, many=True)
+        serializer = OrderManagementSerializer(
+            orders, many=True, context={'request': request})
 
         return Response({
             'orders': serializer.data,
@@ -115,24 +117,21 @@ class MobileQuickActionsAPI(APIView):
         return Response({'error': 'Invalid action'}, status=400)
 
     def update_order_status(self, order_id, new_status):
-        from orders.models import Order, OrderStatusHistory
+        from orders.services import OrderTransitionService, OrderTransitionError
         try:
             order = Order.objects.get(id=order_id)
-            old_status = order.status
-            order.status = new_status
-            order.save()
-
-            OrderStatusHistory.objects.create(
-                order=order,
-                old_status=old_status,
-                new_status=new_status,
-                note='Status updated via mobile admin',
-                created_by=self.request.user
+            OrderTransitionService().transition(
+                order,
+                new_status,
+                user=self.request.user,
+                note='Status updated via mobile admin'
             )
 
             return Response({'success': True, 'message': 'Order status updated'})
         except Order.DoesNotExist:
             return Response({'error': 'Order not found'}, status=404)
+        except OrderTransitionError as e:
+            return Response({'error': str(e)}, status=400)
 
     def verify_user(self, user_id):
         try:
@@ -3,7 +3,8 @@ from django.db.models import Sum
 from users.models import User
 from products.models import Product, Category
 from orders.models import Order, OrderItem, OrderStatusHistory
-from payments.models import Payment
+from payments.models import Payment, Refund
+from orders.serializers import order_thumbnail_url
 
 
 class UserManagementSerializer(serializers.ModelSerializer):
@@ -144,21 +145,27 @@ class OrderManagementSerializer(serializers.ModelSerializer):
     customer_name = serializers.SerializerMethodField()
     customer_email = serializers.CharField(source='user.email', read_only=True)
     item_count = serializers.SerializerMethodField()
+    thumbnail = serializers.SerializerMethodField()
 
     class Meta:
         model = Order
         fields = [
             'id', 'order_number', 'user', 'customer_name', 'customer_email',
             'status', 'payment_status', 'payment_method', 'grand_total',
-            'created_at', 'updated_at', 'item_count'
+            'currency', 'created_at', 'updated_at', 'item_count', 'thumbnail'
         ]
 
     def get_customer_name(self, obj):
         return f"{obj.user.first_name} {obj.user.last_name}".strip() or obj.user.username
 
     def get_item_count(self, obj):
+        if hasattr(obj, 'items_count'):
+            return obj.items_count
         return obj.items.count()
 
+    def get_thumbnail(self, obj):
+        return order_thumbnail_url(obj, self.context.get('request'))
+
 # ADD THESE MISSING SERIALIZERS:
 
 
@@ -192,7 +199,7 @@ class OrderDetailManagementSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'order_number', 'user', 'customer_name', 'customer_email',
             'status', 'payment_status', 'payment_method', 'subtotal',
-            'shipping_cost', 'tax_amount', 'grand_total', 'items',
+            'shipping_cost', 'tax_amount', 'grand_total', 'currency', 'items',
             'shipping_address', 'billing_address', 'status_history',
             'created_at', 'updated_at'
         ]
@@ -201,20 +208,40 @@ class OrderDetailManagementSerializer(serializers.ModelSerializer):
         return f"{obj.user.first_name} {obj.user.last_name}".strip() or obj.user.username
 
 
+class PaymentRefundSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Refund
+        fields = ['refund_id', 'amount', 'status', 'created_at']
+
+
 class PaymentManagementSerializer(serializers.ModelSerializer):
+    """List row; expects ``Payment.objects.for_listing()``"""
     order_number = serializers.CharField(
         source='order.order_number', read_only=True)
     customer_email = serializers.CharField(
-        source='order.user.email', read_only=True)
+        source='user.email', read_only=True)
+    refunds = PaymentRefundSummarySerializer(many=True, read_only=True)
+    gateway_transaction = serializers.SerializerMethodField()
 
     class Meta:
         model = Payment
         fields = [
             'id', 'order', 'order_number', 'customer_email', 'payment_method',
-            'amount', 'status', 'transaction_id', 'gateway_response',
-            'created_at', 'updated_at'
+            'amount', 'currency', 'status', 'gateway_payment_id',
+            'gateway_transaction', 'refunds', 'created_at', 'updated_at'
         ]
 
+    def get_gateway_transaction(self, obj):
+        for related in ('cbe_transaction', 'telebirr_transaction'):
+            transaction = getattr(obj, related, None)
+            if transaction is not None:
+                return {
+                    'transaction_id': transaction.transaction_id,
+                    'status': transaction.status,
+                    'callback_received': transaction.callback_received,
+                }
+        return None
+
 
 class AnalyticsSerializer(serializers.Serializer):
     period = serializers.CharField()
@@ -1,21 +1,56 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.db.models import Sum
-from orders.models import Order, OrderItem
+from currencies.services import CurrencyConverter
+from orders.models import ArchivedOrder, Order, OrderItem
+from orders.signals import orders_transitioned
+from payments.models import Payment
+from payments.signals import payment_status_changed
 from products.models import Product
 from users.models import User
+from notifications.services import side_effects
 from .models import AdminNotification, DashboardStats
 
 
 @receiver(post_save, sender=Order)
 def create_order_notification(sender, instance, created, **kwargs):
     if created:
-        AdminNotification.objects.create(
-            title='New Order Received',
-            message=f'New order #{instance.order_number} has been placed',
-            notification_type='order',
-            related_object_id=instance.id
+        side_effects.defer(
+            ('admin_order_notification', instance.pk),
+            notify_new_order, instance.pk, instance.order_number
+        )
+
+
+def notify_new_order(order_id, order_number):
+    AdminNotification.objects.create(
+        title='New Order Received',
+        message=f'New order #{order_number} has been placed',
+        notification_type='order',
+        related_object_id=order_id
+    )
+
+
+@receiver(payment_status_changed)
+def create_payment_failure_notification(sender, payment_ids, new_status, **kwargs):
+    if new_status == 'failed':
+        side_effects.defer(
+            ('admin_payment_notification', frozenset(payment_ids)),
+            notify_failed_payments, list(payment_ids)
+        )
+
+
+def notify_failed_payments(payment_ids):
+    payments = Payment.objects.filter(
+        pk__in=payment_ids, status='failed', order__isnull=False
+    ).select_related('order')
+    AdminNotification.objects.bulk_create([
+        AdminNotification(
+            title='Payment Issue',
+            message=f'Payment for order #{payment.order.order_number} has failed',
+            notification_type='payment',
+            related_object_id=payment.pk
         )
+        for payment in payments
+    ])
 
 
 @receiver(post_save, sender=User)
@@ -42,10 +77,16 @@ def check_low_stock(sender, instance, **kwargs):
 
 @receiver(post_save, sender=Order)
 @receiver(post_delete, sender=Order)
+@receiver(orders_transitioned)
+@receiver(payment_status_changed)
 @receiver(post_save, sender=User)
 @receiver(post_delete, sender=User)
 def update_dashboard_stats(sender, **kwargs):
-    """Update dashboard statistics when relevant models change"""
+    """Update dashboard statistics once per transaction that changes them"""
+    side_effects.defer(('dashboard_stats',), refresh_dashboard_stats)
+
+
+def refresh_dashboard_stats():
     from django.utils import timezone
     from datetime import date
 
@@ -55,10 +96,13 @@ def update_dashboard_stats(sender, **kwargs):
     stats, created = DashboardStats.objects.get_or_create(date=today)
 
     # Update stats
-    stats.total_orders = Order.objects.count()
-    stats.total_revenue = Order.objects.filter(payment_status='paid').aggregate(
-        total=Sum('grand_total')
-    )['total'] or 0
+    # Archived orders still count towards the all-time totals
+    stats.total_orders = Order.objects.count() + ArchivedOrder.objects.count()
+    converter = CurrencyConverter()
+    stats.total_revenue = sum(
+        converter.total(model.objects.filter(payment_status='paid'))
+        for model in (Order, ArchivedOrder)
+    )
     stats.total_customers = User.objects.filter(role='customer').count()
     stats.total_products = Product.objects.count()
     stats.pending_orders = Order.objects.filter(status='pending').count()
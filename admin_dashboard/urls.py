@@ -63,6 +63,12 @@ urlpatterns = [
          name='api-products-export'),
 
     # Payment management URLs
+    path('api/payments/', views.PaymentManagementAPI.as_view(),
+         name='api-payments'),
+    path('api/payments/stats/', views.PaymentStatsAPI.as_view(),
+         name='api-payments-stats'),
+    path('api/payments/gateways/', views.GatewayMetricsAPI.as_view(),
+         name='api-payments-gateways'),
     path('api/orders/<int:order_id>/payments/',
          views.get_order_payments, name='get-order-payments'),
     path('api/payments/<int:payment_id>/verify/',
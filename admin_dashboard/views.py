@@ -20,6 +20,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.db.models import Count, Sum, Avg, Q, F
+from django.db.models.functions import TruncDate
 from django.utils import timezone
 from .models import DashboardStats, AdminNotification
 import json
@@ -27,9 +28,13 @@ import json
 from .models import DashboardStats, AdminNotification
 from users.models import User
 from products.models import Product, Category, Brand
-from orders.models import Order, OrderStatusHistory
+from orders.models import Order, OrderSearchDocument, OrderStatusHistory
+from orders.serializers import order_thumbnail_url
+from orders.services import OrderTransitionService, OrderTransitionError
+from payments.gateways import gateway_metrics
 from payments.models import Payment
 from reviews.models import Review
+from currencies.services import CurrencyConverter
 from .serializers import (
     UserManagementSerializer,
     ProductManagementSerializer,
@@ -105,7 +110,8 @@ def get_order_payments(request, order_id):
         order = get_object_or_404(Order, id=order_id)
 
         # Get payments for this order
-        payments = Payment.objects.filter(order=order).order_by('-created_at')
+        payments = Payment.objects.filter(order=order).select_related(
+            'cbe_transaction', 'telebirr_transaction').order_by('-created_at')
 
         payments_data = []
         for payment in payments:
@@ -200,7 +206,7 @@ def verify_payment(request, payment_id):
 
         if success:
             # Update order payment status if payment is completed
-            if payment.status == 'completed':
+            if payment.status == 'completed' and payment.order:
                 payment.order.payment_status = 'paid'
                 payment.order.save()
 
@@ -208,7 +214,7 @@ def verify_payment(request, payment_id):
                 'success': True,
                 'message': message,
                 'payment_status': payment.status,
-                'order_payment_status': payment.order.payment_status
+                'order_payment_status': payment.order.payment_status if payment.order else None
             })
         else:
             return JsonResponse({
@@ -227,12 +233,14 @@ def verify_payment(request, payment_id):
 def get_payment_details(request, payment_id):
     """Get detailed payment information"""
     try:
-        payment = get_object_or_404(Payment, id=payment_id)
+        payment = get_object_or_404(
+            Payment.objects.for_listing(), id=payment_id)
 
         payment_data = {
             'id': payment.id,
             'payment_id': str(payment.payment_id),
-            'order_number': payment.order.order_number,
+            # Archived orders leave their payments behind
+            'order_number': payment.order.order_number if payment.order else None,
             'customer_name': f"{payment.user.first_name} {payment.user.last_name}",
             'customer_email': payment.user.email,
             'payment_method': payment.payment_method,
@@ -251,7 +259,7 @@ def get_payment_details(request, payment_id):
         }
 
         # Add refund information
-        refunds = Refund.objects.filter(payment=payment)
+        refunds = payment.refunds.all()
         payment_data['refunds'] = [
             {
                 'refund_id': str(refund.refund_id),
@@ -886,9 +894,10 @@ class DashboardStatsAPI(APIView):
     def get(self, request):
         # Calculate real-time stats
         total_orders = Order.objects.count()
-        total_revenue = Order.objects.filter(payment_status='paid').aggregate(
-            total=Sum('grand_total')
-        )['total'] or 0
+        # Revenue in the base currency, whatever the orders were placed in
+        converter = CurrencyConverter()
+        total_revenue = converter.total(
+            Order.objects.filter(payment_status='paid'))
 
         total_customers = User.objects.filter(role='customer').count()
         total_products = Product.objects.count()
@@ -901,14 +910,15 @@ class DashboardStatsAPI(APIView):
         # Revenue this month
         month_start = timezone.now().replace(
             day=1, hour=0, minute=0, second=0, microsecond=0)
-        monthly_revenue = Order.objects.filter(
+        monthly_revenue = converter.total(Order.objects.filter(
             created_at__gte=month_start,
             payment_status='paid'
-        ).aggregate(total=Sum('grand_total'))['total'] or 0
+        ))
 
         stats = {
             'total_orders': total_orders,
             'total_revenue': float(total_revenue),
+            'currency': converter.base,
             'total_customers': total_customers,
             'total_products': total_products,
             'pending_orders': pending_orders,
@@ -951,22 +961,31 @@ class SalesAnalyticsAPI(APIView):
         end_date = timezone.now()
         start_date = end_date - timedelta(days=days)
 
-        # Sales data
+        # Sales data: daily order counts and paid revenue (in the base
+        # currency) for the whole period in one grouped query
+        converter = CurrencyConverter()
+        daily = {
+            row['day']: row
+            for row in Order.objects.filter(
+                created_at__date__gte=start_date.date(),
+                created_at__date__lte=end_date.date()
+            ).annotate(day=TruncDate('created_at')).values('day').annotate(
+                orders=Count('id'),
+                sales=Sum(converter.amount_in('grand_total'),
+                          filter=Q(payment_status='paid'))
+            ).order_by()
+        }
+
         sales_data = []
         current_date = start_date
         while current_date <= end_date:
-            next_date = current_date + timedelta(days=1)
-            daily_sales = Order.objects.filter(
-                created_at__date=current_date,
-                payment_status='paid'
-            ).aggregate(total=Sum('grand_total'))['total'] or 0
-
+            day = daily.get(current_date.date(), {})
             sales_data.append({
                 'date': current_date.strftime('%Y-%m-%d'),
-                'sales': float(daily_sales),
-                'orders': Order.objects.filter(created_at__date=current_date).count()
+                'sales': float(day.get('sales') or 0),
+                'orders': day.get('orders', 0)
             })
-            current_date = next_date
+            current_date += timedelta(days=1)
 
         # Top products
         top_products = Product.objects.annotate(
@@ -985,7 +1004,8 @@ class SalesAnalyticsAPI(APIView):
         return Response({
             'sales_data': sales_data,
             'top_products': top_products_data,
-            'period': period
+            'period': period,
+            'currency': converter.base
         })
 
 
@@ -1095,17 +1115,14 @@ def update_order_status(request, order_id):
 
             if new_status in dict(Order.STATUS_CHOICES):
                 old_status = order.status
-                order.status = new_status
-                order.save()
-
-                # Record status history
-                OrderStatusHistory.objects.create(
-                    order=order,
-                    old_status=old_status,
-                    new_status=new_status,
-                    note=notes,
-                    created_by=request.user
-                )
+                try:
+                    OrderTransitionService().transition(
+                        order, new_status, user=request.user, note=notes)
+                except OrderTransitionError as e:
+                    return JsonResponse({
+                        'success': False,
+                        'message': str(e)
+                    }, status=400)
 
                 return JsonResponse({
                     'success': True,
@@ -1236,14 +1253,41 @@ class ProductManagementAPI(APIView):
 @method_decorator(admin_required, name='dispatch')
 class PaymentStatsAPI(APIView):
     def get(self, request):
-        from payments.models import Payment
-        stats = {
-            'total': Payment.objects.count(),
-            'pending': Payment.objects.filter(status='pending').count(),
-            'completed': Payment.objects.filter(status='completed').count(),
-            'failed': Payment.objects.filter(status='failed').count(),
-        }
-        return Response(stats)
+        return Response(Payment.objects.status_counts())
+
+
+@method_decorator(admin_required, name='dispatch')
+class GatewayMetricsAPI(APIView):
+    """Latency and error rates per gateway operation in this process"""
+
+    def get(self, request):
+        return Response({'operations': gateway_metrics.summary()})
+
+
+@method_decorator(admin_required, name='dispatch')
+class PaymentManagementAPI(APIView):
+    """Payments newest first, paged by an opaque ``cursor``"""
+    MAX_LIMIT = 100
+
+    def get(self, request):
+        queryset = Payment.objects.for_listing()
+        if request.GET.get('status'):
+            queryset = queryset.filter(status=request.GET['status'])
+        if request.GET.get('payment_method'):
+            queryset = queryset.filter(
+                payment_method=request.GET['payment_method'])
+
+        try:
+            limit = min(max(int(request.GET.get('limit', 20)), 1), self.MAX_LIMIT)
+            payments, next_cursor = queryset.keyset_page(
+                request.GET.get('cursor'), limit)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        return Response({
+            'results': PaymentManagementSerializer(payments, many=True).data,
+            'next_cursor': next_cursor,
+        })
 
 
 # Add this to your admin_dashboard/views.py
@@ -1263,7 +1307,7 @@ class OrderManagementAPI(APIView):
             limit = int(request.GET.get('limit', 20))
             sort = request.GET.get('sort', 'newest')
 
-            queryset = Order.objects.all().select_related('user')
+            queryset = Order.objects.all().select_related('user').with_summary()
 
             # Apply filters
             if status_filter:
@@ -1273,16 +1317,17 @@ class OrderManagementAPI(APIView):
                     payment_status=payment_status_filter)
             if payment_status_detailed_filter:
                 if payment_status_detailed_filter == 'no_payment':
-                    queryset = queryset.filter(payments__isnull=True)
+                    queryset = queryset.filter(
+                        latest_payment_status__isnull=True)
                 else:
                     queryset = queryset.filter(
-                        payments__status=payment_status_detailed_filter)
+                        latest_payment_status=payment_status_detailed_filter)
             if search:
+                # Order number, customer, phone, city, SKU or payment
+                # reference, matched by prefix through the search index
                 queryset = queryset.filter(
-                    Q(order_number__icontains=search) |
-                    Q(user__email__icontains=search) |
-                    Q(user__first_name__icontains=search) |
-                    Q(user__last_name__icontains=search)
+                    pk__in=OrderSearchDocument.objects.search(
+                        search).values('order_id')
                 )
             if date_from:
                 queryset = queryset.filter(created_at__date__gte=date_from)
@@ -1306,12 +1351,10 @@ class OrderManagementAPI(APIView):
 
             orders = list(queryset[start_idx:end_idx])
 
-            # Enhanced serialization with payment info
+            # Item counts and the latest payment come from with_summary()
             orders_data = []
             for order in orders:
-                # Get the latest payment for this order
-                latest_payment = Payment.objects.filter(
-                    order=order).order_by('-created_at').first()
+                has_payment = order.latest_payment_status is not None
 
                 order_data = {
                     'id': order.id,
@@ -1325,17 +1368,19 @@ class OrderManagementAPI(APIView):
                     'subtotal': str(order.subtotal),
                     'shipping_cost': str(order.shipping_cost),
                     'tax_amount': str(order.tax_amount),
-                    'item_count': order.items.count(),
+                    'item_count': order.items_count,
+                    'total_units': order.total_units,
+                    'thumbnail': order_thumbnail_url(order, request),
                     'created_at': order.created_at.isoformat(),
                     'updated_at': order.updated_at.isoformat(),
 
                     # FIXED: Enhanced payment information
-                    'has_payment': latest_payment is not None,
-                    'payment_status_detailed': latest_payment.status if latest_payment else 'no_payment',
-                    'payment_amount': str(latest_payment.amount) if latest_payment else '0.00',
-                    'payment_currency': latest_payment.currency if latest_payment else 'ETB',
-                    'payment_created_at': latest_payment.created_at.isoformat() if latest_payment else None,
-                    'payment_completed_at': latest_payment.completed_at.isoformat() if latest_payment and latest_payment.completed_at else None,
+                    'has_payment': has_payment,
+                    'payment_status_detailed': order.latest_payment_status if has_payment else 'no_payment',
+                    'payment_amount': str(order.latest_payment_amount) if has_payment else '0.00',
+                    'payment_currency': order.latest_payment_currency if has_payment else 'ETB',
+                    'payment_created_at': order.latest_payment_created_at.isoformat() if has_payment else None,
+                    'payment_completed_at': order.latest_payment_completed_at.isoformat() if order.latest_payment_completed_at else None,
                 }
                 orders_data.append(order_data)
 
@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cart.services import CartReaper
+
+
+class Command(BaseCommand):
+    help = 'Delete anonymous carts that have been idle longer than the TTL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            help='Idle time in days (defaults to CART_ABANDONED_TTL_DAYS)')
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Carts per primary-key range (defaults to CART_REAPER_BATCH_SIZE)')
+        parser.add_argument(
+            '--skip-sessions', action='store_true',
+            help='Do not scan sessions for dangling cart_id references')
+
+    def handle(self, *args, **options):
+        ttl = None
+        if options['batch_size'] is not None and options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        if options['days'] is not None:
+            if options['days'] < 1:
+                raise CommandError('--days must be at least 1')
+            ttl = timedelta(days=options['days'])
+        reaper = CartReaper(ttl=ttl, batch_size=options['batch_size'])
+        stats = reaper.reap(clean_sessions=not options['skip_sessions'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {stats['carts_deleted']} carts and "
+            f"{stats['items_deleted']} items in {stats['batches']} batches; "
+            f"cleaned {stats['sessions_cleaned']} sessions "
+            f"({stats['duration']}s)"
+        ))
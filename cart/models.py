@@ -1,5 +1,8 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import Exists, Q
 from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from products.models import Product, ProductVariant
 
@@ -51,31 +54,36 @@ class Cart(models.Model):
         """Clear all items from cart"""
         self.items.all().delete()
 
+    def get_item(self, item_id):
+        """Get a cart item by id, raising CartItem.DoesNotExist if missing"""
+        return self.items.select_related('product', 'variant').get(id=item_id)
+
+    def add_item(self, product, variant=None, quantity=1):
+        """Add a product to the cart, increasing quantity if already present"""
+        existing_item = self.items.filter(
+            product=product,
+            variant=variant
+        ).first()
+
+        if existing_item:
+            return existing_item.update_quantity(
+                existing_item.quantity + quantity)
+
+        return CartItem.objects.create(
+            cart=self,
+            product=product,
+            variant=variant,
+            quantity=quantity
+        )
+
     def merge_with_session_cart(self, session_cart):
-        """Merge session cart with user cart after login"""
-        if session_cart and session_cart != self:
-            for session_item in session_cart.items.all():
-                # Try to find existing item with same product and variant
-                existing_item = self.items.filter(
-                    product=session_item.product,
-                    variant=session_item.variant
-                ).first()
-
-                if existing_item:
-                    existing_item.quantity += session_item.quantity
-                    existing_item.save()
-                else:
-                    # Create new item in user's cart
-                    CartItem.objects.create(
-                        cart=self,
-                        product=session_item.product,
-                        variant=session_item.variant,
-                        quantity=session_item.quantity,
-                        price=session_item.price
-                    )
-
-            # Delete the session cart
-            session_cart.delete()
+        """
+        Merge an anonymous cart (a ``SessionCart`` or a legacy anonymous
+        ``Cart`` row) into this cart after login.
+        """
+        from .services import CartMergeService
+
+        return CartMergeService().merge(self, session_cart)
 
 
 class CartItem(models.Model):
@@ -115,10 +123,26 @@ class CartItem(models.Model):
         variant_str = f" - {self.variant.name}" if self.variant else ""
         return f"{self.quantity} x {self.product.name}{variant_str}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored quantity so updates need not re-fetch the row
+        instance._original_quantity = instance.__dict__.get('quantity')
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or 'quantity' in fields:
+            self._original_quantity = self.__dict__.get('quantity')
+
     @property
     def line_total(self):
         return self.quantity * self.price
 
+    @property
+    def quantity_changed(self):
+        return self.quantity != getattr(self, '_original_quantity', None)
+
     def save(self, *args, **kwargs):
         # Set price from product or variant if not provided
         if not self.price:
@@ -127,6 +151,40 @@ class CartItem(models.Model):
             else:
                 self.price = self.product.price
         super().save(*args, **kwargs)
+        self._original_quantity = self.quantity
+
+    def _stock_queryset(self, quantity):
+        """Product or variant row that can cover ``quantity`` units"""
+        if self.variant_id:
+            stock = ProductVariant.objects.filter(pk=self.variant_id)
+        else:
+            stock = Product.objects.filter(pk=self.product_id)
+        return stock.filter(Q(track_quantity=False) | Q(quantity__gte=quantity))
+
+    def has_stock_for(self, quantity):
+        return self._stock_queryset(quantity).exists()
+
+    def stock_error(self):
+        stock_item = self.variant or self.product
+        return ValueError(
+            f'Only {stock_item.quantity} items available in stock')
+
+    def update_quantity(self, quantity):
+        """
+        Validate stock and change the quantity with one conditional UPDATE,
+        then touch the parent cart's ``updated_at`` with a queryset update.
+        """
+        now = timezone.now()
+        updated = CartItem.objects.filter(pk=self.pk).filter(
+            Exists(self._stock_queryset(quantity))
+        ).update(quantity=quantity, updated_at=now)
+        if not updated:
+            raise self.stock_error()
+
+        self.quantity = self._original_quantity = quantity
+        self.updated_at = now
+        Cart.objects.filter(pk=self.cart_id).update(updated_at=now)
+        return self
 
     def is_available(self):
         """Check if the item is still available in inventory"""
@@ -136,34 +194,233 @@ class CartItem(models.Model):
             return self.product.track_quantity and self.product.quantity >= self.quantity
 
 
+class SessionCartItems:
+    """Minimal stand-in for the ``Cart.items`` related manager"""
+
+    def __init__(self, items):
+        self._items = items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def all(self):
+        return self._items
+
+    def count(self):
+        return len(self._items)
+
+
+class SessionCartItem:
+    """A cart line held in the session rather than in the CartItem table"""
+
+    created_at = None
+    updated_at = None
+
+    line_total = CartItem.line_total
+    is_available = CartItem.is_available
+
+    def __init__(self, cart, line_id, product, variant, quantity, price):
+        self.cart = cart
+        self.id = self.pk = line_id
+        self.product = product
+        self.variant = variant
+        self.quantity = quantity
+        self.price = price
+
+    def __str__(self):
+        variant_str = f" - {self.variant.name}" if self.variant else ""
+        return f"{self.quantity} x {self.product.name}{variant_str}"
+
+    @property
+    def product_id(self):
+        return self.product.id
+
+    @property
+    def variant_id(self):
+        return self.variant.id if self.variant else None
+
+    def update_quantity(self, quantity):
+        self.quantity = quantity
+        self.save()
+        return self
+
+    def save(self):
+        stock_item = self.variant or self.product
+        if stock_item.track_quantity and stock_item.quantity < self.quantity:
+            raise ValueError(
+                f'Only {stock_item.quantity} items available in stock')
+        self.cart._store_line(self)
+
+    def delete(self):
+        self.cart._remove_line(self.id)
+
+
+class SessionCart:
+    """
+    Anonymous shopper's cart stored in the session instead of the database.
+
+    Nothing is written until the first item is added, and the cart is only
+    promoted to ``Cart``/``CartItem`` rows when the shopper logs in or
+    checks out. Lines are kept in a compact form::
+
+        {'n': <next line id>, 'i': {'<line id>': [product_id, variant_id,
+                                                  quantity, 'price']}}
+
+    With ``SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'``
+    the whole anonymous cart lives in a signed cookie.
+    """
+
+    id = None
+    user = None
+    created_at = None
+    updated_at = None
+
+    def __init__(self, session):
+        self.session = session
+        self._data = session.get(settings.CART_SESSION_ID) or {'n': 1, 'i': {}}
+        self._items = None
+
+    def __bool__(self):
+        return bool(self._data['i'])
+
+    def __str__(self):
+        return f"Session Cart ({self.session.session_key})"
+
+    @property
+    def items(self):
+        if self._items is None:
+            self._items = SessionCartItems(self._load_items())
+        return self._items
+
+    @property
+    def total_items(self):
+        return sum(item.quantity for item in self.items.all())
+
+    @property
+    def subtotal(self):
+        return sum(item.line_total for item in self.items.all())
+
+    @property
+    def total(self):
+        return self.subtotal
+
+    def _load_items(self):
+        lines = self._data['i']
+        product_ids = {line[0] for line in lines.values()}
+        variant_ids = {line[1] for line in lines.values() if line[1]}
+        products = Product.objects.in_bulk(product_ids)
+        variants = ProductVariant.objects.in_bulk(variant_ids)
+
+        items = []
+        for line_id, (product_id, variant_id, quantity, price) in sorted(
+                lines.items(), key=lambda line: int(line[0])):
+            product = products.get(product_id)
+            if product is None:
+                continue
+            items.append(SessionCartItem(
+                self, int(line_id), product, variants.get(variant_id),
+                quantity, Decimal(price)
+            ))
+        return items
+
+    def _save(self):
+        self.session[settings.CART_SESSION_ID] = self._data
+        self.session.modified = True
+        self._items = None
+
+    def _store_line(self, item):
+        self._data['i'][str(item.id)] = [
+            item.product_id, item.variant_id, item.quantity, str(item.price)
+        ]
+        self._save()
+
+    def _remove_line(self, line_id):
+        self._data['i'].pop(str(line_id), None)
+        self._save()
+
+    def write_lines(self, items, removed_ids=()):
+        """Store several lines and drop others with a single session write"""
+        for item in items:
+            if item.id is None:
+                item.id = item.pk = self._data['n']
+                self._data['n'] += 1
+            self._data['i'][str(item.id)] = [
+                item.product_id, item.variant_id, item.quantity,
+                str(item.price)
+            ]
+        for line_id in removed_ids:
+            self._data['i'].pop(str(line_id), None)
+        self._save()
+
+    def get_item(self, item_id):
+        """Get a cart item by id, raising CartItem.DoesNotExist if missing"""
+        for item in self.items.all():
+            if item.id == item_id:
+                return item
+        raise CartItem.DoesNotExist('Cart item not found')
+
+    def add_item(self, product, variant=None, quantity=1):
+        """Add a product to the cart, increasing quantity if already present"""
+        for item in self.items.all():
+            if item.product_id == product.id and item.variant == variant:
+                return item.update_quantity(item.quantity + quantity)
+
+        if variant and variant.price:
+            price = variant.price
+        else:
+            price = product.price
+
+        item = SessionCartItem(
+            self, self._data['n'], product, variant, quantity, price)
+        self._data['n'] += 1
+        item.save()
+        return item
+
+    def clear(self):
+        """Clear all items from cart"""
+        self._data = {'n': 1, 'i': {}}
+        self._save()
+
+    def delete(self):
+        """Drop the cart from the session entirely"""
+        self.session.pop(settings.CART_SESSION_ID, None)
+        self._data = {'n': 1, 'i': {}}
+        self._items = None
+
+
 class CartManager:
     @staticmethod
     def get_or_create_cart(request):
         """
-        Get or create cart for authenticated user or anonymous user
+        Get or create cart for authenticated user or anonymous user.
+
+        Anonymous shoppers get a ``SessionCart`` so that browsing never
+        creates database rows.
         """
         if request.user.is_authenticated:
             cart, created = Cart.objects.get_or_create(user=request.user)
-            # Merge session cart if exists
-            session_cart_id = request.session.get('cart_id')
-            if session_cart_id:
-                try:
-                    session_cart = Cart.objects.get(
-                        id=session_cart_id, user__isnull=True)
-                    cart.merge_with_session_cart(session_cart)
-                    del request.session['cart_id']
-                except Cart.DoesNotExist:
-                    pass
-            return cart
-        else:
-            cart_id = request.session.get('cart_id')
-            if cart_id:
-                try:
-                    return Cart.objects.get(id=cart_id, user__isnull=True)
-                except Cart.DoesNotExist:
-                    pass
-
-            # Create new anonymous cart
-            cart = Cart.objects.create()
-            request.session['cart_id'] = cart.id
+            CartManager.merge_anonymous_cart(request, cart)
             return cart
+
+        return SessionCart(request.session)
+
+    @staticmethod
+    def merge_anonymous_cart(request, cart):
+        """Promote the session cart (and any legacy anonymous cart row)"""
+        session_cart = SessionCart(request.session)
+        if session_cart:
+            cart.merge_with_session_cart(session_cart)
+
+        # Anonymous carts created before carts moved into the session
+        session_cart_id = request.session.get('cart_id')
+        if session_cart_id:
+            try:
+                legacy_cart = Cart.objects.get(
+                    id=session_cart_id, user__isnull=True)
+                cart.merge_with_session_cart(legacy_cart)
+            except Cart.DoesNotExist:
+                pass
+            del request.session['cart_id']
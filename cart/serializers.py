@@ -102,3 +102,41 @@ class CartSerializer(serializers.ModelSerializer):
             'id', 'items', 'total_items', 'subtotal', 'total',
             'created_at', 'updated_at'
         ]
+
+
+class CartBatchOperationSerializer(serializers.Serializer):
+    OPERATION_CHOICES = [
+        ('add', 'Add'),
+        ('update', 'Update'),
+        ('remove', 'Remove'),
+    ]
+
+    op = serializers.ChoiceField(choices=OPERATION_CHOICES)
+    product_id = serializers.IntegerField(required=False)
+    variant_id = serializers.IntegerField(required=False, allow_null=True)
+    item_id = serializers.IntegerField(required=False)
+    quantity = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, attrs):
+        op = attrs['op']
+
+        if op == 'add' and not attrs.get('product_id'):
+            raise serializers.ValidationError({
+                'product_id': 'This field is required for add operations'
+            })
+        if op in ('update', 'remove') and not attrs.get('item_id'):
+            raise serializers.ValidationError({
+                'item_id': f'This field is required for {op} operations'
+            })
+        if op == 'update' and not attrs.get('quantity'):
+            raise serializers.ValidationError({
+                'quantity': 'This field is required for update operations'
+            })
+        if op == 'add':
+            attrs.setdefault('quantity', 1)
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartBatchOperationSerializer(many=True, allow_empty=False)
+    delta = serializers.BooleanField(default=False)
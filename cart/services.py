@@ -0,0 +1,406 @@
+import logging
+import time
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from products.models import Product, ProductVariant
+from .models import Cart, CartItem, SessionCart, SessionCartItem
+
+logger = logging.getLogger(__name__)
+
+
+class CartMergeService:
+    """
+    Merge an anonymous cart into a user's cart in a fixed number of queries.
+
+    Both carts' lines are loaded up front, the merged set is computed in
+    memory keyed by ``(product_id, variant_id)`` and written back with
+    ``bulk_update``/``bulk_create`` in one transaction. Merged quantities
+    are capped at the available stock of tracked products and variants.
+    """
+
+    def merge(self, user_cart, anonymous_cart):
+        if not anonymous_cart or anonymous_cart == user_cart:
+            return user_cart
+
+        with transaction.atomic():
+            user_items, anonymous_items = self._load_items(
+                user_cart, anonymous_cart)
+            existing = {
+                (item.product_id, item.variant_id): item for item in user_items
+            }
+
+            to_update = {}
+            to_create = {}
+            for anonymous_item in anonymous_items:
+                key = (anonymous_item.product_id, anonymous_item.variant_id)
+                item = existing.get(key) or to_create.get(key)
+
+                if item is None:
+                    quantity = self._cap_to_stock(
+                        anonymous_item, anonymous_item.quantity)
+                    if quantity > 0:
+                        to_create[key] = CartItem(
+                            cart=user_cart,
+                            product=anonymous_item.product,
+                            variant=anonymous_item.variant,
+                            quantity=quantity,
+                            price=anonymous_item.price
+                        )
+                    continue
+
+                quantity = self._cap_to_stock(
+                    item, item.quantity + anonymous_item.quantity)
+                if quantity > item.quantity:
+                    item.quantity = quantity
+                    if item.pk:
+                        to_update[key] = item
+
+            now = timezone.now()
+            if to_update:
+                for item in to_update.values():
+                    item.updated_at = now
+                CartItem.objects.bulk_update(
+                    to_update.values(), ['quantity', 'updated_at'])
+            if to_create:
+                CartItem.objects.bulk_create(to_create.values())
+            if to_update or to_create:
+                Cart.objects.filter(pk=user_cart.pk).update(updated_at=now)
+
+            if isinstance(anonymous_cart, SessionCart):
+                anonymous_cart.delete()
+            else:
+                CartItem.objects.filter(cart=anonymous_cart).delete()
+                anonymous_cart.delete()
+
+        return user_cart
+
+    def _load_items(self, user_cart, anonymous_cart):
+        if isinstance(anonymous_cart, SessionCart):
+            user_items = list(
+                user_cart.items.select_related('product', 'variant'))
+            return user_items, anonymous_cart.items.all()
+
+        items = CartItem.objects.filter(
+            cart_id__in=[user_cart.pk, anonymous_cart.pk]
+        ).select_related('product', 'variant')
+        user_items, anonymous_items = [], []
+        for item in items:
+            if item.cart_id == user_cart.pk:
+                user_items.append(item)
+            else:
+                anonymous_items.append(item)
+        return user_items, anonymous_items
+
+    def _cap_to_stock(self, item, quantity):
+        stock_item = item.variant or item.product
+        if stock_item.track_quantity:
+            return min(quantity, max(stock_item.quantity, 0))
+        return quantity
+
+
+class CartBatchService:
+    """
+    Apply a list of add/update/remove operations to a cart in one go.
+
+    The cart lines and the catalog rows referenced by the operations are
+    loaded once, every operation is validated against the resulting
+    quantities in memory, and the changes are written with bulk statements
+    in a single transaction. Nothing is written if any operation fails.
+    """
+
+    def apply(self, cart, operations):
+        lines = self._load_lines(cart)
+        lines_by_id = {item.id: item for item in lines}
+        state = {
+            (item.product_id, item.variant_id): {
+                'item': item,
+                'product': item.product,
+                'variant': item.variant,
+                'quantity': item.quantity,
+            }
+            for item in lines
+        }
+        products, variants = self._load_catalog(operations)
+
+        errors = {}
+        touched = {}
+        for index, operation in enumerate(operations):
+            op = operation['op']
+
+            if op == 'add':
+                product = products.get(operation['product_id'])
+                if product is None:
+                    errors[index] = 'Product not found or not available'
+                    continue
+                variant = None
+                if operation.get('variant_id'):
+                    variant = variants.get(operation['variant_id'])
+                    if variant is None or variant.product_id != product.id:
+                        errors[index] = 'Variant not found for this product'
+                        continue
+                key = (product.id, variant.id if variant else None)
+                line = state.setdefault(key, {
+                    'item': None,
+                    'product': product,
+                    'variant': variant,
+                    'quantity': 0,
+                })
+                line['quantity'] += operation['quantity']
+            else:
+                item = lines_by_id.get(operation['item_id'])
+                if item is None:
+                    errors[index] = 'Cart item not found'
+                    continue
+                key = (item.product_id, item.variant_id)
+                line = state[key]
+                line['quantity'] = (
+                    operation['quantity'] if op == 'update' else 0)
+
+            touched[key] = index
+
+        for key, index in touched.items():
+            line = state[key]
+            stock_item = line['variant'] or line['product']
+            if (line['quantity'] and stock_item.track_quantity
+                    and stock_item.quantity < line['quantity']):
+                errors.setdefault(
+                    index,
+                    f'Only {stock_item.quantity} items available in stock')
+
+        if errors:
+            return {'success': False, 'errors': errors}
+
+        created, updated, removed = [], [], []
+        for key in touched:
+            line = state[key]
+            item = line['item']
+            if item is None:
+                if line['quantity']:
+                    created.append(line)
+            elif not line['quantity']:
+                removed.append(item)
+            elif line['quantity'] != item.quantity:
+                item.quantity = line['quantity']
+                updated.append(item)
+
+        if isinstance(cart, SessionCart):
+            created = self._write_session_cart(cart, created, updated, removed)
+        else:
+            created = self._write_cart(cart, created, updated, removed)
+
+        remaining = [line for line in state.values() if line['quantity']]
+        return {
+            'success': True,
+            'changed': created + updated,
+            'removed': [item.id for item in removed],
+            'total_items': sum(line['quantity'] for line in remaining),
+            'subtotal': sum(
+                line['quantity'] * (
+                    line['item'].price if line['item']
+                    else self._price(line)
+                )
+                for line in remaining
+            ),
+        }
+
+    def _load_lines(self, cart):
+        if isinstance(cart, SessionCart):
+            return list(cart.items.all())
+        return list(cart.items.select_related('product', 'variant'))
+
+    def _load_catalog(self, operations):
+        product_ids = {
+            operation['product_id'] for operation in operations
+            if operation['op'] == 'add'
+        }
+        variant_ids = {
+            operation['variant_id'] for operation in operations
+            if operation['op'] == 'add' and operation.get('variant_id')
+        }
+
+        products = {}
+        if product_ids:
+            products = Product.objects.filter(
+                id__in=product_ids, status='published').in_bulk()
+        variants = {}
+        if variant_ids:
+            variants = ProductVariant.objects.in_bulk(variant_ids)
+        return products, variants
+
+    def _price(self, line):
+        if line['variant'] and line['variant'].price:
+            return line['variant'].price
+        return line['product'].price
+
+    def _write_cart(self, cart, created, updated, removed):
+        now = timezone.now()
+        new_items = [
+            CartItem(
+                cart=cart,
+                product=line['product'],
+                variant=line['variant'],
+                quantity=line['quantity'],
+                price=self._price(line)
+            )
+            for line in created
+        ]
+
+        with transaction.atomic():
+            if new_items:
+                CartItem.objects.bulk_create(new_items)
+            if updated:
+                for item in updated:
+                    item.updated_at = now
+                CartItem.objects.bulk_update(
+                    updated, ['quantity', 'updated_at'])
+            if removed:
+                CartItem.objects.filter(
+                    pk__in=[item.pk for item in removed]).delete()
+            if new_items or updated or removed:
+                Cart.objects.filter(pk=cart.pk).update(updated_at=now)
+
+        return new_items
+
+    def _write_session_cart(self, cart, created, updated, removed):
+        new_items = [
+            SessionCartItem(
+                cart, None, line['product'], line['variant'],
+                line['quantity'], self._price(line)
+            )
+            for line in created
+        ]
+        cart.write_lines(
+            new_items + updated, [item.id for item in removed])
+        return new_items
+
+
+class CartReaper:
+    """
+    Delete abandoned anonymous carts in bounded batches.
+
+    Carts are walked by primary-key ranges and each range is deleted in its
+    own short transaction, so the cart tables are never locked for long.
+    """
+
+    def __init__(self, ttl=None, batch_size=None):
+        if ttl is None:
+            ttl = timedelta(days=settings.CART_ABANDONED_TTL_DAYS)
+        self.ttl = ttl
+        if batch_size is None:
+            batch_size = settings.CART_REAPER_BATCH_SIZE
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.batch_size = batch_size
+
+    def abandoned_carts(self, cutoff):
+        return Cart.objects.filter(user__isnull=True, updated_at__lt=cutoff)
+
+    def reap(self, clean_sessions=True):
+        """Delete idle anonymous carts and return metrics for the run"""
+        started = time.monotonic()
+        cutoff = timezone.now() - self.ttl
+        stats = {
+            'carts_deleted': 0,
+            'items_deleted': 0,
+            'sessions_cleaned': 0,
+            'batches': 0,
+        }
+
+        bounds = self.abandoned_carts(cutoff).aggregate(
+            low=Min('pk'), high=Max('pk'))
+
+        if bounds['low'] is not None:
+            start = bounds['low']
+            while start <= bounds['high']:
+                end = start + self.batch_size
+                carts, items = self._reap_range(cutoff, start, end)
+                stats['carts_deleted'] += carts
+                stats['items_deleted'] += items
+                stats['batches'] += 1
+                start = end
+
+        if clean_sessions:
+            stats['sessions_cleaned'] = self.clean_session_references()
+
+        stats['duration'] = round(time.monotonic() - started, 3)
+        logger.info(
+            'Cart reaper reclaimed %(carts_deleted)d carts and '
+            '%(items_deleted)d items in %(batches)d batches '
+            '(%(sessions_cleaned)d sessions cleaned, %(duration)ss)', stats)
+        return stats
+
+    def _reap_range(self, cutoff, start, end):
+        with transaction.atomic():
+            cart_ids = list(
+                self.abandoned_carts(cutoff)
+                .filter(pk__gte=start, pk__lt=end)
+                .values_list('pk', flat=True)
+            )
+            if not cart_ids:
+                return 0, 0
+
+            items_deleted, _ = CartItem.objects.filter(
+                cart_id__in=cart_ids).delete()
+            _, deleted = Cart.objects.filter(pk__in=cart_ids).delete()
+            return deleted.get(Cart._meta.label, 0), items_deleted
+
+    def clean_session_references(self):
+        """
+        Drop ``cart_id`` entries that point at carts which no longer exist.
+
+        Only database-backed session engines can be scanned; for other
+        engines the stale ids are discarded lazily on the next merge.
+        """
+        store_class = import_module(settings.SESSION_ENGINE).SessionStore
+        if not hasattr(store_class, 'get_model_class'):
+            return 0
+
+        session_model = store_class.get_model_class()
+        store = store_class()
+        cleaned = 0
+        last_key = ''
+
+        while True:
+            sessions = list(
+                session_model.objects.filter(
+                    session_key__gt=last_key,
+                    expire_date__gt=timezone.now()
+                ).order_by('session_key')[:self.batch_size]
+            )
+            if not sessions:
+                break
+            last_key = sessions[-1].session_key
+
+            decoded = {}
+            for session in sessions:
+                data = store.decode(session.session_data)
+                if data.get('cart_id'):
+                    decoded[session] = data
+            if not decoded:
+                continue
+
+            existing = set(
+                Cart.objects.filter(
+                    pk__in=[data['cart_id'] for data in decoded.values()],
+                    user__isnull=True
+                ).values_list('pk', flat=True)
+            )
+
+            stale = []
+            for session, data in decoded.items():
+                if data['cart_id'] not in existing:
+                    del data['cart_id']
+                    session.session_data = store.encode(data)
+                    stale.append(session)
+
+            if stale:
+                session_model.objects.bulk_update(stale, ['session_data'])
+                cleaned += len(stale)
+
+        return cleaned
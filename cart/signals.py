@@ -1,6 +1,7 @@
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import user_logged_in
+from django.utils import timezone
 from .models import Cart, CartItem
 
 
@@ -9,18 +10,11 @@ def merge_carts_on_login(sender, request, user, **kwargs):
     """
     Merge anonymous cart with user cart when user logs in
     """
-    from .models import CartManager
+    from .models import CartManager, SessionCart
 
-    session_cart_id = request.session.get('cart_id')
-    if session_cart_id:
-        try:
-            user_cart = Cart.objects.get(user=user)
-            session_cart = Cart.objects.get(
-                id=session_cart_id, user__isnull=True)
-            user_cart.merge_with_session_cart(session_cart)
-            del request.session['cart_id']
-        except Cart.DoesNotExist:
-            pass
+    if SessionCart(request.session) or request.session.get('cart_id'):
+        user_cart, created = Cart.objects.get_or_create(user=user)
+        CartManager.merge_anonymous_cart(request, user_cart)
 
 
 @receiver(pre_save, sender=CartItem)
@@ -28,17 +22,9 @@ def validate_cart_item_stock(sender, instance, **kwargs):
     """
     Validate stock availability before saving cart item
     """
-    if instance.pk:  # Only for updates
-        original = CartItem.objects.get(pk=instance.pk)
-        if original.quantity != instance.quantity:  # Quantity changed
-            if instance.variant:
-                if instance.variant.track_quantity and instance.variant.quantity < instance.quantity:
-                    raise ValueError(
-                        f'Only {instance.variant.quantity} items available in stock')
-            else:
-                if instance.product.track_quantity and instance.product.quantity < instance.quantity:
-                    raise ValueError(
-                        f'Only {instance.product.quantity} items available in stock')
+    if instance.pk and instance.quantity_changed:  # Only for updates
+        if not instance.has_stock_for(instance.quantity):
+            raise instance.stock_error()
 
 
 @receiver(post_save, sender=CartItem)
@@ -46,4 +32,5 @@ def update_cart_timestamp(sender, instance, **kwargs):
     """
     Update cart timestamp when items are modified
     """
-    instance.cart.save()  # This triggers auto_now on updated_at
+    Cart.objects.filter(pk=instance.cart_id).update(
+        updated_at=timezone.now())
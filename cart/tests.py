@@ -1,8 +1,16 @@
+from datetime import timedelta
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
 from .models import Cart, CartItem
+from .services import CartMergeService, CartReaper
 from products.models import Product, Category, Brand
 from users.models import User
 
@@ -45,6 +53,52 @@ class CartModelTests(TestCase):
         self.assertEqual(self.cart.total_items, 2)
         self.assertEqual(self.cart.subtotal, 200.00)
 
+    def test_update_quantity_uses_two_statements(self):
+        cart_item = CartItem.objects.create(
+            cart=self.cart, product=self.product, quantity=1)
+        cart_item = CartItem.objects.get(pk=cart_item.pk)
+
+        with self.assertNumQueries(2):
+            cart_item.update_quantity(4)
+
+        cart_item.refresh_from_db()
+        self.assertEqual(cart_item.quantity, 4)
+
+    def test_update_quantity_rejects_insufficient_stock(self):
+        cart_item = CartItem.objects.create(
+            cart=self.cart, product=self.product, quantity=1)
+
+        with self.assertRaises(ValueError):
+            cart_item.update_quantity(11)
+
+        cart_item.refresh_from_db()
+        self.assertEqual(cart_item.quantity, 1)
+
+    def test_save_does_not_refetch_original_item(self):
+        cart_item = CartItem.objects.create(
+            cart=self.cart, product=self.product, quantity=1)
+        cart_item = CartItem.objects.get(pk=cart_item.pk)
+        cart_item.quantity = 3
+
+        # stock check, item update, cart timestamp
+        with self.assertNumQueries(3):
+            cart_item.save()
+
+    def test_refresh_resets_the_original_quantity(self):
+        cart_item = CartItem.objects.create(
+            cart=self.cart, product=self.product, quantity=1)
+        CartItem.objects.filter(pk=cart_item.pk).update(quantity=5)
+
+        cart_item.refresh_from_db()
+        self.assertFalse(cart_item.quantity_changed)
+        # item update, cart timestamp; no stock check
+        with self.assertNumQueries(2):
+            cart_item.save()
+
+        cart_item.quantity = 6
+        cart_item.refresh_from_db(fields=['price'])
+        self.assertTrue(cart_item.quantity_changed)
+
 
 class CartAPITests(APITestCase):
     def setUp(self):
@@ -131,7 +185,8 @@ class CartSessionTests(APITestCase):
     def test_anonymous_cart_creation(self):
         response = self.client.get(self.cart_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIn('cart_id', self.client.session)
+        self.assertEqual(response.data['total_items'], 0)
+        self.assertEqual(Cart.objects.count(), 0)
 
     def test_add_item_to_anonymous_cart(self):
         data = {
@@ -141,3 +196,250 @@ class CartSessionTests(APITestCase):
         response = self.client.post(self.add_item_url, data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(response.data['cart']['total_items'], 1)
+
+    def test_anonymous_cart_does_not_write_cart_rows(self):
+        data = {'product_id': self.product.id, 'quantity': 1}
+        self.client.post(self.add_item_url, data)
+        response = self.client.post(self.add_item_url, data)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['cart']['total_items'], 2)
+        self.assertEqual(len(response.data['cart']['items']), 1)
+        self.assertEqual(Cart.objects.count(), 0)
+        self.assertEqual(CartItem.objects.count(), 0)
+
+    def test_update_and_remove_anonymous_cart_item(self):
+        data = {'product_id': self.product.id, 'quantity': 1}
+        response = self.client.post(self.add_item_url, data)
+        item_id = response.data['item']['id']
+
+        response = self.client.put(
+            reverse('cart:cart-item-update', kwargs={'item_id': item_id}),
+            {'quantity': 3}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['cart']['total_items'], 3)
+
+        response = self.client.delete(
+            reverse('cart:cart-item-remove', kwargs={'item_id': item_id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['cart']['total_items'], 0)
+
+    def test_session_cart_promoted_on_login(self):
+        user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass'
+        )
+        self.client.post(
+            self.add_item_url, {'product_id': self.product.id, 'quantity': 2})
+
+        self.client.login(email='test@example.com', password='testpass')
+
+        cart = Cart.objects.get(user=user)
+        self.assertEqual(cart.total_items, 2)
+        self.assertNotIn('cart', self.client.session)
+
+
+class CartReaperTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Electronics")
+        self.brand = Brand.objects.create(name="Samsung")
+        self.product = Product.objects.create(
+            name="Test Product",
+            description="Test Description",
+            category=self.category,
+            brand=self.brand,
+            price=100.00,
+            sku="TEST-001",
+            quantity=10,
+            status="published"
+        )
+
+    def make_cart(self, days_idle, user=None):
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=1)
+        Cart.objects.filter(pk=cart.pk).update(
+            updated_at=timezone.now() - timedelta(days=days_idle))
+        return cart
+
+    def test_reaps_only_idle_anonymous_carts(self):
+        user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass'
+        )
+        old_carts = [self.make_cart(40) for _ in range(5)]
+        fresh_cart = self.make_cart(1)
+        user_cart = self.make_cart(40, user=user)
+
+        stats = CartReaper(ttl=timedelta(days=30), batch_size=2).reap()
+
+        self.assertEqual(stats['carts_deleted'], len(old_carts))
+        self.assertEqual(stats['items_deleted'], len(old_carts))
+        self.assertGreaterEqual(stats['batches'], 3)
+        self.assertEqual(
+            set(Cart.objects.values_list('pk', flat=True)),
+            {fresh_cart.pk, user_cart.pk}
+        )
+
+    def test_clears_dangling_session_references(self):
+        cart = self.make_cart(40)
+        session = SessionStore()
+        session['cart_id'] = cart.pk
+        session.create()
+
+        stats = CartReaper(ttl=timedelta(days=30)).reap()
+
+        self.assertEqual(stats['sessions_cleaned'], 1)
+        self.assertNotIn('cart_id', SessionStore(session.session_key).load())
+
+    def test_rejects_batch_size_below_one(self):
+        for batch_size in [0, -1]:
+            with self.assertRaises(ValueError):
+                CartReaper(batch_size=batch_size)
+            with self.assertRaisesMessage(
+                    CommandError, '--batch-size must be at least 1'):
+                call_command('reap_carts', batch_size=batch_size)
+
+
+class CartMergeServiceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass'
+        )
+        self.category = Category.objects.create(name="Electronics")
+        self.brand = Brand.objects.create(name="Samsung")
+        self.products = [
+            Product.objects.create(
+                name=f"Test Product {i}",
+                description="Test Description",
+                category=self.category,
+                brand=self.brand,
+                price=100.00,
+                sku=f"TEST-{i:03d}",
+                quantity=5,
+                status="published"
+            )
+            for i in range(10)
+        ]
+        self.user_cart = Cart.objects.create(user=self.user)
+
+    def make_anonymous_cart(self, quantities):
+        cart = Cart.objects.create()
+        for product, quantity in zip(self.products, quantities):
+            CartItem.objects.create(
+                cart=cart, product=product, quantity=quantity)
+        return cart
+
+    def test_merge_combines_lines_and_caps_stock(self):
+        CartItem.objects.create(
+            cart=self.user_cart, product=self.products[0], quantity=1)
+        anonymous_cart = self.make_anonymous_cart([2, 4])
+        CartItem.objects.filter(
+            cart=anonymous_cart, product=self.products[1]).update(quantity=9)
+
+        CartMergeService().merge(self.user_cart, anonymous_cart)
+
+        quantities = dict(
+            self.user_cart.items.values_list('product_id', 'quantity'))
+        self.assertEqual(quantities, {
+            self.products[0].id: 3,
+            self.products[1].id: 5,
+        })
+        self.assertFalse(Cart.objects.filter(pk=anonymous_cart.pk).exists())
+
+    def test_merge_query_count_does_not_grow_with_items(self):
+        for product in self.products[:5]:
+            CartItem.objects.create(
+                cart=self.user_cart, product=product, quantity=1)
+
+        small_cart = self.make_anonymous_cart([1] * 6)
+        with CaptureQueriesContext(connection) as small:
+            CartMergeService().merge(self.user_cart, small_cart)
+
+        large_cart = self.make_anonymous_cart([1] * 10)
+        with CaptureQueriesContext(connection) as large:
+            CartMergeService().merge(self.user_cart, large_cart)
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(self.user_cart.total_items, 21)
+
+
+class CartBatchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass'
+        )
+        self.category = Category.objects.create(name="Electronics")
+        self.brand = Brand.objects.create(name="Samsung")
+        self.products = [
+            Product.objects.create(
+                name=f"Test Product {i}",
+                description="Test Description",
+                category=self.category,
+                brand=self.brand,
+                price=100.00,
+                sku=f"TEST-{i:03d}",
+                quantity=10,
+                status="published"
+            )
+            for i in range(3)
+        ]
+        self.cart = Cart.objects.create(user=self.user)
+        self.item = CartItem.objects.create(
+            cart=self.cart, product=self.products[0], quantity=1)
+        self.batch_url = reverse('cart:cart-item-batch')
+        self.client.force_authenticate(user=self.user)
+
+    def test_batch_applies_all_operations(self):
+        data = {'operations': [
+            {'op': 'add', 'product_id': self.products[1].id, 'quantity': 2},
+            {'op': 'add', 'product_id': self.products[2].id},
+            {'op': 'update', 'item_id': self.item.id, 'quantity': 4},
+        ]}
+        response = self.client.post(self.batch_url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['cart']['total_items'], 7)
+        self.assertEqual(self.cart.items.count(), 3)
+
+    def test_batch_is_all_or_nothing(self):
+        data = {'operations': [
+            {'op': 'remove', 'item_id': self.item.id},
+            {'op': 'add', 'product_id': self.products[1].id, 'quantity': 11},
+        ]}
+        response = self.client.post(self.batch_url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(1, response.data['operations'])
+        self.assertEqual(list(self.cart.items.all()), [self.item])
+
+    def test_batch_delta_response(self):
+        data = {'delta': True, 'operations': [
+            {'op': 'remove', 'item_id': self.item.id},
+            {'op': 'add', 'product_id': self.products[1].id, 'quantity': 2},
+        ]}
+        response = self.client.post(self.batch_url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['removed'], [self.item.id])
+        self.assertEqual(len(response.data['items']), 1)
+        self.assertEqual(response.data['total_items'], 2)
+        self.assertNotIn('cart', response.data)
+
+    def test_batch_on_anonymous_cart(self):
+        self.client.force_authenticate(user=None)
+        data = {'operations': [
+            {'op': 'add', 'product_id': self.products[1].id, 'quantity': 2},
+            {'op': 'add', 'product_id': self.products[2].id, 'quantity': 1},
+        ]}
+        response = self.client.post(self.batch_url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['cart']['total_items'], 3)
+        self.assertEqual(Cart.objects.count(), 1)
@@ -18,6 +18,7 @@ urlpatterns = [
     path('api/merge/', views.CartMergeView.as_view(), name='cart-merge'),
     path('api/items/', views.CartItemListView.as_view(), name='cart-item-list'),
     path('api/items/add/', views.CartItemAddView.as_view(), name='cart-item-add'),
+    path('api/items/batch/', views.CartBatchView.as_view(), name='cart-item-batch'),
     path('api/items/<int:item_id>/update/',
          views.CartItemUpdateView.as_view(), name='cart-item-update'),
     path('api/items/<int:item_id>/remove/',
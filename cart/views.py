@@ -2,13 +2,14 @@ from django.shortcuts import render
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly
 from django.shortcuts import get_object_or_404
-from .models import Cart, CartItem, CartManager
+from .models import Cart, CartItem, CartManager, SessionCart
 from .serializers import (
     CartSerializer, CartItemSerializer,
-    CartItemCreateSerializer, CartItemUpdateSerializer
+    CartItemCreateSerializer, CartItemUpdateSerializer, CartBatchSerializer
 )
+from .services import CartBatchService
 from products.models import Product, ProductVariant
 
 
@@ -21,7 +22,7 @@ class CartDetailView(generics.RetrieveAPIView):
 
 
 class CartItemAddView(APIView):
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    permission_classes = [AllowAny]
 
     def post(self, request):
         cart = CartManager.get_or_create_cart(request)
@@ -32,26 +33,15 @@ class CartItemAddView(APIView):
             variant = serializer.validated_data.get('variant')
             quantity = serializer.validated_data['quantity']
 
-            # Check if item already exists in cart
-            existing_item = cart.items.filter(
-                product=product,
-                variant=variant
-            ).first()
-
-            if existing_item:
-                # Update quantity if item exists
-                existing_item.quantity += quantity
-                existing_item.save()
-                item_serializer = CartItemSerializer(existing_item)
-            else:
-                # Create new cart item
-                cart_item = CartItem.objects.create(
-                    cart=cart,
-                    product=product,
-                    variant=variant,
-                    quantity=quantity
+            # Adds a new line or increases the quantity of an existing one
+            try:
+                cart_item = cart.add_item(product, variant, quantity)
+            except ValueError as e:
+                return Response(
+                    {'error': str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
                 )
-                item_serializer = CartItemSerializer(cart_item)
+            item_serializer = CartItemSerializer(cart_item)
 
             # Return updated cart
             cart_serializer = CartSerializer(cart)
@@ -65,13 +55,13 @@ class CartItemAddView(APIView):
 
 
 class CartItemUpdateView(APIView):
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    permission_classes = [AllowAny]
 
     def put(self, request, item_id):
         cart = CartManager.get_or_create_cart(request)
 
         try:
-            cart_item = cart.items.get(id=item_id)
+            cart_item = cart.get_item(item_id)
         except CartItem.DoesNotExist:
             return Response(
                 {'error': 'Cart item not found'},
@@ -81,7 +71,14 @@ class CartItemUpdateView(APIView):
         serializer = CartItemUpdateSerializer(cart_item, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            try:
+                cart_item.update_quantity(
+                    serializer.validated_data['quantity'])
+            except ValueError as e:
+                return Response(
+                    {'error': str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
             # Return updated cart
             cart_serializer = CartSerializer(cart)
@@ -94,13 +91,13 @@ class CartItemUpdateView(APIView):
 
 
 class CartItemRemoveView(APIView):
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    permission_classes = [AllowAny]
 
     def delete(self, request, item_id):
         cart = CartManager.get_or_create_cart(request)
 
         try:
-            cart_item = cart.items.get(id=item_id)
+            cart_item = cart.get_item(item_id)
             cart_item.delete()
 
             # Return updated cart
@@ -117,8 +114,44 @@ class CartItemRemoveView(APIView):
             )
 
 
+class CartBatchView(APIView):
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        """
+        Apply several add/update/remove operations and return the cart once
+        """
+        serializer = CartBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        cart = CartManager.get_or_create_cart(request)
+        result = CartBatchService().apply(
+            cart, serializer.validated_data['operations'])
+
+        if not result['success']:
+            return Response({
+                'error': 'Cart operations could not be applied',
+                'operations': result['errors']
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if serializer.validated_data['delta']:
+            return Response({
+                'message': 'Cart updated successfully',
+                'items': CartItemSerializer(result['changed'], many=True).data,
+                'removed': result['removed'],
+                'total_items': result['total_items'],
+                'subtotal': result['subtotal']
+            }, status=status.HTTP_200_OK)
+
+        return Response({
+            'message': 'Cart updated successfully',
+            'cart': CartSerializer(cart).data
+        }, status=status.HTTP_200_OK)
+
+
 class CartClearView(APIView):
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    permission_classes = [AllowAny]
 
     def post(self, request):
         cart = CartManager.get_or_create_cart(request)
@@ -137,6 +170,8 @@ class CartItemListView(generics.ListAPIView):
 
     def get_queryset(self):
         cart = CartManager.get_or_create_cart(self.request)
+        if isinstance(cart, SessionCart):
+            return cart.items.all()
         return cart.items.select_related('product', 'variant').all()
 
 
@@ -170,32 +205,21 @@ class CartMergeView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        session_cart_id = request.session.get('cart_id')
-        if not session_cart_id:
+        session_cart = SessionCart(request.session)
+        if not session_cart and not request.session.get('cart_id'):
             return Response(
                 {'message': 'No session cart to merge'},
                 status=status.HTTP_200_OK
             )
 
-        try:
-            user_cart = Cart.objects.get(user=request.user)
-            session_cart = Cart.objects.get(
-                id=session_cart_id, user__isnull=True)
-
-            user_cart.merge_with_session_cart(session_cart)
-            del request.session['cart_id']
-
-            cart_serializer = CartSerializer(user_cart)
-            return Response({
-                'message': 'Cart merged successfully',
-                'cart': cart_serializer.data
-            }, status=status.HTTP_200_OK)
+        user_cart, created = Cart.objects.get_or_create(user=request.user)
+        CartManager.merge_anonymous_cart(request, user_cart)
 
-        except Cart.DoesNotExist:
-            return Response(
-                {'error': 'Session cart not found'},
-                status=status.HTTP_404_NOT_FOUND
-            )
+        cart_serializer = CartSerializer(user_cart)
+        return Response({
+            'message': 'Cart merged successfully',
+            'cart': cart_serializer.data
+        }, status=status.HTTP_200_OK)
 
 
 # Add to cart/views.py
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupons', '0001_initial'),
+        ('orders', '0010_order_currency'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='couponusage',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='coupon_usages', to='orders.order'),
+        ),
+    ]
@@ -235,9 +235,12 @@ class CouponUsage(models.Model):
         on_delete=models.CASCADE,
         related_name='coupon_usages'
     )
+    # Usages outlive archived orders so per-user limits still count them
     order = models.ForeignKey(
         Order,
-        on_delete=models.CASCADE,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
         related_name='coupon_usages'
     )
     discount_amount = models.DecimalField(
@@ -0,0 +1,26 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class ExchangeRate(models.Model):
+    """
+    How many units of ``currency`` one unit of ``settings.DEFAULT_CURRENCY``
+    buys. The base currency itself needs no row; its rate is always 1.
+    """
+    currency = models.CharField(_('currency'), max_length=3, unique=True)
+    rate = models.DecimalField(
+        _('rate'), max_digits=18, decimal_places=8,
+        help_text=_('Units of this currency per one unit of the base currency'))
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('exchange rate')
+        verbose_name_plural = _('exchange rates')
+        ordering = ['currency']
+
+    def __str__(self):
+        return f"{self.currency} {self.rate}"
+
+    def save(self, *args, **kwargs):
+        self.currency = self.currency.upper()
+        super().save(*args, **kwargs)
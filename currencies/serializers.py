@@ -0,0 +1,32 @@
+from rest_framework import serializers
+
+from .services import display_currency
+
+
+class DisplayMoneyField(serializers.Field):
+    """
+    Read-only amount (in the base currency) shown in the display currency
+    the request asks for with ``?currency=``
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if value is None:
+            return None
+        converter, currency = display_currency(self.context)
+        return str(converter.convert(value, converter.base, currency))
+
+
+class DisplayCurrencyField(serializers.Field):
+    """Code of the currency ``DisplayMoneyField`` values are in"""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return display_currency(self.context)[1]
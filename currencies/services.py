@@ -0,0 +1,164 @@
+import threading
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+
+from .models import ExchangeRate
+
+CENT = Decimal('0.01')
+
+
+def money(amount):
+    """Round to whole cents, halves away from zero"""
+    return Decimal(amount).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class VersionedSnapshot:
+    """
+    In-process snapshot of a small table that is read far more often than
+    it is edited.
+
+    The snapshot is loaded once per process and reused. A version number
+    kept in the Django cache lets ``invalidate`` tell other processes to
+    reload on their next ``get``. Signal handlers must call ``invalidate``
+    through ``transaction.on_commit``: bumped any earlier, another process
+    could reload the old rows and keep them under the new version.
+
+    Subclasses set ``VERSION_KEY`` and implement ``load``.
+    """
+
+    VERSION_KEY = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = None
+
+    def get(self):
+        version = cache.get(self.VERSION_KEY, 0)
+        snapshot = self._snapshot
+        if snapshot is None or self._version != version:
+            snapshot = self.load()
+            with self._lock:
+                self._snapshot, self._version = snapshot, version
+        return snapshot
+
+    def invalidate(self):
+        self._snapshot = None
+        try:
+            cache.incr(self.VERSION_KEY)
+        except ValueError:
+            cache.set(self.VERSION_KEY, 1, None)
+
+    def load(self):
+        raise NotImplementedError
+
+
+class ExchangeRates(VersionedSnapshot):
+    """Snapshot of the exchange rate table, shared by every conversion"""
+
+    VERSION_KEY = 'currencies:exchange_rates:version'
+
+    def load(self):
+        """``{'base': code, 'rates': {code: units per base unit}}``"""
+        base = settings.DEFAULT_CURRENCY
+        rates = dict(ExchangeRate.objects.values_list('currency', 'rate'))
+        rates[base] = Decimal(1)
+        return {'base': base, 'rates': rates}
+
+
+exchange_rates = ExchangeRates()
+
+
+class CurrencyConverter:
+    """
+    Convert amounts with one rate snapshot, so a whole report or page of
+    products converts without touching the database.
+
+    ``convert_many`` converts a column of amounts at once, and
+    ``amount_in``/``total`` push the conversion into SQL so revenue in any
+    currency is a single aggregate query. Rows in a currency with no rate
+    are left out of SQL totals.
+    """
+
+    def __init__(self, rates=None):
+        self.rates = rates or exchange_rates.get()
+
+    @property
+    def base(self):
+        return self.rates['base']
+
+    def supports(self, currency):
+        return currency in self.rates['rates']
+
+    def factor(self, from_currency, to_currency=None):
+        """Multiplier taking ``from_currency`` amounts to ``to_currency``"""
+        rates = self.rates['rates']
+        to_currency = to_currency or self.base
+        for currency in (from_currency, to_currency):
+            if currency not in rates:
+                raise ValueError(f"No exchange rate for {currency}")
+        return rates[to_currency] / rates[from_currency]
+
+    def convert(self, amount, from_currency, to_currency=None):
+        return money(Decimal(amount) * self.factor(from_currency, to_currency))
+
+    def convert_many(self, amounts, from_currencies, to_currency=None):
+        """
+        Convert a column of amounts; ``from_currencies`` is one code for
+        all of them or a matching column of codes. Each distinct currency
+        is looked up once.
+        """
+        if isinstance(from_currencies, str):
+            factor = self.factor(from_currencies, to_currency)
+            return [money(Decimal(amount) * factor) for amount in amounts]
+
+        factors = {}
+        converted = []
+        for amount, currency in zip(amounts, from_currencies):
+            if currency not in factors:
+                factors[currency] = self.factor(currency, to_currency)
+            converted.append(money(Decimal(amount) * factors[currency]))
+        return converted
+
+    def amount_in(self, field, currency_field='currency', to_currency=None):
+        """SQL expression for ``field`` converted from each row's currency"""
+        to_currency = to_currency or self.base
+        factor_field = DecimalField(max_digits=30, decimal_places=12)
+        return Case(
+            *[
+                When(**{currency_field: currency},
+                     then=F(field) * Value(self.factor(currency, to_currency),
+                                           output_field=factor_field))
+                for currency in self.rates['rates']
+            ],
+            default=None,
+            output_field=DecimalField(max_digits=20, decimal_places=2)
+        )
+
+    def total(self, queryset, field='grand_total', currency_field='currency',
+              to_currency=None):
+        """Sum ``field`` over ``queryset`` in one currency, in one query"""
+        total = queryset.aggregate(
+            total=Sum(self.amount_in(field, currency_field, to_currency))
+        )['total']
+        return money(total or 0)
+
+
+def display_currency(context):
+    """
+    ``(converter, currency)`` for a serializer context, from the request's
+    ``?currency=`` (the base currency when missing or unsupported). Kept in
+    the context so a page of rows shares one snapshot.
+    """
+    if '_display_currency' not in context:
+        converter = CurrencyConverter()
+        request = context.get('request')
+        currency = (request.query_params.get('currency', '') if request else '').upper()
+        if currency not in settings.SUPPORTED_CURRENCIES or \
+                not converter.supports(currency):
+            currency = converter.base
+        context['_display_currency'] = (converter, currency)
+    return context['_display_currency']
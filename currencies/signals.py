@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ExchangeRate
+
+
+@receiver([post_save, post_delete], sender=ExchangeRate)
+def invalidate_exchange_rates(sender, **kwargs):
+    """Drop the cached rate snapshot so conversions pick up the change,
+    once it is committed"""
+    from .services import exchange_rates
+
+    transaction.on_commit(exchange_rates.invalidate)
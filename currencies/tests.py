@@ -0,0 +1,132 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from orders.models import Order
+from products.models import Brand, Category, Product
+from users.models import User
+from .models import ExchangeRate
+from .services import CurrencyConverter, ExchangeRates, exchange_rates
+
+
+class CurrencyConverterTests(TestCase):
+    def setUp(self):
+        # Rows vanish with the test transaction without firing signals
+        self.addCleanup(exchange_rates.invalidate)
+        with self.captureOnCommitCallbacks(execute=True):
+            ExchangeRate.objects.create(currency='etb', rate=Decimal('50'))
+            ExchangeRate.objects.create(currency='EUR', rate=Decimal('0.8'))
+        self.converter = CurrencyConverter()
+
+    def test_convert(self):
+        self.assertEqual(self.converter.base, 'USD')
+        self.assertEqual(self.converter.convert('10', 'USD', 'ETB'), Decimal('500.00'))
+        self.assertEqual(self.converter.convert('500', 'ETB'), Decimal('10.00'))
+        self.assertEqual(self.converter.convert('50', 'ETB', 'EUR'), Decimal('0.80'))
+        with self.assertRaises(ValueError):
+            self.converter.convert('1', 'GBP')
+
+    def test_convert_many(self):
+        self.assertEqual(
+            self.converter.convert_many(['1', '2.5'], 'USD', 'ETB'),
+            [Decimal('50.00'), Decimal('125.00')])
+        self.assertEqual(
+            self.converter.convert_many(['100', '8', '3'], ['ETB', 'EUR', 'USD']),
+            [Decimal('2.00'), Decimal('10.00'), Decimal('3.00')])
+
+    def test_rate_changes_reach_new_snapshots(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ExchangeRate.objects.filter(currency='ETB').delete()
+            ExchangeRate.objects.create(currency='ETB', rate=Decimal('60'))
+        self.assertEqual(
+            CurrencyConverter().convert('1', 'USD', 'ETB'), Decimal('60.00'))
+
+    def test_snapshot_is_invalidated_only_on_commit(self):
+        version = cache.get(ExchangeRates.VERSION_KEY, 0)
+        with self.captureOnCommitCallbacks() as callbacks:
+            ExchangeRate.objects.create(currency='KES', rate=Decimal('130'))
+        # Uncommitted rates must not be loaded under a new version
+        self.assertEqual(cache.get(ExchangeRates.VERSION_KEY, 0), version)
+        self.assertFalse(CurrencyConverter().supports('KES'))
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(cache.get(ExchangeRates.VERSION_KEY), version + 1)
+        self.assertTrue(CurrencyConverter().supports('KES'))
+
+    def test_total_converts_each_row_in_one_query(self):
+        user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass'
+        )
+        for grand_total, currency in [
+                ('10.00', 'USD'), ('500.00', 'ETB'), ('8.00', 'EUR'),
+                ('99.00', 'GBP')]:
+            Order.objects.create(
+                user=user,
+                shipping_address={},
+                billing_address={},
+                payment_method='stripe',
+                subtotal=grand_total,
+                grand_total=grand_total,
+                currency=currency
+            )
+
+        with self.assertNumQueries(1):
+            total = self.converter.total(Order.objects.all())
+        # GBP has no rate and is left out
+        self.assertEqual(total, Decimal('30.00'))
+        self.assertEqual(
+            self.converter.total(Order.objects.all(), to_currency='ETB'),
+            Decimal('1500.00'))
+
+
+class DisplayCurrencyTests(APITestCase):
+    def setUp(self):
+        self.addCleanup(exchange_rates.invalidate)
+        with self.captureOnCommitCallbacks(execute=True):
+            ExchangeRate.objects.create(currency='ETB', rate=Decimal('50'))
+        category = Category.objects.create(name='Test Category')
+        brand = Brand.objects.create(name='Test Brand')
+        for index in range(3):
+            Product.objects.create(
+                name=f"Test Product {index}",
+                description='Test Description',
+                category=category,
+                brand=brand,
+                price=Decimal('10.00') + index,
+                sku=f"TEST-{index}",
+                quantity=10,
+                is_featured=True,
+                status='published'
+            )
+
+    def test_catalog_prices_in_display_currency_without_extra_queries(self):
+        url = reverse('products:featured-api-products')
+        # The first request loads the rate snapshot for the process
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as base_queries:
+            response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['display_currency'], 'USD')
+
+        with CaptureQueriesContext(connection) as display_queries:
+            response = self.client.get(url, {'currency': 'etb'})
+        self.assertEqual(len(display_queries), len(base_queries))
+
+        prices = sorted(
+            (row['price'], row['display_price'], row['display_currency'])
+            for row in response.data['results'])
+        self.assertEqual(prices[0], ('10.00', '500.00', 'ETB'))
+
+    def test_unsupported_currency_falls_back_to_base(self):
+        response = self.client.get(
+            reverse('products:featured-api-products'), {'currency': 'XYZ'})
+        row = response.data['results'][0]
+        self.assertEqual(row['display_currency'], 'USD')
+        self.assertEqual(row['display_price'], row['price'])
@@ -58,6 +58,7 @@ INSTALLED_APPS = [
     'wishlist',
     'notifications',
     'coupons',
+    'currencies',
     'home',
     'admin_dashboard',
 
@@ -112,6 +113,26 @@ DATABASES = {
     }
 }
 
+# Cache
+# Payment circuit breakers and the pricing rule / exchange rate snapshot
+# versions live here, so every worker process must share it: set REDIS_URL
+# in production (needs the redis package). Without it each process gets its
+# own in-memory cache, which is only fit for a single-process dev server
+# (system check payments.W001 warns about it).
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -225,6 +246,79 @@ PAYPAL_CLIENT_SECRET = os.environ.get(
     'PAYPAL_CLIENT_SECRET', 'test_client_secret')
 PAYPAL_WEBHOOK_ID = os.environ.get('PAYPAL_WEBHOOK_ID', 'test_webhook_id')
 
-# Currency settings
+# Public URL of the site, for gateway callback and return URLs
+BASE_URL = os.environ.get('BASE_URL', 'http://localhost:8000')
+
+# Gateway HTTP clients: one keep-alive connection pool per gateway and
+# process. Timeouts are in seconds; only idempotent requests (GET, PUT,
+# DELETE) are retried, with exponential backoff.
+PAYMENT_GATEWAY_HTTP = {
+    'POOL_CONNECTIONS': 4,
+    'POOL_MAXSIZE': 20,
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 15,
+    'RETRIES': 3,
+    'BACKOFF_FACTOR': 0.3,
+}
+# Webhooks are stored in an inbox and applied after the response; events
+# about the same payment share one of these shards and apply in order
+WEBHOOK_INBOX_SHARDS = 8
+WEBHOOK_INBOX_BATCH_SIZE = 100
+# Failed events are retried this many times before being left as failed
+WEBHOOK_MAX_ATTEMPTS = 5
+# Pending CBE Birr / TeleBirr payments with no callback after this many
+# seconds are polled for their final status (poll_payments)
+PAYMENT_POLL_MIN_AGE = 300
+PAYMENT_POLL_BATCH_SIZE = 200
+PAYMENT_POLL_WORKERS = 8
+# Gateway status queries per second, per gateway and process
+PAYMENT_POLL_RATE_LIMITS = {'cbe': 10, 'telebirr': 10}
+# Raw gateway payloads (payments.GatewayPayload) are stored compressed:
+# 'zlib', 'zstd' (needs the zstandard package) or 'json' for none
+PAYMENT_PAYLOAD_COMPRESSION = 'zlib'
+# Upper bounds (seconds) of the gateway latency histogram buckets; metrics
+# are kept per process and scraped from /api/payments/metrics/ with
+# "Authorization: Bearer <PAYMENT_METRICS_TOKEN>" (or a staff session)
+PAYMENT_GATEWAY_LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+PAYMENT_METRICS_TOKEN = os.environ.get('PAYMENT_METRICS_TOKEN', '')
+# Per-gateway circuit breaker (payments.gateways.CircuitBreaker): once a
+# WINDOW (seconds) has MIN_CALLS calls and FAILURE_RATE of them failed or
+# took over SLOW_CALL_SECONDS, the gateway is skipped for OPEN_SECONDS and
+# then probed with one call. State is kept in the default cache (see CACHES)
+# so all workers agree.
+PAYMENT_GATEWAY_BREAKER = {
+    'FAILURE_RATE': 0.5,
+    'MIN_CALLS': 10,
+    'SLOW_CALL_SECONDS': 5,
+    'WINDOW': 60,
+    'OPEN_SECONDS': 30,
+}
+# CBE Birr and TeleBirr answer with canned responses unless this is off
+PAYMENT_GATEWAYS_SIMULATED = os.environ.get(
+    'PAYMENT_GATEWAYS_SIMULATED', 'True') == 'True'
+
+# Currency settings: prices and reports are in DEFAULT_CURRENCY (the base
+# currency); currencies.ExchangeRate holds the rates for the others
 DEFAULT_CURRENCY = 'USD'
 SUPPORTED_CURRENCIES = ['USD', 'ETB']
+
+# Cart settings
+# Session key holding anonymous carts (see cart.models.SessionCart)
+CART_SESSION_ID = 'cart'
+# Anonymous carts idle longer than this are removed by `manage.py reap_carts`
+CART_ABANDONED_TTL_DAYS = 30
+CART_REAPER_BATCH_SIZE = 1000
+
+# Order archive settings
+# Finished orders older than this are moved to ArchivedOrder by
+# `manage.py archive_orders`
+ORDER_ARCHIVE_AFTER_DAYS = 365
+ORDER_ARCHIVE_BATCH_SIZE = 500
+# Order numbers reserved per database round trip by each process
+ORDER_NUMBER_BLOCK_SIZE = 50
+
+# Signal side effects (emails, notifications, dashboard stats) run after
+# commit on this many background threads; 0 runs them inline after commit
+SIDE_EFFECT_WORKERS = 4
+# Jobs allowed to wait for a worker before callers run them inline
+SIDE_EFFECT_QUEUE_SIZE = 100
@@ -1,8 +1,16 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db import connection, connections, transaction
 from django.template.loader import render_to_string
 from .models import Notification, EmailLog
 
+logger = logging.getLogger(__name__)
+
 
 class NotificationService:
     """Service class for handling notification delivery"""
@@ -85,3 +93,73 @@ class NotificationService:
                 failed += 1
 
         return successful, failed
+
+
+class SideEffectDispatcher:
+    """
+    Run signal side effects (emails, notifications, dashboard aggregates)
+    after the current transaction commits, on a bounded worker pool.
+
+    Receivers call ``defer`` with a key identifying the effect; the same key
+    deferred several times in one transaction runs once. Pending jobs live
+    only in the connection's on-commit callbacks, so a rollback discards
+    them along with the transaction. Jobs should take
+    primary keys and reload what they need, since they run after commit on
+    another thread and connection. When every queue slot is taken the job
+    runs in the calling thread instead, so a burst cannot grow the backlog
+    without bound.
+    """
+
+    def __init__(self, workers=None, queue_size=None):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+
+    def defer(self, key, func, *args):
+        for _, callback, _ in connection.run_on_commit:
+            if getattr(callback, 'side_effect_key', None) == key:
+                return  # Already waiting for this transaction's commit
+
+        callback = partial(self._dispatch, func, args)
+        callback.side_effect_key = key
+        transaction.on_commit(callback)
+
+    def _dispatch(self, func, args):
+        workers = self.workers
+        if workers is None:
+            workers = settings.SIDE_EFFECT_WORKERS
+        # Inside an atomic block (e.g. a test transaction) another
+        # connection could not see the data yet, so run in place
+        if not workers or connection.in_atomic_block:
+            self._run(func, args)
+            return
+
+        executor, slots = self._get_executor(workers)
+        if not slots.acquire(blocking=False):
+            self._run(func, args)
+            return
+        future = executor.submit(self._run, func, args, close_connections=True)
+        future.add_done_callback(lambda future: slots.release())
+
+    def _get_executor(self, workers):
+        with self._lock:
+            if self._executor is None:
+                queue_size = self.queue_size or settings.SIDE_EFFECT_QUEUE_SIZE
+                self._executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix='side-effects')
+                self._slots = threading.BoundedSemaphore(workers + queue_size)
+            return self._executor, self._slots
+
+    def _run(self, func, args, close_connections=False):
+        try:
+            func(*args)
+        except Exception:
+            logger.exception('Side effect %s%r failed', func.__name__, args)
+        finally:
+            if close_connections:
+                connections.close_all()
+
+
+side_effects = SideEffectDispatcher()
@@ -1,10 +1,12 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.conf import settings
-from .models import UserNotificationPreference
+from .models import Notification, UserNotificationPreference
 from orders.models import Order
+from orders.signals import orders_transitioned
 from payments.models import Payment
-from .services import NotificationService
+from payments.signals import payment_status_changed
+from .services import NotificationService, side_effects
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
@@ -14,68 +16,124 @@ def create_user_notification_preferences(sender, instance, created, **kwargs):
         UserNotificationPreference.objects.get_or_create(user=instance)
 
 
+def build_order_status_notification(order):
+    """Unsaved notification for an order's current status, or None"""
+    if order.status == 'confirmed':
+        subject = f'Order Confirmed: {order.order_number}'
+        message = f'Your order {order.order_number} has been confirmed and is being processed.'
+        notification_type = 'order'
+
+    elif order.status == 'shipped':
+        subject = f'Order Shipped: {order.order_number}'
+        message = f'Your order {order.order_number} has been shipped. Tracking: {order.tracking_number or "N/A"}'
+        notification_type = 'shipping'
+
+    elif order.status == 'delivered':
+        subject = f'Order Delivered: {order.order_number}'
+        message = f'Your order {order.order_number} has been delivered. Thank you for shopping with us!'
+        notification_type = 'shipping'
+
+    else:
+        return None
+
+    return Notification(
+        user=order.user,
+        subject=subject,
+        message=message,
+        notification_type=notification_type,
+        related_order=order
+    )
+
+
 @receiver(post_save, sender=Order)
 def send_order_status_notification(sender, instance, created, **kwargs):
-    """Send notifications for order status changes"""
+    """Send notifications for order status changes once the save commits"""
     if not created:  # Only for updates
-        notification_service = NotificationService()
-
-        # Determine notification type based on status change
-        if instance.status == 'confirmed':
-            subject = f'Order Confirmed: {instance.order_number}'
-            message = f'Your order {instance.order_number} has been confirmed and is being processed.'
-            notification_type = 'order'
-
-        elif instance.status == 'shipped':
-            subject = f'Order Shipped: {instance.order_number}'
-            message = f'Your order {instance.order_number} has been shipped. Tracking: {instance.tracking_number or "N/A"}'
-            notification_type = 'shipping'
-
-        elif instance.status == 'delivered':
-            subject = f'Order Delivered: {instance.order_number}'
-            message = f'Your order {instance.order_number} has been delivered. Thank you for shopping with us!'
-            notification_type = 'shipping'
-
-        else:
-            return
-
-        # Create and send notification
-        notification = instance.notifications.create(
-            user=instance.user,
-            subject=subject,
-            message=message,
-            notification_type=notification_type,
-            related_order=instance
+        side_effects.defer(
+            ('order_status_notification', instance.pk, instance.status),
+            notify_order_status, instance.pk, instance.status
         )
 
-        notification_service.send_notification(notification)
 
+def notify_order_status(order_id, status):
+    order = Order.objects.select_related('user').filter(pk=order_id).first()
+    # A later save in the same transaction queues its own notification
+    if order is None or order.status != status:
+        return
 
-@receiver(post_save, sender=Payment)
-def send_payment_notification(sender, instance, created, **kwargs):
-    """Send notifications for payment updates"""
-    notification_service = NotificationService()
+    notification = build_order_status_notification(order)
+    if notification is None:
+        return
 
-    if instance.status == 'completed':
-        subject = f'Payment Confirmed: Order {instance.order.order_number}'
-        message = f'Your payment for order {instance.order.order_number} has been confirmed. Thank you!'
-        notification_type = 'payment'
+    # Create and send notification
+    notification.save()
+    NotificationService().send_notification(notification)
 
-    elif instance.status == 'failed':
-        subject = f'Payment Failed: Order {instance.order.order_number}'
-        message = f'Your payment for order {instance.order.order_number} has failed. Please try again or contact support.'
-        notification_type = 'payment'
 
-    else:
+@receiver(orders_transitioned)
+def send_batch_order_status_notifications(sender, order_ids, new_status, **kwargs):
+    """Create one batch of notifications for a bulk status change"""
+    side_effects.defer(
+        ('order_status_batch', new_status, frozenset(order_ids)),
+        notify_order_status_batch, list(order_ids)
+    )
+
+
+def notify_order_status_batch(order_ids):
+    orders = Order.objects.filter(pk__in=order_ids).select_related('user')
+    notifications = [
+        notification for notification in (
+            build_order_status_notification(order) for order in orders
+        )
+        if notification is not None
+    ]
+    if not notifications:
         return
 
-    # Create and send notification
-    notification = instance.order.notifications.create(
-        user=instance.order.user,
+    Notification.objects.bulk_create(notifications)
+    NotificationService().send_bulk_notifications(notifications)
+
+
+def build_payment_status_notification(payment, status):
+    """Unsaved notification for a completed or failed payment"""
+    order = payment.order
+    if status == 'completed':
+        subject = f'Payment Confirmed: Order {order.order_number}'
+        message = f'Your payment for order {order.order_number} has been confirmed. Thank you!'
+
+    else:
+        subject = f'Payment Failed: Order {order.order_number}'
+        message = f'Your payment for order {order.order_number} has failed. Please try again or contact support.'
+
+    return Notification(
+        user=order.user,
         subject=subject,
         message=message,
-        notification_type=notification_type,
-        related_order=instance.order
+        notification_type='payment',
+        related_order=order
     )
 
-    notification_service.send_notification(notification)
+
+@receiver(payment_status_changed)
+def send_payment_notification(sender, payment_ids, new_status, **kwargs):
+    """Notify customers of completed and failed payments once the change commits"""
+    if new_status in ['completed', 'failed']:
+        side_effects.defer(
+            ('payment_notification', new_status, frozenset(payment_ids)),
+            notify_payment_status, list(payment_ids), new_status
+        )
+
+
+def notify_payment_status(payment_ids, status):
+    # A later transition in the same transaction queues its own notification
+    payments = Payment.objects.filter(
+        pk__in=payment_ids, status=status, order__isnull=False
+    ).select_related('order__user')
+    notifications = [
+        build_payment_status_notification(payment, status) for payment in payments
+    ]
+    if not notifications:
+        return
+
+    Notification.objects.bulk_create(notifications)
+    NotificationService().send_bulk_notifications(notifications)
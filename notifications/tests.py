@@ -1,3 +1,53 @@
+from django.db import transaction
 from django.test import TestCase
 
-# Create your tests here.
+from .services import SideEffectDispatcher
+
+
+class SideEffectDispatcherTests(TestCase):
+    def setUp(self):
+        self.dispatcher = SideEffectDispatcher(workers=0)
+        self.calls = []
+
+    def record(self, *args):
+        self.calls.append(args)
+
+    def test_effects_wait_for_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.dispatcher.defer(('effect', 1), self.record, 1)
+            self.assertEqual(self.calls, [])
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.calls, [(1,)])
+
+    def test_same_key_runs_once_per_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dispatcher.defer(('effect', 1), self.record, 1)
+            self.dispatcher.defer(('effect', 1), self.record, 1)
+            self.dispatcher.defer(('effect', 2), self.record, 2)
+
+        self.assertEqual(self.calls, [(1,), (2,)])
+
+    def test_rolled_back_effects_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.dispatcher.defer(('effect', 1), self.record, 'stale')
+                    raise RuntimeError('rollback')
+            except RuntimeError:
+                pass
+            self.dispatcher.defer(('effect', 1), self.record, 'fresh')
+
+        self.assertEqual(self.calls, [('fresh',)])
+
+    def test_failing_effect_does_not_block_others(self):
+        def fail():
+            raise RuntimeError('boom')
+
+        with self.assertLogs('notifications.services', level='ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.dispatcher.defer(('failing',), fail)
+                self.dispatcher.defer(('effect', 1), self.record, 1)
+
+        self.assertEqual(self.calls, [(1,)])
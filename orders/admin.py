@@ -1,6 +1,9 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Order, OrderItem, OrderStatusHistory
+from .models import (
+    ArchivedOrder, Order, OrderItem, OrderStatusHistory, ShippingRate, TaxRule
+)
+from .services import OrderRestockService
 
 
 class OrderItemInline(admin.TabularInline):
@@ -32,9 +35,11 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ['order_number', 'user__email', 'user__username']
     readonly_fields = [
         'order_number', 'created_at', 'updated_at', 'paid_at',
-        'shipped_at', 'delivered_at', 'subtotal', 'grand_total'
+        'shipped_at', 'delivered_at', 'stock_restored_at', 'subtotal',
+        'grand_total'
     ]
     inlines = [OrderItemInline, OrderStatusHistoryInline]
+    actions = ['restore_stock']
     fieldsets = (
         ('Order Information', {
             'fields': ('order_number', 'user', 'status', 'payment_status', 'payment_method')
@@ -46,7 +51,7 @@ class OrderAdmin(admin.ModelAdmin):
             'fields': ('subtotal', 'tax_amount', 'shipping_cost', 'discount_amount', 'grand_total')
         }),
         ('Payment & Shipping', {
-            'fields': ('payment_id', 'paid_at', 'tracking_number', 'shipped_at', 'delivered_at')
+            'fields': ('payment_id', 'paid_at', 'tracking_number', 'shipped_at', 'delivered_at', 'stock_restored_at')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at')
@@ -68,6 +73,16 @@ class OrderAdmin(admin.ModelAdmin):
         )
     order_actions.short_description = 'Actions'  # CHANGED: actions -> order_actions
 
+    def restore_stock(self, request, queryset):
+        # Orders that are not cancelled/refunded or were already restocked
+        # are skipped by the service
+        stats = OrderRestockService().restock(
+            queryset.values_list('pk', flat=True), user=request.user)
+        self.message_user(
+            request,
+            f"Restored {stats['units']} units from {stats['orders']} orders")
+    restore_stock.short_description = 'Restore stock for cancelled/refunded orders'
+
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
@@ -75,7 +90,7 @@ class OrderItemAdmin(admin.ModelAdmin):
                     'variant', 'quantity', 'price', 'line_total_display']
     list_filter = ['created_at']
     search_fields = ['order__order_number', 'product__name']
-    readonly_fields = ['created_at', 'line_total']
+    readonly_fields = ['created_at', 'line_total', 'product_snapshot']
 
     def order_number(self, obj):
         return obj.order.order_number
@@ -100,3 +115,32 @@ class OrderStatusHistoryAdmin(admin.ModelAdmin):
 
     def has_add_permission(self, request):
         return False  # Status history should only be created automatically
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ['order_number', 'user', 'status',
+                    'payment_status', 'grand_total', 'created_at', 'archived_at']
+    list_filter = ['status', 'payment_status', 'archived_at']
+    search_fields = ['order_number', 'user__email']
+    readonly_fields = [field.name for field in ArchivedOrder._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(TaxRule)
+class TaxRuleAdmin(admin.ModelAdmin):
+    list_display = ['name', 'country', 'state', 'rate', 'is_active']
+    list_filter = ['is_active', 'country']
+    list_editable = ['rate', 'is_active']
+    search_fields = ['name', 'country', 'state']
+
+
+@admin.register(ShippingRate)
+class ShippingRateAdmin(admin.ModelAdmin):
+    list_display = ['country', 'state', 'min_weight', 'max_weight',
+                    'base_cost', 'cost_per_kg', 'is_active']
+    list_filter = ['is_active', 'country']
+    list_editable = ['base_cost', 'cost_per_kg', 'is_active']
+    search_fields = ['country', 'state']
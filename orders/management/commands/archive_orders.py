@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.services import OrderArchiveService
+
+
+class Command(BaseCommand):
+    help = 'Move old delivered, cancelled and refunded orders to the archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            help='Minimum order age in days (defaults to ORDER_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Orders per transaction (defaults to ORDER_ARCHIVE_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        age = None
+        if options['batch_size'] is not None and options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        if options['days'] is not None:
+            if options['days'] < 1:
+                raise CommandError('--days must be at least 1')
+            age = timedelta(days=options['days'])
+        service = OrderArchiveService(
+            age=age, batch_size=options['batch_size'])
+        archived = service.archive()
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} orders"))
@@ -0,0 +1,78 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from orders.models import OrderNumberAllocator
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare insert throughput on a unique index for random (uuid) and '
+        'sequential (allocator) order numbers'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count', type=int, default=100000,
+            help='Order numbers to insert per strategy')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows per INSERT batch')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        batch_size = options['batch_size']
+        allocator = OrderNumberAllocator(block_size=batch_size)
+
+        def random_number():
+            timestamp = timezone.now().strftime('%Y%m%d')
+            return f"ORD-{timestamp}-{uuid.uuid4().hex[:8].upper()}"
+
+        strategies = [
+            ('uuid4 suffix', random_number),
+            ('sequence blocks', allocator.next_number),
+        ]
+
+        # Allocator blocks are reserved for real (leaving a gap in today's
+        # sequence); the inserts run in a rolled back transaction
+        for name, generate in strategies:
+            started = time.perf_counter()
+            numbers = [generate() for _ in range(count)]
+            generate_seconds = time.perf_counter() - started
+
+            # A duplicate would be an IntegrityError mid-checkout; count
+            # them and insert the distinct numbers in generation order
+            unique_numbers = list(dict.fromkeys(numbers))
+            collisions = count - len(unique_numbers)
+            numbers = unique_numbers
+
+            with transaction.atomic():
+                insert_seconds = self._insert(numbers, batch_size)
+                transaction.set_rollback(True)
+
+            self.stdout.write(
+                f"{name:16} generate {count / generate_seconds:>12,.0f}/s   "
+                f"insert {len(numbers) / insert_seconds:>10,.0f} rows/s   "
+                f"collisions {collisions}"
+            )
+
+    def _insert(self, numbers, batch_size):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE bench_order_numbers '
+                '(order_number VARCHAR(20) NOT NULL UNIQUE)')
+
+            started = time.perf_counter()
+            for start in range(0, len(numbers), batch_size):
+                cursor.executemany(
+                    'INSERT INTO bench_order_numbers (order_number) VALUES (%s)',
+                    [(number,) for number in numbers[start:start + batch_size]]
+                )
+            insert_seconds = time.perf_counter() - started
+
+            cursor.execute('DROP TABLE bench_order_numbers')
+
+        return insert_seconds
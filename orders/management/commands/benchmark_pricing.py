@@ -0,0 +1,60 @@
+import random
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from orders.services import PricingEngine, pricing_rules
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Measure in-memory checkout quotes per second against the live rule tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--quotes', type=int, default=20000,
+            help='Number of quotes to compute')
+        parser.add_argument(
+            '--lines', type=int, default=5,
+            help='Lines per synthetic cart')
+        parser.add_argument('--country', default='Ethiopia')
+        parser.add_argument('--state', default='')
+
+    def handle(self, *args, **options):
+        count = options['quotes']
+        rng = random.Random(0)
+
+        # Synthetic carts built from unsaved products: the benchmark reads
+        # the rule tables once and touches the database for nothing else
+        carts = []
+        for _ in range(100):
+            carts.append([
+                SimpleNamespace(
+                    product=Product(
+                        pk=rng.randint(1, 1000),
+                        category_id=rng.randint(1, 20),
+                        price=Decimal(rng.randint(100, 50000)) / 100,
+                        weight=Decimal(rng.randint(0, 5000)) / 1000,
+                        is_digital=rng.random() < 0.1,
+                    ),
+                    variant=None,
+                    quantity=rng.randint(1, 4),
+                    price=Decimal(rng.randint(100, 50000)) / 100,
+                )
+                for _ in range(options['lines'])
+            ])
+
+        engine = PricingEngine(rules=pricing_rules.get())
+        country, state = options['country'], options['state']
+
+        started = time.perf_counter()
+        for index in range(count):
+            engine.quote(carts[index % len(carts)], country, state)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{count} quotes of {options['lines']} lines in {elapsed:.3f}s: "
+            f"{count / elapsed:,.0f} quotes/s"
+        )
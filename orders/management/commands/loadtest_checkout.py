@@ -0,0 +1,288 @@
+import contextlib
+import io
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from django.db.models import Sum
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from orders.models import Order, OrderItem
+from products.models import Brand, Category, Product
+from users.models import Address, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed users, products and carts, then drive concurrent add-to-cart, '
+        'checkout and payment flows and report throughput, latency, query '
+        'counts and stock errors'
+    )
+
+    STEPS = ['add_to_cart', 'checkout', 'payment']
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=50,
+            help='Shoppers to seed; each runs its own flows')
+        parser.add_argument(
+            '--flows', type=int, default=2,
+            help='Checkout flows per shopper')
+        parser.add_argument(
+            '--concurrency', type=int, default=8,
+            help='Worker threads driving flows at the same time')
+        parser.add_argument(
+            '--products', type=int, default=10,
+            help='Products to seed')
+        parser.add_argument(
+            '--stock', type=int, default=1000,
+            help='Starting stock per product (lower it to provoke oversells)')
+        parser.add_argument(
+            '--payment-method', default='stripe',
+            help='Payment method used for checkout and payment')
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Random seed for cart contents')
+        parser.add_argument(
+            '--current-database', action='store_true',
+            help='Run against the configured database instead of a '
+                 'throwaway test database (seeded rows are left behind)')
+        parser.add_argument(
+            '--show-output', action='store_true',
+            help='Do not silence what the views print')
+
+    def handle(self, *args, **options):
+        # The test environment lets the test client through ALLOWED_HOSTS
+        # and keeps outgoing email in memory
+        runner = DiscoverRunner(verbosity=0)
+        runner.setup_test_environment()
+        old_config = None
+        if not options['current_database']:
+            if connection.vendor == 'sqlite':
+                # A shared in-memory database fails concurrent writers at
+                # once; a file waits on locks like the real database does
+                test_settings = connection.settings_dict['TEST']
+                if not test_settings.get('NAME'):
+                    test_settings['NAME'] = os.path.join(
+                        tempfile.gettempdir(), f"loadtest_{os.getpid()}.sqlite3")
+            old_config = runner.setup_databases()
+
+        output = contextlib.nullcontext() if options['show_output'] \
+            else contextlib.redirect_stdout(io.StringIO())
+        try:
+            with output:
+                users, products = self._seed(options)
+            rng = random.Random(options['seed'])
+            # Flows of one shopper share a cart, so they run back to back
+            # on one thread
+            shoppers = [
+                [(user, address, self._plan_cart(rng, products))
+                 for _ in range(options['flows'])]
+                for user, address in users
+            ]
+
+            results = []
+            results_lock = threading.Lock()
+
+            def run_shopper(flows):
+                try:
+                    for user, address, cart_plan in flows:
+                        result = self._run_flow(
+                            user, address, cart_plan, options)
+                        with results_lock:
+                            results.append(result)
+                finally:
+                    connection.close()
+
+            started = time.perf_counter()
+            with output:
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                    list(pool.map(run_shopper, shoppers))
+            elapsed = time.perf_counter() - started
+
+            self._report(results, elapsed, products, options)
+        finally:
+            if old_config is not None:
+                runner.teardown_databases(old_config)
+            runner.teardown_test_environment()
+
+    @staticmethod
+    def _original_error(exc):
+        """
+        Rendering the error page can fail as well; prefer the database
+        error (lock, integrity) that started the chain
+        """
+        error = exc
+        while error is not None:
+            if isinstance(error, DatabaseError):
+                return error
+            error = error.__context__
+        return exc
+
+    def _seed(self, options):
+        run = f"{time.time_ns():x}"
+        category = Category.objects.create(name=f"Load test {run}")
+        brand = Brand.objects.create(name=f"Load test {run}")
+        products = Product.objects.bulk_create([
+            Product(
+                name=f"Load test product {run}-{index}",
+                slug=f"load-test-{run}-{index}",
+                description='Load test product',
+                category=category,
+                brand=brand,
+                price=Decimal('10.00') + index,
+                sku=f"LT-{run}-{index}",
+                quantity=options['stock'],
+                weight=Decimal('0.500'),
+                status='published'
+            )
+            for index in range(options['products'])
+        ])
+
+        users = []
+        for index in range(options['users']):
+            user = User.objects.create_user(
+                email=f"loadtest-{run}-{index}@example.com",
+                username=f"loadtest-{run}-{index}",
+                password='loadtest'
+            )
+            address = Address.objects.create(
+                user=user,
+                address_type='shipping',
+                street='1 Load Test Rd',
+                city='Addis Ababa',
+                state='Addis Ababa',
+                zip_code='1000'
+            )
+            users.append((user, address))
+        return users, products
+
+    def _plan_cart(self, rng, products):
+        picked = rng.sample(products, min(len(products), rng.randint(1, 3)))
+        return [(product.pk, rng.randint(1, 3)) for product in picked]
+
+    def _run_flow(self, user, address, cart_plan, options):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        result = {'timings': {}, 'queries': {}, 'errors': [], 'completed': False}
+
+        def call(step, url, data):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                try:
+                    response = client.post(url, data, format='json')
+                except Exception as exc:
+                    exc = self._original_error(exc)
+                    response = None
+                    result['errors'].append((step, self._classify(str(exc))))
+                result['timings'].setdefault(step, []).append(
+                    time.perf_counter() - started)
+            result['queries'].setdefault(step, []).append(len(queries))
+            if response is not None and response.status_code >= 400:
+                message = str(getattr(response, 'data', '') or response.status_code)
+                result['errors'].append((step, self._classify(message)))
+                return None
+            return response
+
+        for product_id, quantity in cart_plan:
+            if call('add_to_cart', reverse('cart:cart-item-add'),
+                    {'product_id': product_id, 'quantity': quantity}) is None:
+                return result
+
+        response = call('checkout', reverse('orders:order-create'), {
+            'shipping_address_id': address.pk,
+            'billing_address_id': address.pk,
+            'payment_method': options['payment_method'],
+        })
+        if response is None:
+            return result
+
+        order_id = response.data['order']['id']
+        response = call(
+            'payment',
+            reverse('payments:payment-create', args=[order_id]),
+            {'payment_method': options['payment_method'],
+             'stripe_token': 'tok_loadtest',
+             'paypal_order_id': 'loadtest'}
+        )
+        result['completed'] = response is not None
+        return result
+
+    @staticmethod
+    def _classify(message):
+        lowered = message.lower()
+        if 'locked' in lowered or 'deadlock' in lowered or 'could not serialize' in lowered:
+            return 'lock'
+        if 'stock' in lowered or 'available' in lowered:
+            return 'out of stock'
+        return message[:80]
+
+    def _report(self, results, elapsed, products, options):
+        completed = sum(1 for result in results if result['completed'])
+        self.stdout.write(
+            f"{len(results)} flows ({options['users']} users x {options['flows']}) "
+            f"with {options['concurrency']} threads in {elapsed:.2f}s"
+        )
+        self.stdout.write(
+            f"completed {completed}, throughput {completed / elapsed:,.1f} checkouts/s")
+
+        self.stdout.write(
+            f"\n{'step':12} {'requests':>8} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'p99 ms':>8} {'max ms':>8} {'queries':>12}")
+        for step in self.STEPS:
+            timings = [t for result in results for t in result['timings'].get(step, [])]
+            queries = [q for result in results for q in result['queries'].get(step, [])]
+            if not timings:
+                continue
+            p50, p95, p99 = self._percentiles(timings, [50, 95, 99])
+            self.stdout.write(
+                f"{step:12} {len(timings):>8} {p50 * 1000:>8.1f} {p95 * 1000:>8.1f} "
+                f"{p99 * 1000:>8.1f} {max(timings) * 1000:>8.1f} "
+                f"{min(queries):>5}-{max(queries):<6}"
+            )
+
+        errors = Counter(
+            (step, kind) for result in results for step, kind in result['errors'])
+        self.stdout.write('\nerrors:' if errors else '\nerrors: none')
+        for (step, kind), count in errors.most_common():
+            self.stdout.write(f"  {step:12} {kind}: {count}")
+
+        # Units sold versus stock actually taken off the shelf: a gap means
+        # concurrent checkouts overwrote each other's stock updates
+        sold = dict(
+            OrderItem.objects.filter(product__in=products)
+            .values('product').annotate(units=Sum('quantity'))
+            .values_list('product', 'units')
+        )
+        stock = dict(
+            Product.objects.filter(pk__in=[p.pk for p in products])
+            .values_list('pk', 'quantity')
+        )
+        oversold = lost = 0
+        for product in products:
+            units = sold.get(product.pk, 0)
+            oversold += max(0, units - options['stock'])
+            lost += max(0, units - (options['stock'] - stock[product.pk]))
+        orders = Order.objects.filter(items__product__in=products).distinct().count()
+        self.stdout.write(
+            f"\norders {orders}, oversold units {oversold}, "
+            f"lost stock updates {lost} units"
+        )
+
+    @staticmethod
+    def _percentiles(values, points):
+        if len(values) == 1:
+            return [values[0]] * len(points)
+        cuts = statistics.quantiles(values, n=100, method='inclusive')
+        return [cuts[point - 1] for point in points]
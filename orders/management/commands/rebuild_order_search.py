@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from orders.services import OrderSearchIndexer
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the order search index from the order tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Orders indexed per batch')
+
+    def handle(self, *args, **options):
+        indexed = OrderSearchIndexer(
+            batch_size=options['batch_size']).rebuild()
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} orders"))
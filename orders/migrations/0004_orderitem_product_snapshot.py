@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:38
+
+from django.db import migrations, models
+
+
+def backfill_product_snapshots(apps, schema_editor):
+    OrderItem = apps.get_model('orders', 'OrderItem')
+
+    items = OrderItem.objects.filter(product_snapshot={}).select_related(
+        'product', 'variant').prefetch_related('product__images')
+    batch = []
+    for item in items.iterator(chunk_size=500):
+        images = sorted(
+            item.product.images.all(),
+            key=lambda img: (not img.is_primary, img.order, img.created_at)
+        )
+        item.product_snapshot = {
+            'name': item.product.name,
+            'sku': item.variant.sku if item.variant else item.product.sku,
+            'image': images[0].image.url if images else None,
+            'variant_name': item.variant.name if item.variant else None,
+        }
+        batch.append(item)
+        if len(batch) >= 500:
+            OrderItem.objects.bulk_update(batch, ['product_snapshot'])
+            batch = []
+    if batch:
+        OrderItem.objects.bulk_update(batch, ['product_snapshot'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_alter_order_payment_method'),
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_snapshot',
+            field=models.JSONField(blank=True, default=dict, verbose_name='product snapshot'),
+        ),
+        migrations.RunPython(
+            backfill_product_snapshots, migrations.RunPython.noop),
+    ]
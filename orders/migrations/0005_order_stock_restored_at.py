@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_orderitem_product_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_restored_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='stock restored at'),
+        ),
+    ]
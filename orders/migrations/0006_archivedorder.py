@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:44
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_stock_restored_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True, verbose_name='original order ID')),
+                ('order_number', models.CharField(max_length=20, unique=True, verbose_name='order number')),
+                ('status', models.CharField(max_length=20, verbose_name='status')),
+                ('payment_status', models.CharField(max_length=20, verbose_name='payment status')),
+                ('grand_total', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='grand total')),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='order data')),
+                ('payments', models.JSONField(blank=True, default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='payments')),
+                ('created_at', models.DateTimeField(verbose_name='created at')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='archived at')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'archived order',
+                'verbose_name_plural': 'archived orders',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'created_at'], name='orders_arch_user_id_101d40_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_archivedorder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='date')),
+                ('last_value', models.PositiveIntegerField(default=0, verbose_name='last value')),
+            ],
+            options={
+                'verbose_name': 'order number sequence',
+                'verbose_name_plural': 'order number sequences',
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_ordernumbersequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSearchDocument',
+            fields=[
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='orders.order')),
+                ('order_number', models.CharField(max_length=20, verbose_name='order number')),
+                ('customer_email', models.CharField(max_length=254, verbose_name='customer email')),
+                ('customer_name', models.CharField(blank=True, max_length=300, verbose_name='customer name')),
+                ('customer_phone', models.CharField(blank=True, max_length=15, verbose_name='customer phone')),
+                ('city', models.CharField(blank=True, max_length=100, verbose_name='city')),
+                ('skus', models.TextField(blank=True, verbose_name='SKUs')),
+                ('payment_reference', models.TextField(blank=True, verbose_name='payment reference')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+            ],
+            options={
+                'verbose_name': 'order search document',
+                'verbose_name_plural': 'order search documents',
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(db_index=True, max_length=64, verbose_name='token')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='orders.ordersearchdocument')),
+            ],
+            options={
+                'verbose_name': 'order search token',
+                'verbose_name_plural': 'order search tokens',
+                'unique_together': {('document', 'token')},
+            },
+        ),
+    ]
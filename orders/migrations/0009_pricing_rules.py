@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_order_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShippingRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(blank=True, max_length=100, verbose_name='country')),
+                ('state', models.CharField(blank=True, max_length=100, verbose_name='state/region')),
+                ('min_weight', models.DecimalField(decimal_places=3, default=0, max_digits=8, verbose_name='minimum weight (kg)')),
+                ('max_weight', models.DecimalField(blank=True, decimal_places=3, help_text='Leave blank for no upper limit', max_digits=8, null=True, verbose_name='maximum weight (kg)')),
+                ('base_cost', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='base cost')),
+                ('cost_per_kg', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='cost per kg')),
+                ('is_active', models.BooleanField(default=True, verbose_name='is active')),
+            ],
+            options={
+                'verbose_name': 'shipping rate',
+                'verbose_name_plural': 'shipping rates',
+                'ordering': ['country', 'state', 'min_weight'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TaxRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='name')),
+                ('country', models.CharField(max_length=100, verbose_name='country')),
+                ('state', models.CharField(blank=True, help_text='Leave blank to apply to the whole country', max_length=100, verbose_name='state/region')),
+                ('rate', models.DecimalField(decimal_places=4, help_text='Fraction of the taxable amount, e.g. 0.1500 for 15%', max_digits=5, verbose_name='rate')),
+                ('is_active', models.BooleanField(default=True, verbose_name='is active')),
+            ],
+            options={
+                'verbose_name': 'tax rule',
+                'verbose_name_plural': 'tax rules',
+                'unique_together': {('country', 'state')},
+            },
+        ),
+    ]
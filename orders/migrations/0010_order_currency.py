@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_pricing_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='currency',
+            field=models.CharField(default='USD', max_length=3, verbose_name='currency'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='currency',
+            field=models.CharField(default='USD', max_length=3, verbose_name='currency'),
+        ),
+    ]
@@ -1,13 +1,128 @@
-from django.db import models
+from django.db import models, transaction
 
 # Create your models here.
 from django.db import models
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from products.models import Product, ProductVariant
 from cart.models import Cart, CartItem
-import uuid
+from decimal import Decimal
+import itertools
+import threading
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_summary(self):
+        """
+        Annotate list data so a page of orders costs a single query:
+        item count, units, first-item thumbnail and the latest payment.
+        """
+        from payments.models import Payment
+        from products.models import ProductImage
+
+        items = OrderItem.objects.filter(
+            order=OuterRef('pk')).order_by().values('order')
+        first_product = OrderItem.objects.filter(
+            order=OuterRef(OuterRef('pk'))
+        ).order_by('created_at', 'id').values('product_id')[:1]
+        thumbnail = ProductImage.objects.filter(
+            product_id=Subquery(first_product)
+        ).order_by('-is_primary', 'order', 'created_at').values('image')[:1]
+        latest_payment = Payment.objects.filter(
+            order=OuterRef('pk')).order_by('-created_at', '-id')
+
+        return self.annotate(
+            items_count=Coalesce(
+                Subquery(items.annotate(count=Count('id')).values('count'),
+                         output_field=IntegerField()), 0),
+            total_units=Coalesce(
+                Subquery(items.annotate(units=Sum('quantity')).values('units'),
+                         output_field=IntegerField()), 0),
+            thumbnail=Subquery(thumbnail),
+            latest_payment_status=Subquery(
+                latest_payment.values('status')[:1]),
+            latest_payment_amount=Subquery(
+                latest_payment.values('amount')[:1]),
+            latest_payment_currency=Subquery(
+                latest_payment.values('currency')[:1]),
+            latest_payment_created_at=Subquery(
+                latest_payment.values('created_at')[:1]),
+            latest_payment_completed_at=Subquery(
+                latest_payment.values('completed_at')[:1]),
+        )
+
+
+class OrderNumberSequence(models.Model):
+    """Per-day counter from which order number blocks are allocated"""
+    date = models.DateField(_('date'), unique=True)
+    last_value = models.PositiveIntegerField(_('last value'), default=0)
+
+    class Meta:
+        verbose_name = _('order number sequence')
+        verbose_name_plural = _('order number sequences')
+
+    def __str__(self):
+        return f"{self.date}: {self.last_value}"
+
+
+class OrderNumberAllocator:
+    """
+    Hand out ``ORD-YYYYMMDD-NNNNNNN`` numbers from an in-process pool.
+
+    Blocks of ``ORDER_NUMBER_BLOCK_SIZE`` numbers are reserved from
+    ``OrderNumberSequence`` with one locked update, so numbers are unique
+    across processes, sort in allocation order within a process and only
+    cost a database round trip once per block. A block only joins the pool
+    once the transaction that reserved it commits; if that transaction
+    rolls back the rest of the block is dropped instead of being reused.
+    """
+
+    def __init__(self, block_size=None):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._date = None
+        self._pool = iter(())
+
+    def next_number(self):
+        today = timezone.localdate()
+        with self._lock:
+            if self._date == today:
+                value = next(self._pool, None)
+                if value is not None:
+                    return self.format(today, value)
+
+        start, end = self._reserve_block(today)
+        transaction.on_commit(
+            lambda: self._extend_pool(today, range(start + 1, end + 1)))
+        return self.format(today, start)
+
+    def format(self, day, value):
+        return f"ORD-{day:%Y%m%d}-{value:07d}"
+
+    def _reserve_block(self, day):
+        block_size = self.block_size or settings.ORDER_NUMBER_BLOCK_SIZE
+        with transaction.atomic():
+            sequence, _ = OrderNumberSequence.objects.select_for_update(
+            ).get_or_create(date=day)
+            start = sequence.last_value + 1
+            sequence.last_value += block_size
+            sequence.save(update_fields=['last_value'])
+        return start, sequence.last_value
+
+    def _extend_pool(self, day, values):
+        with self._lock:
+            if self._date != day:
+                self._date = day
+                self._pool = iter(values)
+            else:
+                self._pool = itertools.chain(self._pool, values)
+
+
+order_number_allocator = OrderNumberAllocator()
 
 
 class Order(models.Model):
@@ -103,6 +218,8 @@ class Order(models.Model):
         max_digits=10,
         decimal_places=2
     )
+    currency = models.CharField(
+        _('currency'), max_length=3, default=settings.DEFAULT_CURRENCY)
 
     # Payment Information
     payment_id = models.CharField(
@@ -121,11 +238,15 @@ class Order(models.Model):
     shipped_at = models.DateTimeField(_('shipped at'), null=True, blank=True)
     delivered_at = models.DateTimeField(
         _('delivered at'), null=True, blank=True)
+    stock_restored_at = models.DateTimeField(
+        _('stock restored at'), null=True, blank=True)
 
     # Timestamps
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
     updated_at = models.DateTimeField(_('updated at'), auto_now=True)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('order')
         verbose_name_plural = _('orders')
@@ -146,9 +267,7 @@ class Order(models.Model):
 
     def generate_order_number(self):
         """Generate unique order number"""
-        timestamp = timezone.now().strftime('%Y%m%d')
-        unique_id = uuid.uuid4().hex[:8].upper()
-        return f"ORD-{timestamp}-{unique_id}"
+        return order_number_allocator.next_number()
 
     @property
     def can_be_cancelled(self):
@@ -165,7 +284,10 @@ class Order(models.Model):
 
     def calculate_totals(self):
         """Calculate order totals from items"""
-        self.subtotal = sum(item.line_total for item in self.items.all())
+        self.subtotal = self.items.aggregate(subtotal=Coalesce(
+            Sum(F('price') * F('quantity')), Value(Decimal('0')),
+            output_field=models.DecimalField()
+        ))['subtotal']
         self.grand_total = self.subtotal + self.tax_amount + \
             self.shipping_cost - self.discount_amount
         self.save()
@@ -173,25 +295,38 @@ class Order(models.Model):
     def create_from_cart(self, cart, shipping_address, billing_address, payment_method):
         """Create order from cart"""
         from products.models import InventoryHistory
+        from .services import PricingEngine
+
+        cart_items = list(cart.items.select_related(
+            'product', 'variant').prefetch_related('product__images'))
+        quote = PricingEngine().quote(
+            cart_items,
+            country=(shipping_address or {}).get('country', ''),
+            state=(shipping_address or {}).get('state', '')
+        )
 
         # Create order
         self.user = cart.user
         self.shipping_address = shipping_address
         self.billing_address = billing_address
         self.payment_method = payment_method
-        self.subtotal = cart.subtotal
-        self.grand_total = cart.subtotal  # Tax and shipping will be added later
+        self.subtotal = quote['subtotal']
+        self.tax_amount = quote['tax_amount']
+        self.shipping_cost = quote['shipping_cost']
+        self.grand_total = quote['grand_total']
 
         self.save()
 
         # Create order items from cart items
-        for cart_item in cart.items.all():
+        for cart_item in cart_items:
             OrderItem.objects.create(
                 order=self,
                 product=cart_item.product,
                 variant=cart_item.variant,
                 quantity=cart_item.quantity,
-                price=cart_item.price
+                price=cart_item.price,
+                product_snapshot=OrderItem.build_snapshot(
+                    cart_item.product, cart_item.variant)
             )
 
             # Update inventory
@@ -252,6 +387,10 @@ class OrderItem(models.Model):
         max_digits=10,
         decimal_places=2
     )
+    # Product details as they were at checkout, so order pages never have
+    # to read (or reflect later edits to) the catalog
+    product_snapshot = models.JSONField(
+        _('product snapshot'), default=dict, blank=True)
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
 
     class Meta:
@@ -267,6 +406,21 @@ class OrderItem(models.Model):
     def line_total(self):
         return self.quantity * self.price
 
+    @staticmethod
+    def build_snapshot(product, variant=None):
+        """Compact copy of the product fields shown on order pages"""
+        images = list(product.images.all())
+        image = next((img for img in images if img.is_primary), None)
+        if image is None and images:
+            image = images[0]
+
+        return {
+            'name': product.name,
+            'sku': variant.sku if variant else product.sku,
+            'image': image.image.url if image else None,
+            'variant_name': variant.name if variant else None,
+        }
+
 
 class OrderStatusHistory(models.Model):
     order = models.ForeignKey(
@@ -294,6 +448,180 @@ class OrderStatusHistory(models.Model):
         return f"Order #{self.order.order_number} - {self.old_status} → {self.new_status}"
 
 
+class OrderSearchQuerySet(models.QuerySet):
+    def search(self, query):
+        """
+        Documents matching every term of ``query`` by token prefix, so
+        lookups use the token index instead of scanning orders.
+        """
+        queryset = self
+        for term in OrderSearchToken.normalize_query(query):
+            # A range rather than ``startswith``: LIKE with an ESCAPE clause
+            # cannot be served by the index on SQLite
+            queryset = queryset.filter(pk__in=OrderSearchToken.objects.filter(
+                token__gte=term, token__lt=term + '\uffff',
+            ).values('document_id'))
+        return queryset
+
+
+class OrderSearchDocument(models.Model):
+    """Denormalized copy of the fields support staff search orders by"""
+    order = models.OneToOneField(
+        Order,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document'
+    )
+    order_number = models.CharField(_('order number'), max_length=20)
+    customer_email = models.CharField(_('customer email'), max_length=254)
+    customer_name = models.CharField(
+        _('customer name'), max_length=300, blank=True)
+    customer_phone = models.CharField(
+        _('customer phone'), max_length=15, blank=True)
+    city = models.CharField(_('city'), max_length=100, blank=True)
+    skus = models.TextField(_('SKUs'), blank=True)
+    payment_reference = models.TextField(_('payment reference'), blank=True)
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True)
+
+    objects = OrderSearchQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _('order search document')
+        verbose_name_plural = _('order search documents')
+
+    def __str__(self):
+        return f"Search document for order #{self.order_number}"
+
+
+class OrderSearchToken(models.Model):
+    """One normalized search term of an order, matched by prefix"""
+    MAX_LENGTH = 64
+
+    document = models.ForeignKey(
+        OrderSearchDocument,
+        on_delete=models.CASCADE,
+        related_name='tokens'
+    )
+    token = models.CharField(_('token'), max_length=MAX_LENGTH, db_index=True)
+
+    class Meta:
+        verbose_name = _('order search token')
+        verbose_name_plural = _('order search tokens')
+        unique_together = ['document', 'token']
+
+    def __str__(self):
+        return self.token
+
+    @classmethod
+    def normalize(cls, value):
+        value = (value or '').strip().lower()
+        digits = ''.join(char for char in value if char.isdigit())
+        # Phone numbers are indexed and searched as bare digits
+        if digits and not value.strip('+0123456789 -().'):
+            value = digits
+        return value[:cls.MAX_LENGTH]
+
+    @classmethod
+    def normalize_query(cls, query):
+        query = query or ''
+        if cls.normalize(query).isdigit():
+            # "+251 911 234 567" is one phone number, not four terms
+            return [cls.normalize(query)]
+        terms = (cls.normalize(term) for term in query.split())
+        return [term for term in terms if term]
+
+
+class TaxRule(models.Model):
+    """Tax rate for a country, optionally narrowed to one state/region"""
+    name = models.CharField(_('name'), max_length=100)
+    country = models.CharField(_('country'), max_length=100)
+    state = models.CharField(
+        _('state/region'), max_length=100, blank=True,
+        help_text=_('Leave blank to apply to the whole country'))
+    rate = models.DecimalField(
+        _('rate'), max_digits=5, decimal_places=4,
+        help_text=_('Fraction of the taxable amount, e.g. 0.1500 for 15%'))
+    is_active = models.BooleanField(_('is active'), default=True)
+
+    class Meta:
+        verbose_name = _('tax rule')
+        verbose_name_plural = _('tax rules')
+        unique_together = ['country', 'state']
+
+    def __str__(self):
+        region = f"{self.country}/{self.state}" if self.state else self.country
+        return f"{self.name} ({region}: {self.rate:%})"
+
+
+class ShippingRate(models.Model):
+    """
+    Shipping price for a weight band within a zone. The zone is a country
+    (blank for the fallback rate) optionally narrowed to a state/region.
+    """
+    country = models.CharField(_('country'), max_length=100, blank=True)
+    state = models.CharField(_('state/region'), max_length=100, blank=True)
+    min_weight = models.DecimalField(
+        _('minimum weight (kg)'), max_digits=8, decimal_places=3, default=0)
+    max_weight = models.DecimalField(
+        _('maximum weight (kg)'), max_digits=8, decimal_places=3,
+        null=True, blank=True, help_text=_('Leave blank for no upper limit'))
+    base_cost = models.DecimalField(
+        _('base cost'), max_digits=10, decimal_places=2)
+    cost_per_kg = models.DecimalField(
+        _('cost per kg'), max_digits=10, decimal_places=2, default=0)
+    is_active = models.BooleanField(_('is active'), default=True)
+
+    class Meta:
+        verbose_name = _('shipping rate')
+        verbose_name_plural = _('shipping rates')
+        ordering = ['country', 'state', 'min_weight']
+
+    def __str__(self):
+        zone = '/'.join(part for part in [self.country, self.state] if part)
+        return f"{zone or 'Default'} from {self.min_weight}kg: {self.base_cost}"
+
+
+class ArchivedOrder(models.Model):
+    """
+    Delivered or cancelled order moved out of the hot order tables.
+
+    ``data`` holds the order exactly as ``OrderDetailSerializer`` rendered it
+    at archive time (items and status history included) and ``payments``
+    the order's payment records, so archived orders can still be served
+    without any of the original rows.
+    """
+    original_id = models.BigIntegerField(_('original order ID'), unique=True)
+    order_number = models.CharField(
+        _('order number'), max_length=20, unique=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_orders'
+    )
+    status = models.CharField(_('status'), max_length=20)
+    payment_status = models.CharField(_('payment status'), max_length=20)
+    grand_total = models.DecimalField(
+        _('grand total'), max_digits=10, decimal_places=2)
+    currency = models.CharField(
+        _('currency'), max_length=3, default=settings.DEFAULT_CURRENCY)
+    data = models.JSONField(_('order data'), encoder=DjangoJSONEncoder)
+    payments = models.JSONField(
+        _('payments'), encoder=DjangoJSONEncoder, default=list, blank=True)
+    created_at = models.DateTimeField(_('created at'))
+    archived_at = models.DateTimeField(_('archived at'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('archived order')
+        verbose_name_plural = _('archived orders')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Archived order #{self.order_number}"
+
+
 class OrderManager:
     @staticmethod
     def create_order_from_cart(user, cart, address_data, payment_method):
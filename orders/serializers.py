@@ -1,12 +1,18 @@
 from rest_framework import serializers
 from .models import Order, OrderItem, OrderStatusHistory
-from products.serializers import ProductListSerializer, ProductVariantSerializer
 from users.serializers import AddressSerializer
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    product = ProductListSerializer(read_only=True)
-    variant = ProductVariantSerializer(read_only=True)
+    """
+    Serializes order lines from their checkout snapshot.
+
+    ``product`` and ``variant`` keep the shape of the catalog serializers'
+    basic fields but are built from ``product_snapshot``, so rendering an
+    order never queries the catalog.
+    """
+    product = serializers.SerializerMethodField()
+    variant = serializers.SerializerMethodField()
     line_total = serializers.ReadOnlyField()
 
     class Meta:
@@ -16,6 +22,25 @@ class OrderItemSerializer(serializers.ModelSerializer):
             'line_total', 'created_at'
         ]
 
+    def get_product(self, obj):
+        snapshot = obj.product_snapshot
+        image = snapshot.get('image')
+        return {
+            'id': obj.product_id,
+            'name': snapshot.get('name'),
+            'sku': snapshot.get('sku'),
+            'image': image,
+            'images': [image] if image else [],
+        }
+
+    def get_variant(self, obj):
+        if not obj.variant_id:
+            return None
+        return {
+            'id': obj.variant_id,
+            'name': obj.product_snapshot.get('variant_name'),
+        }
+
 
 class OrderStatusHistorySerializer(serializers.ModelSerializer):
     created_by_email = serializers.EmailField(
@@ -29,20 +54,54 @@ class OrderStatusHistorySerializer(serializers.ModelSerializer):
         ]
 
 
+def order_thumbnail_url(order, request=None):
+    """URL of the thumbnail annotated by ``Order.objects.with_summary()``"""
+    from products.models import ProductImage
+
+    name = getattr(order, 'thumbnail', None)
+    if not name:
+        return None
+    url = ProductImage._meta.get_field('image').storage.url(name)
+    return request.build_absolute_uri(url) if request else url
+
+
 class OrderListSerializer(serializers.ModelSerializer):
     items_count = serializers.SerializerMethodField()
+    total_units = serializers.SerializerMethodField()
+    thumbnail = serializers.SerializerMethodField()
+    latest_payment_status = serializers.SerializerMethodField()
     can_be_cancelled = serializers.ReadOnlyField()
 
     class Meta:
         model = Order
         fields = [
             'id', 'order_number', 'status', 'payment_status', 'payment_method',
-            'grand_total', 'items_count', 'can_be_cancelled', 'created_at'
+            'grand_total', 'currency', 'items_count', 'total_units', 'thumbnail',
+            'latest_payment_status', 'can_be_cancelled', 'created_at'
         ]
 
+    # The list views annotate these with ``with_summary()``; the fallbacks
+    # keep the serializer usable with a plain queryset.
+
     def get_items_count(self, obj):
+        if hasattr(obj, 'items_count'):
+            return obj.items_count
         return obj.items.count()
 
+    def get_total_units(self, obj):
+        if hasattr(obj, 'total_units'):
+            return obj.total_units
+        return sum(item.quantity for item in obj.items.all())
+
+    def get_thumbnail(self, obj):
+        return order_thumbnail_url(obj, self.context.get('request'))
+
+    def get_latest_payment_status(self, obj):
+        if hasattr(obj, 'latest_payment_status'):
+            return obj.latest_payment_status
+        payment = obj.payments.order_by('-created_at', '-id').first()
+        return payment.status if payment else None
+
 
 class OrderDetailSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
@@ -58,7 +117,7 @@ class OrderDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'order_number', 'status', 'payment_status', 'payment_method',
             'shipping_address', 'billing_address', 'subtotal', 'tax_amount',
-            'shipping_cost', 'discount_amount', 'grand_total', 'items',
+            'shipping_cost', 'discount_amount', 'grand_total', 'currency', 'items',
             'payment_id', 'paid_at', 'tracking_number', 'shipped_at',
             'delivered_at', 'can_be_cancelled', 'is_paid', 'is_completed',
             'status_history', 'created_at', 'updated_at'
@@ -141,3 +200,40 @@ class OrderStatusUpdateSerializer(serializers.Serializer):
                 'This order cannot be cancelled'
             )
         return value
+
+
+class OrderBulkStatusSerializer(serializers.Serializer):
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=5000)
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+    note = serializers.CharField(required=False, allow_blank=True)
+
+
+class OrderQuoteSerializer(serializers.Serializer):
+    shipping_address_id = serializers.IntegerField(required=False)
+    country = serializers.CharField(required=False, allow_blank=True)
+    state = serializers.CharField(required=False, allow_blank=True)
+    coupon_code = serializers.CharField(required=False, allow_blank=True)
+
+    def validate(self, attrs):
+        user = self.context['request'].user
+
+        if 'shipping_address_id' in attrs:
+            from users.models import Address
+            address = None
+            if user.is_authenticated:
+                address = Address.objects.filter(
+                    id=attrs['shipping_address_id'], user=user).first()
+            if address is None:
+                raise serializers.ValidationError({
+                    'shipping_address_id': 'Shipping address not found'
+                })
+            attrs['country'] = address.country
+            attrs['state'] = address.state
+
+        if attrs.get('coupon_code') and not user.is_authenticated:
+            raise serializers.ValidationError({
+                'coupon_code': 'Log in to apply a coupon'
+            })
+
+        return attrs
@@ -0,0 +1,697 @@
+import threading
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Prefetch, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from currencies.services import VersionedSnapshot, money
+from products.models import InventoryHistory, Product, ProductVariant
+from .models import (
+    ArchivedOrder, Order, OrderItem, OrderSearchDocument, OrderSearchToken,
+    OrderStatusHistory, ShippingRate, TaxRule
+)
+from .signals import orders_transitioned
+
+
+class OrderTransitionError(Exception):
+    pass
+
+
+class OrderRestockService:
+    """
+    Return the stock of cancelled and refunded orders to the catalog.
+
+    Orders are claimed by setting ``stock_restored_at``, so running the
+    pipeline twice (or cancelling and then refunding) never restocks an
+    order more than once. Quantities go back with one conditional
+    ``UPDATE`` per stock table and the ``returned`` history rows are
+    written with ``bulk_create``.
+    """
+
+    RESTOCK_STATUSES = ('cancelled', 'refunded')
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+
+    def restock(self, order_ids, user=None):
+        """Restock the given orders and return how many orders/units moved"""
+        order_ids = list(order_ids)
+        stats = {'orders': 0, 'units': 0}
+
+        for start in range(0, len(order_ids), self.batch_size):
+            orders, units = self._restock_batch(
+                order_ids[start:start + self.batch_size], user)
+            stats['orders'] += orders
+            stats['units'] += units
+
+        return stats
+
+    def _restock_batch(self, order_ids, user):
+        with transaction.atomic():
+            claimed = dict(
+                Order.objects.select_for_update()
+                .filter(
+                    pk__in=order_ids,
+                    status__in=self.RESTOCK_STATUSES,
+                    stock_restored_at__isnull=True
+                )
+                .values_list('pk', 'order_number')
+            )
+            if not claimed:
+                return 0, 0
+
+            Order.objects.filter(pk__in=claimed).update(
+                stock_restored_at=timezone.now())
+
+            items = list(
+                OrderItem.objects.filter(order_id__in=claimed)
+                .order_by('order_id', 'id')
+                .values_list('order_id', 'product_id', 'variant_id', 'quantity')
+            )
+
+            # Variant lines were taken from the variant's stock at checkout,
+            # plain lines from the product's
+            variant_stock = self._tracked_stock(
+                ProductVariant, {item[2] for item in items if item[2]})
+            product_stock = self._tracked_stock(
+                Product, {item[1] for item in items if not item[2]})
+
+            returned_variants = {}
+            returned_products = {}
+            history = []
+            for order_id, product_id, variant_id, quantity in items:
+                if variant_id:
+                    stock, returned, key = (
+                        variant_stock, returned_variants, variant_id)
+                else:
+                    stock, returned, key = (
+                        product_stock, returned_products, product_id)
+                if key not in stock:
+                    continue
+
+                stock[key] += quantity
+                returned[key] = returned.get(key, 0) + quantity
+                history.append(InventoryHistory(
+                    product_id=product_id,
+                    action='returned',
+                    quantity_change=quantity,
+                    new_quantity=stock[key],
+                    note=f"Order #{claimed[order_id]}",
+                    created_by=user
+                ))
+
+            self._add_stock(ProductVariant, returned_variants)
+            self._add_stock(Product, returned_products)
+            InventoryHistory.objects.bulk_create(history)
+
+        units = sum(returned_variants.values()) + \
+            sum(returned_products.values())
+        return len(claimed), units
+
+    def _tracked_stock(self, model, ids):
+        if not ids:
+            return {}
+        return dict(
+            model.objects.select_for_update()
+            .filter(pk__in=ids, track_quantity=True)
+            .values_list('pk', 'quantity')
+        )
+
+    def _add_stock(self, model, returned):
+        if not returned:
+            return
+        model.objects.filter(pk__in=returned).update(
+            quantity=F('quantity') + Case(
+                *[When(pk=pk, then=Value(quantity))
+                  for pk, quantity in returned.items()],
+                default=Value(0),
+                output_field=IntegerField()
+            )
+        )
+
+
+class OrderTransitionService:
+    """
+    Central engine for order status changes.
+
+    Every status change goes through the declared ``TRANSITIONS`` table.
+    Any number of orders can be moved in one call: the rows are locked and
+    validated together, updated with a single ``UPDATE``, their history is
+    written with ``bulk_create`` and one ``orders_transitioned`` signal is
+    sent for the whole batch instead of a ``post_save`` per order.
+    Cancelled and refunded orders have their stock restored in the same
+    transaction.
+    """
+
+    TRANSITIONS = {
+        'pending': {'confirmed', 'processing', 'shipped', 'cancelled'},
+        'confirmed': {'processing', 'shipped', 'cancelled'},
+        'processing': {'shipped', 'cancelled'},
+        'shipped': {'delivered'},
+        'delivered': {'refunded'},
+        'cancelled': {'refunded'},
+        'refunded': set(),
+    }
+
+    def can_transition(self, from_status, to_status):
+        return to_status in self.TRANSITIONS.get(from_status, set())
+
+    def transition(self, order, to_status, user=None, note=''):
+        """Move a single order, raising OrderTransitionError if not allowed"""
+        result = self.bulk_transition([order.pk], to_status, user, note)
+        if result['rejected']:
+            raise OrderTransitionError(result['rejected'][order.pk])
+
+        order.refresh_from_db()
+        return order
+
+    def bulk_transition(self, order_ids, to_status, user=None, note=''):
+        """
+        Move every order in ``order_ids`` to ``to_status``.
+
+        Orders whose current status does not allow the transition are left
+        untouched and reported in ``rejected``; the rest are updated.
+        """
+        if to_status not in dict(Order.STATUS_CHOICES):
+            raise OrderTransitionError(f'Invalid status: {to_status}')
+
+        order_ids = set(order_ids)
+        rejected = {}
+
+        with transaction.atomic():
+            current = dict(
+                Order.objects.select_for_update()
+                .filter(pk__in=order_ids)
+                .values_list('pk', 'status')
+            )
+
+            for order_id in order_ids - current.keys():
+                rejected[order_id] = 'Order not found'
+
+            moved = {}
+            for order_id, from_status in current.items():
+                if self.can_transition(from_status, to_status):
+                    moved[order_id] = from_status
+                else:
+                    rejected[order_id] = (
+                        f'Cannot change order status from {from_status} '
+                        f'to {to_status}')
+
+            if moved:
+                now = timezone.now()
+                Order.objects.filter(pk__in=moved).update(
+                    status=to_status,
+                    updated_at=now,
+                    **self._status_fields(to_status, now)
+                )
+                OrderStatusHistory.objects.bulk_create([
+                    OrderStatusHistory(
+                        order_id=order_id,
+                        old_status=from_status,
+                        new_status=to_status,
+                        note=note,
+                        created_by=user
+                    )
+                    for order_id, from_status in moved.items()
+                ])
+
+                if to_status in OrderRestockService.RESTOCK_STATUSES:
+                    OrderRestockService().restock(moved, user=user)
+
+        if moved:
+            orders_transitioned.send(
+                sender=Order,
+                order_ids=list(moved),
+                old_statuses=moved,
+                new_status=to_status,
+                user=user
+            )
+
+        return {
+            'updated': sorted(moved),
+            'rejected': rejected,
+        }
+
+    def _status_fields(self, to_status, now):
+        """Extra columns set alongside the status for specific transitions"""
+        if to_status == 'shipped':
+            return {'shipped_at': Coalesce(F('shipped_at'), Value(now))}
+        if to_status == 'delivered':
+            # Cash on delivery orders are paid when they are delivered
+            return {
+                'delivered_at': Coalesce(F('delivered_at'), Value(now)),
+                'paid_at': Coalesce(F('paid_at'), Value(now)),
+                'payment_status': Value('paid'),
+            }
+        if to_status == 'cancelled':
+            return {
+                'payment_status': Case(
+                    When(payment_status='paid', then=F('payment_status')),
+                    default=Value('cancelled')
+                )
+            }
+        return {}
+
+
+class OrderArchiveService:
+    """
+    Move old, finished orders out of the hot order tables.
+
+    Orders in a final status created before the cutoff are serialized into
+    ``ArchivedOrder`` documents and their rows (items and status history
+    included) are deleted, one primary-key batch per transaction. Payments,
+    with their refunds, gateway transactions and payload log, and coupon
+    usages are financial records and stay, detached from the order
+    (``ArchivedOrder.payments`` keeps their ``payment_id``). Orders
+    referenced by reviews stay in place because reviews still read them.
+    """
+
+    ARCHIVE_STATUSES = ('delivered', 'cancelled', 'refunded')
+
+    def __init__(self, age=None, batch_size=None):
+        if age is None:
+            age = timedelta(days=settings.ORDER_ARCHIVE_AFTER_DAYS)
+        self.age = age
+        if batch_size is None:
+            batch_size = settings.ORDER_ARCHIVE_BATCH_SIZE
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.batch_size = batch_size
+
+    def archivable_orders(self, cutoff):
+        return Order.objects.filter(
+            status__in=self.ARCHIVE_STATUSES,
+            created_at__lt=cutoff,
+            review__isnull=True
+        )
+
+    def archive(self):
+        """Archive every eligible order and return the number archived"""
+        cutoff = timezone.now() - self.age
+        archived = 0
+        last_pk = 0
+
+        while True:
+            order_ids = list(
+                self.archivable_orders(cutoff)
+                .filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:self.batch_size]
+            )
+            if not order_ids:
+                break
+            last_pk = order_ids[-1]
+            archived += self._archive_batch(cutoff, order_ids)
+
+        return archived
+
+    def _archive_batch(self, cutoff, order_ids):
+        from payments.models import Payment
+        from .serializers import OrderDetailSerializer
+
+        with transaction.atomic():
+            orders = list(
+                self.archivable_orders(cutoff)
+                .select_for_update()
+                .filter(pk__in=order_ids)
+                .prefetch_related(
+                    'items',
+                    Prefetch(
+                        'status_history',
+                        queryset=OrderStatusHistory.objects.select_related(
+                            'created_by')
+                    ),
+                    Prefetch(
+                        'payments',
+                        queryset=Payment.objects.prefetch_related('refunds')
+                    )
+                )
+            )
+            if not orders:
+                return 0
+
+            ArchivedOrder.objects.bulk_create([
+                ArchivedOrder(
+                    original_id=order.pk,
+                    order_number=order.order_number,
+                    user_id=order.user_id,
+                    status=order.status,
+                    payment_status=order.payment_status,
+                    grand_total=order.grand_total,
+                    currency=order.currency,
+                    data=OrderDetailSerializer(order).data,
+                    payments=[
+                        self._payment_snapshot(payment)
+                        for payment in order.payments.all()
+                    ],
+                    created_at=order.created_at
+                )
+                for order in orders
+            ])
+            Order.objects.filter(
+                pk__in=[order.pk for order in orders]).delete()
+
+        return len(orders)
+
+    def _payment_snapshot(self, payment):
+        return {
+            'payment_id': payment.payment_id,
+            'payment_method': payment.payment_method,
+            'status': payment.status,
+            'amount': payment.amount,
+            'currency': payment.currency,
+            'gateway_payment_id': payment.gateway_payment_id,
+            'created_at': payment.created_at,
+            'completed_at': payment.completed_at,
+            'refunds': [
+                {
+                    'refund_id': refund.refund_id,
+                    'amount': refund.amount,
+                    'status': refund.status,
+                    'reason': refund.reason,
+                    'created_at': refund.created_at,
+                    'processed_at': refund.processed_at,
+                }
+                for refund in payment.refunds.all()
+            ],
+        }
+
+
+class OrderSearchIndexer:
+    """
+    Keep ``OrderSearchDocument`` rows and their prefix tokens up to date.
+
+    Orders are (re)indexed in batches: each batch is loaded with a fixed
+    number of queries and written with an upsert of the documents plus a
+    delete and ``bulk_create`` of their tokens. ``schedule`` defers the
+    work until the surrounding transaction commits and coalesces repeated
+    requests for the same orders.
+    """
+
+    _pending = threading.local()
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+
+    @classmethod
+    def schedule(cls, order_ids):
+        pending = getattr(cls._pending, 'order_ids', None)
+        if pending is None:
+            pending = cls._pending.order_ids = set()
+        pending.update(order_ids)
+        # Every call registers a flush, so ids survive a rolled back
+        # savepoint; the first flush after commit indexes them all
+        transaction.on_commit(cls._flush)
+
+    @classmethod
+    def _flush(cls):
+        order_ids = getattr(cls._pending, 'order_ids', None)
+        cls._pending.order_ids = None
+        if order_ids:
+            cls().index_orders(order_ids)
+
+    def index_orders(self, order_ids):
+        order_ids = list(order_ids)
+        indexed = 0
+        for start in range(0, len(order_ids), self.batch_size):
+            indexed += self._index_batch(
+                order_ids[start:start + self.batch_size])
+        return indexed
+
+    def rebuild(self):
+        """Index every order, walking the table in primary-key batches"""
+        indexed = 0
+        last_pk = 0
+        while True:
+            order_ids = list(
+                Order.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:self.batch_size]
+            )
+            if not order_ids:
+                return indexed
+            last_pk = order_ids[-1]
+            indexed += self._index_batch(order_ids)
+
+    def _index_batch(self, order_ids):
+        from payments.models import Payment
+
+        orders = list(
+            Order.objects.filter(pk__in=order_ids)
+            .select_related('user')
+            .prefetch_related(
+                Prefetch(
+                    'items',
+                    queryset=OrderItem.objects.select_related(
+                        'product', 'variant')
+                ),
+                Prefetch(
+                    'payments',
+                    queryset=Payment.objects.only(
+                        'order_id', 'payment_id', 'gateway_payment_id')
+                )
+            )
+        )
+        if not orders:
+            return 0
+
+        documents = [self._build_document(order) for order in orders]
+        fields = [
+            'order_number', 'customer_email', 'customer_name',
+            'customer_phone', 'city', 'skus', 'payment_reference',
+            'updated_at'
+        ]
+        now = timezone.now()
+        for document in documents:
+            document.updated_at = now
+
+        with transaction.atomic():
+            OrderSearchDocument.objects.bulk_create(
+                documents,
+                update_conflicts=True,
+                unique_fields=['order'],
+                update_fields=fields
+            )
+            OrderSearchToken.objects.filter(
+                document_id__in=[order.pk for order in orders]).delete()
+            OrderSearchToken.objects.bulk_create([
+                OrderSearchToken(document_id=document.order_id, token=token)
+                for document in documents
+                for token in self._tokens(document)
+            ])
+
+        return len(documents)
+
+    def _build_document(self, order):
+        user = order.user
+        skus = []
+        for item in order.items.all():
+            sku = item.product_snapshot.get('sku')
+            if not sku:
+                sku = item.variant.sku if item.variant else item.product.sku
+            if sku and sku not in skus:
+                skus.append(sku)
+
+        references = []
+        for payment in order.payments.all():
+            references.append(str(payment.payment_id))
+            if payment.gateway_payment_id:
+                references.append(payment.gateway_payment_id)
+
+        return OrderSearchDocument(
+            order_id=order.pk,
+            order_number=order.order_number,
+            customer_email=user.email,
+            customer_name=f"{user.first_name} {user.last_name}".strip(),
+            customer_phone=user.phone,
+            city=(order.shipping_address or {}).get('city', ''),
+            skus=' '.join(skus),
+            payment_reference=' '.join(references)
+        )
+
+    def _tokens(self, document):
+        values = [
+            document.order_number,
+            document.customer_email,
+            document.customer_email.split('@')[0],
+            document.customer_phone,
+            document.city,
+        ]
+        # Order numbers are also found by their sequence part
+        values += document.order_number.split('-')[1:]
+        values += document.customer_name.split()
+        values += document.city.split()
+        values += document.skus.split()
+        values += document.payment_reference.split()
+
+        tokens = {OrderSearchToken.normalize(value) for value in values}
+        tokens.discard('')
+        return tokens
+
+
+class PricingRules(VersionedSnapshot):
+    """Snapshot of the active tax and shipping rule tables, shared by
+    every quote"""
+
+    VERSION_KEY = 'orders:pricing_rules:version'
+
+    @staticmethod
+    def zone(country, state=''):
+        return ((country or '').strip().lower(), (state or '').strip().lower())
+
+    def load(self):
+        """Read both rule tables into plain dicts keyed by zone"""
+        tax = {
+            self.zone(rule.country, rule.state): rule.rate
+            for rule in TaxRule.objects.filter(is_active=True)
+        }
+        shipping = {}
+        for rate in ShippingRate.objects.filter(is_active=True).order_by('min_weight'):
+            shipping.setdefault(self.zone(rate.country, rate.state), []).append(
+                (rate.min_weight, rate.max_weight, rate.base_cost, rate.cost_per_kg)
+            )
+        return {'tax': tax, 'shipping': shipping}
+
+
+pricing_rules = PricingRules()
+
+
+class PricingEngine:
+    """
+    Price a set of cart or order lines in a single in-memory pass.
+
+    Lines are any objects with ``product``, ``variant``, ``quantity`` and
+    ``price`` (cart items, session cart items, order items), with their
+    products already loaded. Rules come from the ``pricing_rules`` snapshot
+    unless a snapshot is passed in, so ``quote`` itself runs no queries.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = rules
+
+    @staticmethod
+    def coupon_scope(coupon):
+        """
+        Product and category ids a coupon is limited to (``None`` when it
+        applies to everything). Loaded once per coupon, outside ``quote``.
+        """
+        if coupon is None or coupon.applies_to == 'all':
+            return None
+        if coupon.applies_to == 'products':
+            return {'products': set(coupon.products.values_list('pk', flat=True)),
+                    'categories': set()}
+        return {'products': set(),
+                'categories': set(coupon.categories.values_list('pk', flat=True))}
+
+    def quote(self, lines, country='', state='', coupon=None, coupon_scope=None):
+        rules = self.rules or pricing_rules.get()
+        zone = PricingRules.zone(country, state)
+
+        # One pass: line totals, coupon eligibility and shipping weight
+        priced = []
+        subtotal = eligible_total = Decimal('0')
+        weight = Decimal('0')
+        physical = False
+        for line in lines:
+            product = line.product
+            line_total = line.price * line.quantity
+            eligible = coupon is not None and (
+                coupon_scope is None
+                or product.pk in coupon_scope['products']
+                or product.category_id in coupon_scope['categories']
+            )
+            priced.append({
+                'line': line,
+                'line_total': line_total,
+                'eligible': eligible,
+                'discount': Decimal('0'),
+                'tax': Decimal('0'),
+            })
+            subtotal += line_total
+            if eligible:
+                eligible_total += line_total
+            if not product.is_digital:
+                physical = True
+                weight += product.weight * line.quantity
+
+        free_shipping, discount_amount = self._discount(
+            coupon, subtotal, eligible_total)
+        if discount_amount:
+            self._allocate(priced, discount_amount, eligible_total)
+
+        tax_rate = self._tax_rate(rules['tax'], zone)
+        tax_amount = Decimal('0')
+        for entry in priced:
+            if tax_rate:
+                entry['tax'] = money(
+                    (entry['line_total'] - entry['discount']) * tax_rate)
+                tax_amount += entry['tax']
+
+        shipping_cost = Decimal('0')
+        if physical and not free_shipping:
+            shipping_cost = self._shipping_cost(rules['shipping'], zone, weight)
+
+        subtotal = money(subtotal)
+        return {
+            'lines': priced,
+            'weight': weight,
+            'subtotal': subtotal,
+            'discount_amount': discount_amount,
+            'tax_amount': tax_amount,
+            'shipping_cost': shipping_cost,
+            'grand_total': subtotal - discount_amount + tax_amount + shipping_cost,
+        }
+
+    def _discount(self, coupon, subtotal, eligible_total):
+        """Return (free shipping, discount amount) for a validated coupon"""
+        if coupon is None or not eligible_total:
+            return False, Decimal('0')
+        if subtotal < coupon.minimum_order_amount:
+            return False, Decimal('0')
+        if coupon.discount_type == 'shipping':
+            return True, Decimal('0')
+        if coupon.discount_type == 'percentage':
+            amount = eligible_total * coupon.discount_value / 100
+            if coupon.maximum_discount_amount:
+                amount = min(amount, coupon.maximum_discount_amount)
+        else:
+            amount = min(coupon.discount_value, eligible_total)
+        return False, money(amount)
+
+    def _allocate(self, priced, discount_amount, eligible_total):
+        """Split the discount over eligible lines by value; the last line
+        takes the rounding remainder so the parts add up exactly"""
+        eligible = [entry for entry in priced if entry['eligible']]
+        remaining = discount_amount
+        for entry in eligible[:-1]:
+            share = money(
+                discount_amount * entry['line_total'] / eligible_total)
+            entry['discount'] = share
+            remaining -= share
+        eligible[-1]['discount'] = remaining
+
+    @staticmethod
+    def _tax_rate(tax_rules, zone):
+        country, state = zone
+        rate = tax_rules.get(zone)
+        if rate is None:
+            rate = tax_rules.get((country, ''))
+        return rate or Decimal('0')
+
+    def _shipping_cost(self, shipping_rules, zone, weight):
+        country, _state = zone
+        for key in (zone, (country, ''), ('', '')):
+            bands = shipping_rules.get(key)
+            if not bands:
+                continue
+            cost = None
+            for min_weight, max_weight, base_cost, cost_per_kg in bands:
+                if weight >= min_weight and (max_weight is None or weight < max_weight):
+                    cost = base_cost + cost_per_kg * weight
+            if cost is not None:
+                return money(cost)
+        return Decimal('0')
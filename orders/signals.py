@@ -1,6 +1,17 @@
-from django.db.models.signals import post_save, pre_save
-from django.dispatch import receiver
-from .models import Order, OrderStatusHistory
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+from .models import Order, OrderStatusHistory, ShippingRate, TaxRule
+
+# Sent once per OrderTransitionService batch with order_ids, old_statuses
+# (order id -> previous status), new_status and user. Batched transitions
+# use queryset updates, so the post_save receivers below do not fire.
+orders_transitioned = Signal()
+
+logger = logging.getLogger(__name__)
 
 
 @receiver(pre_save, sender=Order)
@@ -43,10 +54,68 @@ def send_order_notifications(sender, instance, created, **kwargs):
     """
     if created:
         # Send order confirmation email
-        print(
-            f"Order #{instance.order_number} created - sending confirmation email")
+        logger.info(
+            "Order #%s created - sending confirmation email", instance.order_number)
 
     # Send status update notifications
     if not created and instance.status in ['shipped', 'delivered']:
-        print(
-            f"Order #{instance.order_number} status updated to {instance.status} - sending notification")
+        logger.info(
+            "Order #%s status updated to %s - sending notification",
+            instance.order_number, instance.status)
+
+
+@receiver(orders_transitioned)
+def send_batch_status_notifications(sender, order_ids, new_status, **kwargs):
+    """
+    Send notifications for a batch of status changes
+    """
+    if new_status in ['shipped', 'delivered']:
+        logger.info(
+            "%s orders updated to %s - sending notifications",
+            len(order_ids), new_status)
+
+
+@receiver(post_save, sender=Order)
+def index_order_for_search(sender, instance, **kwargs):
+    """
+    Refresh the order's search document once the transaction commits
+    (after checkout has added its items)
+    """
+    from .services import OrderSearchIndexer
+
+    OrderSearchIndexer.schedule([instance.pk])
+
+
+@receiver(post_save, sender='payments.Payment')
+def index_payment_reference_for_search(sender, instance, **kwargs):
+    from .services import OrderSearchIndexer
+
+    OrderSearchIndexer.schedule([instance.order_id])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def reindex_customer_orders(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Keep customer details in the search index current
+    """
+    searchable = {'email', 'first_name', 'last_name', 'phone'}
+    if created or (update_fields is not None and not searchable & set(update_fields)):
+        return
+
+    from .services import OrderSearchIndexer
+
+    order_ids = list(instance.orders.values_list('pk', flat=True))
+    if order_ids:
+        OrderSearchIndexer.schedule(order_ids)
+
+
+@receiver([post_save, post_delete], sender=TaxRule)
+@receiver([post_save, post_delete], sender=ShippingRate)
+def invalidate_pricing_rules(sender, **kwargs):
+    """
+    Drop the cached tax/shipping rule snapshot so quotes pick up the change,
+    once it is committed
+    """
+    from .services import pricing_rules
+
+    transaction.on_commit(pricing_rules.invalidate)
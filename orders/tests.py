@@ -1,11 +1,34 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
-from .models import Order, OrderItem
+from .models import (
+    ArchivedOrder, Order, OrderItem, OrderNumberAllocator,
+    OrderNumberSequence, OrderSearchDocument, OrderStatusHistory,
+    ShippingRate, TaxRule
+)
+from .services import (
+    OrderArchiveService, OrderRestockService, OrderSearchIndexer,
+    OrderTransitionService, OrderTransitionError, PricingEngine, PricingRules,
+    pricing_rules
+)
+from .signals import orders_transitioned
 from users.models import User, Address
-from products.models import Product, Category, Brand
+from products.models import (
+    Product, ProductImage, ProductVariant, Category, Brand, InventoryHistory
+)
 from cart.models import Cart, CartItem
+from coupons.models import Coupon, CouponUsage
+from payments.models import Payment, Refund
 
 
 class OrderModelTests(TestCase):
@@ -159,6 +182,28 @@ class OrderAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
 
+    def test_order_detail_uses_product_snapshot(self):
+        data = {
+            'shipping_address_id': self.shipping_address.id,
+            'billing_address_id': self.billing_address.id,
+            'payment_method': 'stripe'
+        }
+        self.client.post(self.order_create_url, data)
+        order = Order.objects.get()
+
+        # Later catalog edits must not change what the order shows
+        Product.objects.filter(pk=self.product.pk).update(name="Renamed")
+
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse('orders:order-detail', args=[order.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        item = response.data['items'][0]
+        self.assertEqual(item['product']['id'], self.product.id)
+        self.assertEqual(item['product']['name'], "Test Product")
+        self.assertEqual(item['product']['sku'], "TEST-001")
+        self.assertIsNone(item['variant'])
+
     def test_create_order_empty_cart(self):
         # Clear cart
         self.cart.clear()
@@ -170,3 +215,610 @@ class OrderAPITests(APITestCase):
         }
         response = self.client.post(self.order_create_url, data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class OrderListSummaryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='summary@example.com',
+            username='summaryuser',
+            password='testpass'
+        )
+        self.category = Category.objects.create(name="Electronics")
+        self.brand = Brand.objects.create(name="Samsung")
+        self.product = Product.objects.create(
+            name="Test Product",
+            description="Test Description",
+            category=self.category,
+            brand=self.brand,
+            price=100.00,
+            sku="TEST-001",
+            quantity=10,
+            status="published"
+        )
+        ProductImage.objects.create(
+            product=self.product, image='products/test.jpg', is_primary=True)
+        self.client.force_authenticate(user=self.user)
+        self.order_list_url = reverse('orders:order-list')
+
+    def create_orders(self, count):
+        from payments.models import Payment
+
+        for _ in range(count):
+            order = Order.objects.create(
+                user=self.user,
+                shipping_address={},
+                billing_address={},
+                payment_method='stripe',
+                subtotal=300.00,
+                grand_total=300.00
+            )
+            OrderItem.objects.create(
+                order=order, product=self.product, quantity=2, price=100.00)
+            OrderItem.objects.create(
+                order=order, product=self.product, quantity=1, price=100.00)
+            Payment.objects.create(
+                order=order, user=self.user, payment_method='stripe',
+                amount=300.00, status='completed')
+
+    def get_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.order_list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def test_order_list_summary_fields(self):
+        self.create_orders(1)
+        _, response = self.get_query_count()
+        order = response.data['results'][0]
+        self.assertEqual(order['items_count'], 2)
+        self.assertEqual(order['total_units'], 3)
+        self.assertEqual(order['latest_payment_status'], 'completed')
+        self.assertTrue(order['thumbnail'].endswith('products/test.jpg'))
+
+    def test_order_list_query_count_is_constant(self):
+        self.create_orders(5)
+        small_count, _ = self.get_query_count()
+        self.create_orders(15)
+        large_count, response = self.get_query_count()
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(small_count, large_count)
+
+
+class OrderTransitionServiceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='transition@example.com',
+            username='transitionuser',
+            password='testpass'
+        )
+        self.staff = User.objects.create_user(
+            email='staff@example.com',
+            username='staffuser',
+            password='testpass',
+            is_staff=True
+        )
+        self.service = OrderTransitionService()
+
+    def create_orders(self, count, **kwargs):
+        return [
+            Order.objects.create(
+                user=self.user,
+                shipping_address={},
+                billing_address={},
+                payment_method='cash_on_delivery',
+                subtotal=100.00,
+                grand_total=100.00,
+                **kwargs
+            )
+            for _ in range(count)
+        ]
+
+    def test_bulk_transition_writes_history_and_sends_one_signal(self):
+        orders = self.create_orders(3)
+        received = []
+
+        def handler(sender, **kwargs):
+            received.append(kwargs)
+
+        orders_transitioned.connect(handler)
+        try:
+            result = self.service.bulk_transition(
+                [order.pk for order in orders], 'confirmed', user=self.staff,
+                note='Bulk confirm')
+        finally:
+            orders_transitioned.disconnect(handler)
+
+        self.assertEqual(result['updated'], sorted(o.pk for o in orders))
+        self.assertEqual(result['rejected'], {})
+        self.assertEqual(
+            Order.objects.filter(status='confirmed').count(), 3)
+        self.assertEqual(
+            OrderStatusHistory.objects.filter(
+                new_status='confirmed', created_by=self.staff).count(), 3)
+        self.assertEqual(len(received), 1)
+        self.assertEqual(sorted(received[0]['order_ids']), result['updated'])
+
+    def test_bulk_transition_rejects_disallowed_orders(self):
+        pending = self.create_orders(1)[0]
+        delivered = self.create_orders(1, status='delivered')[0]
+
+        result = self.service.bulk_transition(
+            [pending.pk, delivered.pk, 999999], 'shipped')
+
+        self.assertEqual(result['updated'], [pending.pk])
+        self.assertIn(delivered.pk, result['rejected'])
+        self.assertIn(999999, result['rejected'])
+        delivered.refresh_from_db()
+        self.assertEqual(delivered.status, 'delivered')
+        pending.refresh_from_db()
+        self.assertIsNotNone(pending.shipped_at)
+
+    def test_delivered_marks_order_paid(self):
+        order = self.create_orders(1, status='shipped')[0]
+        self.service.transition(order, 'delivered')
+        self.assertEqual(order.payment_status, 'paid')
+        self.assertIsNotNone(order.paid_at)
+        self.assertIsNotNone(order.delivered_at)
+
+    def test_transition_raises_for_disallowed_status(self):
+        order = self.create_orders(1, status='refunded')[0]
+        with self.assertRaises(OrderTransitionError):
+            self.service.transition(order, 'pending')
+
+    def test_bulk_transition_query_count_is_constant(self):
+        small = [order.pk for order in self.create_orders(3)]
+        large = [order.pk for order in self.create_orders(12)]
+
+        with CaptureQueriesContext(connection) as small_queries:
+            self.service.bulk_transition(small, 'processing')
+        with CaptureQueriesContext(connection) as large_queries:
+            self.service.bulk_transition(large, 'processing')
+        self.assertEqual(len(small_queries), len(large_queries))
+
+    def test_bulk_update_status_endpoint(self):
+        orders = self.create_orders(2)
+        client = APIClient()
+        client.force_authenticate(user=self.staff)
+
+        response = client.post(
+            reverse('orders:admin-order-bulk-update-status'),
+            {'order_ids': [order.pk for order in orders],
+             'status': 'processing'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['updated']), 2)
+
+
+class OrderRestockServiceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='restock@example.com',
+            username='restockuser',
+            password='testpass'
+        )
+        self.category = Category.objects.create(name="Electronics")
+        self.brand = Brand.objects.create(name="Samsung")
+        self.product = Product.objects.create(
+            name="Test Product",
+            description="Test Description",
+            category=self.category,
+            brand=self.brand,
+            price=100.00,
+            sku="TEST-001",
+            quantity=5,
+            status="published"
+        )
+        self.variant = ProductVariant.objects.create(
+            product=self.product, name="Large", sku="TEST-001-L", quantity=2)
+
+    def create_order(self, status='pending'):
+        order = Order.objects.create(
+            user=self.user,
+            shipping_address={},
+            billing_address={},
+            payment_method='stripe',
+            subtotal=500.00,
+            grand_total=500.00,
+            status=status
+        )
+        OrderItem.objects.create(
+            order=order, product=self.product, quantity=3, price=100.00)
+        OrderItem.objects.create(
+            order=order, product=self.product, variant=self.variant,
+            quantity=2, price=100.00)
+        return order
+
+    def test_cancel_restores_stock_once(self):
+        order = self.create_order()
+        OrderTransitionService().transition(order, 'cancelled')
+        OrderTransitionService().transition(order, 'refunded')
+        OrderRestockService().restock([order.pk])
+
+        self.product.refresh_from_db()
+        self.variant.refresh_from_db()
+        self.assertEqual(self.product.quantity, 8)
+        self.assertEqual(self.variant.quantity, 4)
+        self.assertIsNotNone(order.stock_restored_at)
+        self.assertEqual(
+            InventoryHistory.objects.filter(action='returned').count(), 2)
+
+    def test_restock_batch_skips_active_and_untracked(self):
+        cancelled = [self.create_order('cancelled') for _ in range(3)]
+        active = self.create_order()
+        Product.objects.filter(pk=self.product.pk).update(
+            track_quantity=False)
+
+        stats = OrderRestockService(batch_size=2).restock(
+            [order.pk for order in cancelled] + [active.pk])
+
+        self.assertEqual(stats, {'orders': 3, 'units': 6})
+        self.product.refresh_from_db()
+        self.variant.refresh_from_db()
+        self.assertEqual(self.product.quantity, 5)
+        self.assertEqual(self.variant.quantity, 8)
+        active.refresh_from_db()
+        self.assertIsNone(active.stock_restored_at)
+
+
+class OrderArchiveServiceTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='archive@example.com',
+            username='archiveuser',
+            password='testpass'
+        )
+        self.category = Category.objects.create(name="Electronics")
+        self.brand = Brand.objects.create(name="Samsung")
+        self.product = Product.objects.create(
+            name="Test Product",
+            description="Test Description",
+            category=self.category,
+            brand=self.brand,
+            price=100.00,
+            sku="TEST-001",
+            quantity=10,
+            status="published"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def create_order(self, status, days_old):
+        order = Order.objects.create(
+            user=self.user,
+            shipping_address={},
+            billing_address={},
+            payment_method='stripe',
+            subtotal=200.00,
+            grand_total=200.00,
+            status=status
+        )
+        OrderItem.objects.create(
+            order=order, product=self.product, quantity=2, price=100.00,
+            product_snapshot={'name': 'Test Product', 'sku': 'TEST-001'})
+        Order.objects.filter(pk=order.pk).update(
+            created_at=timezone.now() - timedelta(days=days_old))
+        return order
+
+    def test_archive_moves_old_finished_orders(self):
+        old = [self.create_order('delivered', 400) for _ in range(3)]
+        recent = self.create_order('delivered', 10)
+        active = self.create_order('processing', 400)
+
+        archived = OrderArchiveService(
+            age=timedelta(days=365), batch_size=2).archive()
+
+        self.assertEqual(archived, 3)
+        self.assertEqual(
+            set(Order.objects.values_list('pk', flat=True)),
+            {recent.pk, active.pk})
+        self.assertFalse(OrderItem.objects.filter(
+            order_id__in=[order.pk for order in old]).exists())
+        archived_order = ArchivedOrder.objects.get(original_id=old[0].pk)
+        self.assertEqual(archived_order.order_number, old[0].order_number)
+        self.assertEqual(len(archived_order.payments), 1)
+
+    def test_archive_keeps_payments_refunds_and_coupon_usages(self):
+        order = self.create_order('refunded', 400)
+        payment = order.payments.get()
+        refund = Refund.objects.create(
+            payment=payment, amount=50, reason='Damaged', status='processed')
+        coupon = Coupon.objects.create(
+            code='ONCE', name='Once', discount_type='fixed',
+            discount_value=10, usage_limit_per_user=1)
+        coupon.mark_used(self.user, order, 10)
+
+        self.assertEqual(
+            OrderArchiveService(age=timedelta(days=365)).archive(), 1)
+
+        self.assertFalse(Order.objects.filter(pk=order.pk).exists())
+        payment = Payment.objects.get(pk=payment.pk)
+        self.assertIsNone(payment.order_id)
+        self.assertTrue(Refund.objects.filter(pk=refund.pk, payment=payment).exists())
+        self.assertEqual(
+            ArchivedOrder.objects.get(original_id=order.pk).payments[0]['payment_id'],
+            str(payment.payment_id))
+        self.assertEqual(CouponUsage.objects.filter(user=self.user).count(), 1)
+
+    def test_archived_order_detail_is_served_from_archive(self):
+        order = self.create_order('delivered', 400)
+        OrderArchiveService(age=timedelta(days=365)).archive()
+
+        response = self.client.get(
+            reverse('orders:order-detail', args=[order.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['order_number'], order.order_number)
+        self.assertEqual(
+            response.data['items'][0]['product']['name'], 'Test Product')
+
+    def test_archived_order_detail_is_private(self):
+        order = self.create_order('delivered', 400)
+        OrderArchiveService(age=timedelta(days=365)).archive()
+
+        other = User.objects.create_user(
+            email='other@example.com', username='other', password='testpass')
+        self.client.force_authenticate(user=other)
+        response = self.client.get(
+            reverse('orders:order-detail', args=[order.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+    def test_rejects_batch_size_below_one(self):
+        for batch_size in [0, -1]:
+            with self.assertRaises(ValueError):
+                OrderArchiveService(batch_size=batch_size)
+            with self.assertRaisesMessage(
+                    CommandError, '--batch-size must be at least 1'):
+                call_command('archive_orders', batch_size=batch_size)
+
+class OrderNumberAllocatorTests(TransactionTestCase):
+    def test_numbers_are_unique_and_sortable(self):
+        allocator = OrderNumberAllocator(block_size=3)
+        numbers = [allocator.next_number() for _ in range(7)]
+
+        self.assertEqual(len(set(numbers)), 7)
+        self.assertEqual(numbers, sorted(numbers))
+        self.assertTrue(all(len(number) == 20 for number in numbers))
+        # Seven numbers from blocks of three take three reservations
+        self.assertEqual(
+            OrderNumberSequence.objects.get().last_value, 9)
+
+    def test_block_from_rolled_back_transaction_is_not_reused(self):
+        allocator = OrderNumberAllocator(block_size=5)
+        other_process = OrderNumberAllocator(block_size=5)
+
+        with transaction.atomic():
+            first = allocator.next_number()
+            transaction.set_rollback(True)
+        reserved_elsewhere = other_process.next_number()
+        after_rollback = allocator.next_number()
+
+        self.assertEqual(first, reserved_elsewhere)
+        self.assertNotEqual(after_rollback, reserved_elsewhere)
+        self.assertEqual(OrderNumberSequence.objects.get().last_value, 10)
+
+
+class OrderSearchIndexTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='abebe@example.com',
+            username='abebe',
+            password='testpass',
+            first_name='Abebe',
+            last_name='Kebede',
+            phone='+251911234567'
+        )
+        self.category = Category.objects.create(name="Electronics")
+        self.brand = Brand.objects.create(name="Samsung")
+        self.product = Product.objects.create(
+            name="Test Product",
+            description="Test Description",
+            category=self.category,
+            brand=self.brand,
+            price=100.00,
+            sku="PHONE-X1",
+            quantity=10,
+            status="published"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order = Order.objects.create(
+                user=self.user,
+                shipping_address={'city': 'Addis Ababa'},
+                billing_address={},
+                payment_method='stripe',
+                subtotal=100.00,
+                grand_total=100.00
+            )
+            OrderItem.objects.create(
+                order=self.order, product=self.product, quantity=1,
+                price=100.00)
+
+    def search(self, query):
+        return list(
+            OrderSearchDocument.objects.search(query)
+            .values_list('order_id', flat=True)
+        )
+
+    def test_search_by_support_lookup_fields(self):
+        sequence = self.order.order_number.split('-')[-1]
+        payment = self.order.payments.get()
+        for query in ['abe', 'ABEBE@EXAMPLE', '251911', '+251 911 234',
+                      'addis', 'ababa', 'phone-x', self.order.order_number,
+                      sequence, str(payment.payment_id)[:8],
+                      'kebede addis']:
+            self.assertEqual(self.search(query), [self.order.pk], query)
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search('abebe gondar'), [])
+
+    def test_customer_changes_are_reindexed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.email = 'almaz@example.com'
+            self.user.save()
+        self.assertEqual(self.search('almaz'), [self.order.pk])
+        self.assertEqual(self.search('abebe@'), [])
+
+    def test_rebuild_indexes_every_order(self):
+        OrderSearchDocument.objects.all().delete()
+        self.assertEqual(OrderSearchIndexer(batch_size=1).rebuild(), 1)
+        self.assertEqual(self.search('phone-x1'), [self.order.pk])
+
+    def test_search_uses_token_index(self):
+        plan = OrderSearchDocument.objects.search('abe kebede').explain()
+        self.assertEqual(
+            plan.count('USING INDEX orders_ordersearchtoken_token_'), 2, plan)
+        self.assertNotIn('SCAN', plan)
+
+
+class PricingEngineTests(APITestCase):
+    def setUp(self):
+        # Rows vanish with the test transaction without firing signals
+        self.addCleanup(pricing_rules.invalidate)
+
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass'
+        )
+        self.category = Category.objects.create(name="Electronics")
+        self.brand = Brand.objects.create(name="Samsung")
+        self.product = Product.objects.create(
+            name="Test Product",
+            description="Test Description",
+            category=self.category,
+            brand=self.brand,
+            price=100.00,
+            sku="TEST-001",
+            quantity=10,
+            weight=Decimal('1.5'),
+            status="published"
+        )
+        self.ebook = Product.objects.create(
+            name="Test Ebook",
+            description="Test Description",
+            category=self.category,
+            brand=self.brand,
+            price=50.00,
+            sku="EBOOK-001",
+            quantity=10,
+            is_digital=True,
+            status="published"
+        )
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(
+            cart=self.cart, product=self.product, quantity=2, price=100.00)
+        CartItem.objects.create(
+            cart=self.cart, product=self.ebook, quantity=1, price=50.00)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TaxRule.objects.create(
+                name='VAT', country='Ethiopia', rate=Decimal('0.15'))
+            TaxRule.objects.create(
+                name='Oromia VAT', country='Ethiopia', state='Oromia',
+                rate=Decimal('0.10'))
+            ShippingRate.objects.create(
+                country='Ethiopia', min_weight=0, max_weight=5, base_cost=50,
+                cost_per_kg=10)
+            ShippingRate.objects.create(
+                country='Ethiopia', min_weight=5, base_cost=100)
+            ShippingRate.objects.create(base_cost=200)
+
+    def quote(self, country, state='', coupon=None):
+        engine = PricingEngine()
+        return engine.quote(
+            list(self.cart.items.select_related('product', 'variant')),
+            country, state, coupon=coupon,
+            coupon_scope=engine.coupon_scope(coupon)
+        )
+
+    def test_quote_applies_region_tax_and_weight_band(self):
+        quote = self.quote('Ethiopia', 'Amhara')
+        self.assertEqual(quote['subtotal'], Decimal('250.00'))
+        self.assertEqual(quote['tax_amount'], Decimal('37.50'))
+        # Only the 3kg of physical goods are shipped: 50 + 3 * 10
+        self.assertEqual(quote['shipping_cost'], Decimal('80.00'))
+        self.assertEqual(quote['grand_total'], Decimal('367.50'))
+
+        self.assertEqual(self.quote('ethiopia', 'oromia')['tax_amount'],
+                         Decimal('25.00'))
+        fallback = self.quote('Kenya')
+        self.assertEqual(fallback['tax_amount'], Decimal('0'))
+        self.assertEqual(fallback['shipping_cost'], Decimal('200.00'))
+
+    def test_coupon_discounts_only_eligible_lines(self):
+        coupon = Coupon.objects.create(
+            code='TENOFF', name='Ten off', discount_type='percentage',
+            discount_value=10, applies_to='products')
+        coupon.products.add(self.product)
+
+        quote = self.quote('Ethiopia', coupon=coupon)
+        self.assertEqual(quote['discount_amount'], Decimal('20.00'))
+        self.assertEqual(
+            [entry['discount'] for entry in quote['lines']],
+            [Decimal('20.00'), Decimal('0')])
+        self.assertEqual(quote['tax_amount'], Decimal('34.50'))
+        self.assertEqual(quote['grand_total'], Decimal('344.50'))
+
+    def test_fixed_coupon_is_split_by_line_value(self):
+        coupon = Coupon.objects.create(
+            code='THIRTY', name='Thirty off', discount_type='fixed',
+            discount_value=30)
+
+        quote = self.quote('Ethiopia', coupon=coupon)
+        self.assertEqual(
+            [entry['discount'] for entry in quote['lines']],
+            [Decimal('24.00'), Decimal('6.00')])
+
+    def test_rule_changes_invalidate_the_snapshot(self):
+        self.assertEqual(self.quote('Ethiopia')['tax_amount'], Decimal('37.50'))
+        with self.captureOnCommitCallbacks(execute=True):
+            TaxRule.objects.filter(country='Ethiopia', state='').get().delete()
+        self.assertEqual(self.quote('Ethiopia')['tax_amount'], Decimal('0'))
+
+    def test_snapshot_is_invalidated_only_on_commit(self):
+        self.quote('Ethiopia')
+        version = cache.get(PricingRules.VERSION_KEY, 0)
+        with self.captureOnCommitCallbacks() as callbacks:
+            TaxRule.objects.filter(country='Ethiopia', state='').update(
+                rate=Decimal('0.20'))
+            ShippingRate.objects.get(base_cost=200).save()
+        # Uncommitted rules must not be loaded under a new version
+        self.assertEqual(cache.get(PricingRules.VERSION_KEY, 0), version)
+        self.assertEqual(callbacks, [pricing_rules.invalidate])
+
+        callbacks[0]()
+        self.assertEqual(cache.get(PricingRules.VERSION_KEY), version + 1)
+        self.assertEqual(self.quote('Ethiopia')['tax_amount'], Decimal('50.00'))
+
+    def test_quote_api_writes_nothing(self):
+        self.client.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('orders:order-quote'),
+                {'country': 'Ethiopia', 'state': 'Oromia'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['grand_total'], '355.00')
+        self.assertEqual(len(response.data['items']), 2)
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if not query['sql'].lstrip().upper().startswith('SELECT')
+        ])
+
+    def test_checkout_totals_come_from_the_engine(self):
+        address = Address.objects.create(
+            user=self.user, address_type='shipping', street="1 Bole Rd",
+            city="Addis Ababa", state="Addis Ababa", country="Ethiopia",
+            zip_code="1000")
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse('orders:order-create'), {
+            'shipping_address_id': address.id,
+            'billing_address_id': address.id,
+            'payment_method': 'cash_on_delivery'
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get()
+        self.assertEqual(order.tax_amount, Decimal('37.50'))
+        self.assertEqual(order.shipping_cost, Decimal('80.00'))
+        self.assertEqual(order.grand_total, Decimal('367.50'))
@@ -16,6 +16,7 @@ urlpatterns = [
     # API Endpoints - KEEP THESE
     path('', views.OrderListView.as_view(), name='order-list'),
     path('create/', views.OrderCreateView.as_view(), name='order-create'),
+    path('quote/', views.OrderQuoteView.as_view(), name='order-quote'),
     path('<int:pk>/', views.OrderDetailView.as_view(),
          name='order-detail'),  # API endpoint
     path('<int:order_id>/cancel/',
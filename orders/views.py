@@ -5,13 +5,21 @@ from rest_framework.views import APIView
 from rest_framework.decorators import action
 from rest_framework.viewsets import ModelViewSet
 from django.shortcuts import get_object_or_404
+from django.http import Http404
 from django.db import transaction
-from .models import Order, OrderItem, OrderStatusHistory, OrderManager
+from django.db.models import Prefetch
+from .models import (
+    ArchivedOrder, Order, OrderItem, OrderStatusHistory, OrderManager
+)
 from .serializers import (
     OrderListSerializer, OrderDetailSerializer, OrderCreateSerializer,
-    OrderUpdateSerializer, OrderStatusUpdateSerializer
+    OrderUpdateSerializer, OrderStatusUpdateSerializer,
+    OrderBulkStatusSerializer, OrderQuoteSerializer
+)
+from .services import (
+    OrderTransitionService, OrderTransitionError, PricingEngine
 )
-from cart.models import CartManager
+from cart.models import Cart, CartManager, SessionCart
 
 
 class OrderListView(generics.ListAPIView):
@@ -19,7 +27,7 @@ class OrderListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).prefetch_related('items')
+        return Order.objects.filter(user=self.request.user).with_summary()
 
 
 class OrderDetailView(generics.RetrieveAPIView):
@@ -28,9 +36,22 @@ class OrderDetailView(generics.RetrieveAPIView):
 
     def get_queryset(self):
         return Order.objects.filter(user=self.request.user).prefetch_related(
-            'items', 'items__product', 'items__variant', 'status_history'
+            'items',
+            Prefetch('status_history',
+                     queryset=OrderStatusHistory.objects.select_related('created_by'))
         )
 
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            # Fall back to the archive for old, finished orders
+            archived = ArchivedOrder.objects.filter(
+                original_id=kwargs['pk'], user=request.user).first()
+            if archived is None:
+                raise
+            return Response(archived.data)
+
 
 class OrderCreateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -109,23 +130,14 @@ class OrderCancelView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Update order status
-        old_status = order.status
-        order.status = 'cancelled'
-        order.payment_status = 'cancelled'
-        order.save()
-
-        # Record status history
-        OrderStatusHistory.objects.create(
-            order=order,
-            old_status=old_status,
-            new_status='cancelled',
-            note='Cancelled by user',
-            created_by=request.user
-        )
-
-        # Restore inventory (simplified - in real app, handle this carefully)
-        # This would need proper inventory restoration logic
+        try:
+            OrderTransitionService().transition(
+                order, 'cancelled', user=request.user, note='Cancelled by user')
+        except OrderTransitionError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         order_serializer = OrderDetailSerializer(order)
         return Response({
@@ -146,33 +158,18 @@ class OrderStatusUpdateView(APIView):
         )
 
         if serializer.is_valid():
-            old_status = order.status
-            new_status = serializer.validated_data['status']
-            note = serializer.validated_data.get('note', '')
-
-            # Update order status
-            order.status = new_status
-            order.save()
-
-            # Record status history
-            OrderStatusHistory.objects.create(
-                order=order,
-                old_status=old_status,
-                new_status=new_status,
-                note=note,
-                created_by=request.user
-            )
-
-            # Handle specific status updates
-            if new_status == 'shipped' and not order.shipped_at:
-                from django.utils import timezone
-                order.shipped_at = timezone.now()
-                order.save()
-            elif new_status == 'delivered' and not order.delivered_at:
-                from django.utils import timezone
-                order.delivered_at = timezone.now()
-                order.payment_status = 'paid'  # Mark as paid when delivered
-                order.save()
+            try:
+                OrderTransitionService().transition(
+                    order,
+                    serializer.validated_data['status'],
+                    user=request.user,
+                    note=serializer.validated_data.get('note', '')
+                )
+            except OrderTransitionError as e:
+                return Response(
+                    {'error': str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
             order_serializer = OrderDetailSerializer(order)
             return Response({
@@ -187,6 +184,11 @@ class OrderAdminViewSet(ModelViewSet):
     queryset = Order.objects.all().prefetch_related('items', 'status_history')
     permission_classes = [permissions.IsAdminUser]
 
+    def get_queryset(self):
+        if self.action == 'list':
+            return Order.objects.all().with_summary()
+        return super().get_queryset()
+
     def get_serializer_class(self):
         if self.action == 'list':
             return OrderListSerializer
@@ -194,7 +196,99 @@ class OrderAdminViewSet(ModelViewSet):
 
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
-        return OrderStatusUpdateView.as_view()(request, order_id=pk)
+        return OrderStatusUpdateView().post(request, order_id=pk)
+
+    @action(detail=False, methods=['post'])
+    def bulk_update_status(self, request):
+        """Move many orders to one status (bulk confirm, bulk ship)"""
+        serializer = OrderBulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            result = OrderTransitionService().bulk_transition(
+                serializer.validated_data['order_ids'],
+                serializer.validated_data['status'],
+                user=request.user,
+                note=serializer.validated_data.get('note', '')
+            )
+        except OrderTransitionError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            'message': f"{len(result['updated'])} orders updated",
+            'updated': result['updated'],
+            'rejected': result['rejected'],
+        }, status=status.HTTP_200_OK)
+
+
+class OrderQuoteView(APIView):
+    """
+    Price the current cart (subtotal, coupon, tax and shipping) for the
+    cart page. Nothing is written: no cart rows, no session changes.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        serializer = OrderQuoteSerializer(
+            data=request.query_params, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        if request.user.is_authenticated:
+            cart = Cart.objects.filter(user=request.user).first()
+            items = list(cart.items.select_related('product', 'variant')) \
+                if cart else []
+        else:
+            items = list(SessionCart(request.session).items.all())
+
+        engine = PricingEngine()
+        coupon = coupon_scope = None
+        coupon_code = data.get('coupon_code')
+        if coupon_code:
+            from coupons.services import CouponService
+
+            subtotal = sum(item.line_total for item in items)
+            result = CouponService().validate_coupon(
+                code=coupon_code, user=request.user, order_amount=subtotal)
+            if not result['valid']:
+                return Response(
+                    {'error': result['error']},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            coupon = result['coupon']
+            coupon_scope = engine.coupon_scope(coupon)
+
+        quote = engine.quote(
+            items,
+            country=data.get('country', ''),
+            state=data.get('state', ''),
+            coupon=coupon,
+            coupon_scope=coupon_scope
+        )
+
+        return Response({
+            'items': [
+                {
+                    'id': entry['line'].id,
+                    'product_id': entry['line'].product_id,
+                    'variant_id': entry['line'].variant_id,
+                    'quantity': entry['line'].quantity,
+                    'line_total': str(entry['line_total']),
+                    'discount': str(entry['discount']),
+                    'tax': str(entry['tax']),
+                }
+                for entry in quote['lines']
+            ],
+            'coupon_code': coupon.code if coupon else None,
+            'subtotal': str(quote['subtotal']),
+            'discount_amount': str(quote['discount_amount']),
+            'tax_amount': str(quote['tax_amount']),
+            'shipping_cost': str(quote['shipping_cost']),
+            'grand_total': str(quote['grand_total']),
+        }, status=status.HTTP_200_OK)
 
 
 class OrderStatsView(APIView):
@@ -1,7 +1,13 @@
 # payments/admin.py - Use this version
+import json
+
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Payment, Refund, CBETransaction, TeleBirrTransaction, PaymentGateway
+from .models import (
+    Payment, Refund, CBETransaction, TeleBirrTransaction, PaymentGateway,
+    GatewayPayload, WebhookEvent
+)
+from .services import webhook_inbox
 
 
 class RefundInline(admin.TabularInline):
@@ -28,6 +34,24 @@ class TeleBirrTransactionInline(admin.StackedInline):
               'ussd_code', 'qr_code_url', 'callback_received']
 
 
+class GatewayPayloadInline(admin.TabularInline):
+    model = GatewayPayload
+    fk_name = 'payment'
+    extra = 0
+    can_delete = False
+    fields = ['created_at', 'source', 'encoding', 'size', 'payload_display']
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def payload_display(self, obj):
+        return format_html(
+            '<pre style="white-space: pre-wrap">{}</pre>',
+            json.dumps(obj.payload, indent=2))
+    payload_display.short_description = 'Payload'
+
+
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ['payment_id', 'order_number', 'user_email',
@@ -35,9 +59,11 @@ class PaymentAdmin(admin.ModelAdmin):
     list_filter = ['status', 'payment_method', 'created_at']
     search_fields = ['payment_id', 'order__order_number',
                      'user__email', 'gateway_payment_id']
+    list_select_related = ['order', 'user']
     readonly_fields = ['payment_id', 'created_at', 'updated_at',
                        'completed_at', 'failed_at', 'order_number', 'user_email']
-    inlines = [RefundInline, CBETransactionInline, TeleBirrTransactionInline]
+    inlines = [RefundInline, CBETransactionInline, TeleBirrTransactionInline,
+               GatewayPayloadInline]
     actions = []
 
     fieldsets = (
@@ -45,7 +71,7 @@ class PaymentAdmin(admin.ModelAdmin):
             'fields': ('payment_id', 'order', 'user', 'payment_method', 'status')
         }),
         ('Payment Details', {
-            'fields': ('amount', 'currency', 'gateway_payment_id', 'gateway_response')
+            'fields': ('amount', 'currency', 'gateway_payment_id')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at', 'completed_at', 'failed_at')
@@ -98,8 +124,7 @@ class CBETransactionAdmin(admin.ModelAdmin):
                     'amount_display', 'callback_received', 'created_at']
     list_filter = ['status', 'callback_received', 'created_at']
     search_fields = ['transaction_id', 'payment__order__order_number']
-    readonly_fields = ['transaction_id',
-                       'created_at', 'updated_at', 'cbe_response']
+    readonly_fields = ['transaction_id', 'created_at', 'updated_at']
     actions = []
 
     def order_number(self, obj):
@@ -121,8 +146,7 @@ class TeleBirrTransactionAdmin(admin.ModelAdmin):
                     'amount_display', 'ussd_code_display', 'callback_received', 'created_at']
     list_filter = ['status', 'callback_received', 'created_at']
     search_fields = ['transaction_id', 'payment__order__order_number']
-    readonly_fields = ['transaction_id', 'created_at',
-                       'updated_at', 'telebirr_response']
+    readonly_fields = ['transaction_id', 'created_at', 'updated_at']
     actions = []
 
     def order_number(self, obj):
@@ -172,3 +196,24 @@ class PaymentGatewayAdmin(admin.ModelAdmin):
         if obj:
             return self.readonly_fields + ['name']
         return self.readonly_fields
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['event_id', 'gateway', 'event_type', 'reference',
+                    'status', 'attempts', 'received_at', 'processed_at']
+    list_filter = ['gateway', 'status', 'received_at']
+    search_fields = ['event_id', 'reference']
+    readonly_fields = [field.name for field in WebhookEvent._meta.fields]
+    actions = ['retry_events']
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry_events(self, request, queryset):
+        count = queryset.exclude(status='processed').update(
+            status='pending', attempts=0, claim=None)
+        applied = webhook_inbox.drain()
+        self.message_user(
+            request, f"Requeued {count} events; applied {applied} pending events")
+    retry_events.short_description = 'Retry selected events'
@@ -7,4 +7,5 @@ class PaymentsConfig(AppConfig):
     verbose_name = 'Payments Management'
 
     def ready(self):
+        import payments.checks
         import payments.signals
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core import checks
+
+PROCESS_LOCAL_CACHES = [
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+]
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """The circuit breakers only work if every worker shares their state"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [checks.Warning(
+        f"The default cache ({backend}) is not shared between processes.",
+        hint='Payment gateway circuit breakers keep their state in the '
+             'default cache; set REDIS_URL (or configure Memcached) so '
+             'every worker sees the same state.',
+        id='payments.W001',
+    )]
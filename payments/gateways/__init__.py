@@ -4,11 +4,19 @@ from .stripe_gateway import StripeGateway
 from .paypal_gateway import PayPalGateway
 from .cbe_gateway import CBEGateway
 from .telebirr_gateway import TeleBirrGateway
+from .registry import GatewayRegistry, gateway_registry
+from .metrics import GatewayMetrics, gateway_metrics
+from .breaker import CircuitBreaker
 
 __all__ = [
     'BasePaymentGateway',
     'StripeGateway',
     'PayPalGateway',
     'CBEGateway',
-    'TeleBirrGateway'
+    'TeleBirrGateway',
+    'GatewayRegistry',
+    'gateway_registry',
+    'GatewayMetrics',
+    'gateway_metrics',
+    'CircuitBreaker'
 ]
@@ -1,13 +1,100 @@
 from abc import ABC, abstractmethod
+
+import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .metrics import gateway_metrics
+from .registry import gateway_registry
+
+
+def build_http_session():
+    """
+    ``requests.Session`` with a keep-alive connection pool sized by
+    ``PAYMENT_GATEWAY_HTTP``. Idempotent methods are retried with
+    exponential backoff on connection errors and 502/503/504; POSTs never
+    are, so a payment is not initiated twice.
+    """
+    config = settings.PAYMENT_GATEWAY_HTTP
+    retry = Retry(
+        total=config['RETRIES'],
+        backoff_factor=config['BACKOFF_FACTOR'],
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE']),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config['POOL_CONNECTIONS'],
+        pool_maxsize=config['POOL_MAXSIZE'],
+        max_retries=retry
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
 
 
 class BasePaymentGateway(ABC):
     """Abstract base class for all payment gateways"""
 
+    api_url = ''
+    # Operations timed and counted in ``gateway_metrics``
+    INSTRUMENTED_OPERATIONS = [
+        'initiate_payment', 'verify_payment', 'process_refund', 'handle_webhook'
+    ]
+    # Outgoing calls that fail fast while the gateway's breaker is open
+    GUARDED_OPERATIONS = ['initiate_payment', 'verify_payment', 'process_refund']
+    # Gateways with a batch settlement report API set this and implement
+    # ``fetch_settlements(day)``, returning the raw rows for that day
+    supports_settlements = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Metrics label, e.g. 'cbe' for CBEGateway
+        cls.metrics_name = cls.__name__.replace('Gateway', '').lower()
+        for operation in cls.INSTRUMENTED_OPERATIONS:
+            method = cls.__dict__.get(operation)
+            if method is None or getattr(method, '__isabstractmethod__', False):
+                continue
+            method = gateway_metrics.instrument(cls.metrics_name, operation, method)
+            if operation in cls.GUARDED_OPERATIONS:
+                method = gateway_registry.breaker(cls.metrics_name).guard(method)
+            setattr(cls, operation, method)
+
     def __init__(self):
         self.name = self.__class__.__name__
         self.test_mode = getattr(settings, 'DEBUG', True)
+        self._session = None
+
+    @property
+    def session(self):
+        """Pooled HTTP session, created on first use"""
+        if self._session is None:
+            self._session = build_http_session()
+        return self._session
+
+    @property
+    def timeout(self):
+        config = settings.PAYMENT_GATEWAY_HTTP
+        return (config['CONNECT_TIMEOUT'], config['READ_TIMEOUT'])
+
+    def request(self, method, path, **kwargs):
+        """Call the gateway API over the pooled session"""
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            response = self.session.request(
+                method, f"{self.api_url}{path}", **kwargs)
+        except requests.Timeout:
+            gateway_metrics.mark_timeout()
+            raise
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
 
     @abstractmethod
     def initiate_payment(self, payment, **kwargs):
@@ -34,6 +121,18 @@ class BasePaymentGateway(ABC):
         gateway_name = self.__class__.__name__.replace('Gateway', '').upper()
         return getattr(settings, f'{gateway_name}_CONFIG', {})
 
+    def currency_error(self, payment):
+        """Failed result for a payment in a currency the gateway cannot
+        charge, or None. Not an ``error``, so the circuit breaker ignores it"""
+        currencies = getattr(self, 'currencies', None)
+        if currencies and payment.currency not in currencies:
+            return {
+                'success': False,
+                'message': f"{self.name} only charges "
+                           f"{', '.join(currencies)}, not {payment.currency}"
+            }
+        return None
+
     def validate_amount(self, amount):
         """Validate payment amount"""
         if amount <= 0:
@@ -0,0 +1,140 @@
+import functools
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Per-gateway circuit breaker whose state lives in the Django cache, so
+    every worker process sees the same state.
+
+    Calls are counted in fixed windows of ``WINDOW`` seconds. A call fails
+    when it raises, times out, returns an ``error`` (the gateway could not
+    be reached or answered garbage; declined payments do not count) or
+    takes longer than ``SLOW_CALL_SECONDS``. Once a window has
+    ``MIN_CALLS`` calls and at least ``FAILURE_RATE`` of them failed the
+    breaker opens and calls fail fast for ``OPEN_SECONDS``. After that it is
+    half-open: one call, in one process, is let through as a probe and its
+    outcome closes the breaker or opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, name, config=None):
+        self.name = name
+        self._config = config or {}
+
+    @property
+    def config(self):
+        return {**settings.PAYMENT_GATEWAY_BREAKER, **self._config}
+
+    def _key(self, suffix):
+        return f"payments:breaker:{self.name}:{suffix}"
+
+    @property
+    def state(self):
+        open_until = cache.get(self._key('open_until'))
+        if open_until is None:
+            return self.CLOSED
+        return self.OPEN if time.time() < open_until else self.HALF_OPEN
+
+    def allow(self):
+        """Whether a call may go to the gateway now; in the half-open state
+        only the caller that claims the probe gets ``True``"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.OPEN:
+            return False
+        # The probe claim expires, so a probe that never reports back
+        # cannot keep the breaker half-open forever
+        return cache.add(
+            self._key('probe'), 1, self.config['SLOW_CALL_SECONDS'] * 2)
+
+    def available(self):
+        """Whether callers should be offered this gateway at all (a
+        half-open gateway is, so customers can trigger the probe)"""
+        return self.state != self.OPEN
+
+    def record(self, failed):
+        open_until = cache.get(self._key('open_until'))
+        if open_until is not None:
+            if time.time() < open_until:
+                # A call that started before the breaker opened
+                return
+            # The half-open probe
+            if failed:
+                self._open()
+            else:
+                self.reset()
+                logger.info("%s circuit closed", self.name)
+            return
+
+        window = int(time.time() // self.config['WINDOW'])
+        calls_key = self._key(f"{window}:calls")
+        failures_key = self._key(f"{window}:failures")
+        calls = self._incr(calls_key)
+        failures = self._incr(failures_key) if failed else \
+            cache.get(failures_key, 0)
+        if calls >= self.config['MIN_CALLS'] and \
+                failures / calls >= self.config['FAILURE_RATE']:
+            self._open()
+
+    def reset(self):
+        window = int(time.time() // self.config['WINDOW'])
+        cache.delete_many([
+            self._key('open_until'), self._key('probe'),
+            self._key(f"{window}:calls"), self._key(f"{window}:failures"),
+        ])
+
+    def _open(self):
+        open_seconds = self.config['OPEN_SECONDS']
+        # Kept past open_until so the breaker stays half-open until a probe
+        # reports back
+        cache.set(self._key('open_until'), time.time() + open_seconds,
+                  open_seconds + self.config['WINDOW'] * 10)
+        cache.delete(self._key('probe'))
+        logger.warning("%s circuit opened for %ss", self.name, open_seconds)
+
+    def _incr(self, key):
+        # Outlive the window so late increments do not recreate the key
+        if cache.add(key, 1, self.config['WINDOW'] * 2):
+            return 1
+        try:
+            return cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, self.config['WINDOW'] * 2)
+            return 1
+
+    def guard(self, func):
+        """
+        Wrap a gateway method: fail fast with an ``unavailable`` result
+        while the breaker is open, otherwise call it and record the outcome
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.allow():
+                return {
+                    'success': False,
+                    'unavailable': True,
+                    'error': 'Gateway temporarily unavailable',
+                    'message': 'This payment method is temporarily '
+                               'unavailable, please try another one',
+                }
+
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                self.record(failed=True)
+                raise
+            slow = time.perf_counter() - started > self.config['SLOW_CALL_SECONDS']
+            errored = isinstance(result, dict) and bool(result.get('error'))
+            self.record(failed=slow or errored)
+            return result
+        return wrapper
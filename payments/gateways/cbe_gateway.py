@@ -1,7 +1,6 @@
 import time
 import hmac
 import hashlib
-import requests
 from django.conf import settings
 from .base import BasePaymentGateway
 
@@ -9,6 +8,9 @@ from .base import BasePaymentGateway
 class CBEGateway(BasePaymentGateway):
     """CBE Birr payment gateway implementation"""
 
+    currencies = ['ETB']
+    supports_settlements = True
+
     def __init__(self):
         super().__init__()
         self.merchant_id = settings.CBE_MERCHANT_ID
@@ -18,6 +20,10 @@ class CBEGateway(BasePaymentGateway):
 
     def initiate_payment(self, payment, **kwargs):
         """Initiate CBE Birr payment"""
+        currency_error = self.currency_error(payment)
+        if currency_error:
+            return currency_error
+
         try:
             phone_number = kwargs.get('phone_number')
             transaction_id = f"CBE{int(time.time())}{payment.id:06d}"
@@ -28,7 +34,7 @@ class CBEGateway(BasePaymentGateway):
                 'terminalId': self.terminal_id,
                 'invoiceNo': payment.order.order_number,
                 'amount': str(payment.amount),
-                'currency': 'ETB',
+                'currency': payment.currency,
                 'transactionId': transaction_id,
                 'customerPhone': phone_number,
                 'callbackUrl': f"{settings.BASE_URL}/api/payments/cbe/callback/",
@@ -39,18 +45,17 @@ class CBEGateway(BasePaymentGateway):
             signature = self._generate_signature(payment_data)
             payment_data['signature'] = signature
 
-            # Call CBE API (simulated for now)
-            # response = requests.post(f"{self.api_url}/initiate", json=payment_data)
-            # response_data = response.json()
-
-            # Simulated response
-            response_data = {
-                'status': 'SUCCESS',
-                'transactionId': transaction_id,
-                'message': 'Payment initiated successfully',
-                'ussdCode': f'*127*1*{transaction_id}#',
-                'paymentUrl': f'https://cbe-payment.example.com/pay/{transaction_id}'
-            }
+            if settings.PAYMENT_GATEWAYS_SIMULATED:
+                response_data = {
+                    'status': 'SUCCESS',
+                    'transactionId': transaction_id,
+                    'message': 'Payment initiated successfully',
+                    'ussdCode': f'*127*1*{transaction_id}#',
+                    'paymentUrl': f'https://cbe-payment.example.com/pay/{transaction_id}'
+                }
+            else:
+                response_data = self.request(
+                    'POST', '/initiate', json=payment_data)
 
             return {
                 'success': response_data.get('status') == 'SUCCESS',
@@ -69,16 +74,15 @@ class CBEGateway(BasePaymentGateway):
     def verify_payment(self, transaction_id):
         """Verify CBE payment status"""
         try:
-            # Call CBE verification API (simulated)
-            # response = requests.get(f"{self.api_url}/verify/{transaction_id}")
-            # response_data = response.json()
-
-            # Simulated response
-            response_data = {
-                'status': 'SUCCESS',
-                'transactionId': transaction_id,
-                'message': 'Payment verified successfully'
-            }
+            if settings.PAYMENT_GATEWAYS_SIMULATED:
+                response_data = {
+                    'status': 'SUCCESS',
+                    'transactionId': transaction_id,
+                    'message': 'Payment verified successfully'
+                }
+            else:
+                response_data = self.request(
+                    'GET', f'/verify/{transaction_id}')
 
             return {
                 'success': response_data.get('status') == 'SUCCESS',
@@ -93,6 +97,13 @@ class CBEGateway(BasePaymentGateway):
                 'error': str(e)
             }
 
+    def fetch_settlements(self, day):
+        """Settled transactions for one day"""
+        if settings.PAYMENT_GATEWAYS_SIMULATED:
+            return []
+        return self.request(
+            'GET', '/settlements', params={'date': day.isoformat()})
+
     def process_refund(self, payment, amount, reason):
         """Process CBE refund"""
         # CBE refund implementation would go here
@@ -0,0 +1,174 @@
+import functools
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayMetrics:
+    """
+    In-process latency histograms and outcome counters for gateway calls,
+    per gateway and operation.
+
+    Every call ends as ``success``, ``error`` (an exception or a
+    ``{'success': False}`` result) or ``timeout`` (the HTTP request timed
+    out). Each process keeps its own numbers, as Prometheus expects of a
+    scrape target; ``render`` writes them in its text format and
+    ``summary`` condenses them for the dashboard.
+    """
+
+    OUTCOMES = ['success', 'error', 'timeout']
+
+    def __init__(self, buckets=None):
+        self._buckets = buckets
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    @property
+    def buckets(self):
+        if self._buckets is None:
+            self._buckets = sorted(settings.PAYMENT_GATEWAY_LATENCY_BUCKETS)
+        return self._buckets
+
+    def reset(self):
+        with self._lock:
+            # (gateway, operation) -> per-bucket counts (the last one is
+            # +Inf), sum of seconds and per-outcome counts
+            self._series = {}
+
+    def mark_timeout(self):
+        """Called by ``BasePaymentGateway.request`` when the HTTP call
+        times out, since gateways turn the exception into a result dict"""
+        self._local.timed_out = True
+
+    def record(self, gateway, operation, seconds, outcome):
+        index = next(
+            (i for i, bound in enumerate(self.buckets) if seconds <= bound),
+            len(self.buckets))
+        with self._lock:
+            series = self._series.get((gateway, operation))
+            if series is None:
+                series = self._series[(gateway, operation)] = {
+                    'buckets': [0] * (len(self.buckets) + 1),
+                    'sum': 0.0,
+                    'outcomes': dict.fromkeys(self.OUTCOMES, 0),
+                }
+            series['buckets'][index] += 1
+            series['sum'] += seconds
+            series['outcomes'][outcome] += 1
+
+    def instrument(self, gateway, operation, func):
+        """Wrap a gateway method so each call is timed and counted"""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self._local.timed_out = False
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                self.record(gateway, operation, time.perf_counter() - started,
+                            self._outcome(False))
+                logger.exception("%s %s raised", gateway, operation)
+                raise
+
+            seconds = time.perf_counter() - started
+            succeeded = not isinstance(result, dict) or result.get('success', True)
+            outcome = self._outcome(succeeded)
+            self.record(gateway, operation, seconds, outcome)
+            if outcome != 'success':
+                detail = result.get('error') or result.get('message') \
+                    if isinstance(result, dict) else result
+                logger.warning(
+                    "%s %s %s after %.0f ms: %s", gateway, operation, outcome,
+                    seconds * 1000, detail)
+            return result
+        return wrapper
+
+    def _outcome(self, succeeded):
+        if getattr(self._local, 'timed_out', False):
+            return 'timeout'
+        return 'success' if succeeded else 'error'
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: {
+                    'buckets': list(series['buckets']),
+                    'sum': series['sum'],
+                    'outcomes': dict(series['outcomes']),
+                }
+                for key, series in self._series.items()
+            }
+
+    def render(self):
+        """Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = [
+            '# HELP payment_gateway_request_duration_seconds '
+            'Time spent in payment gateway operations.',
+            '# TYPE payment_gateway_request_duration_seconds histogram',
+        ]
+        for (gateway, operation), series in sorted(snapshot.items()):
+            labels = f'gateway="{gateway}",operation="{operation}"'
+            cumulative = 0
+            bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+            for bound, count in zip(bounds, series['buckets']):
+                cumulative += count
+                lines.append(
+                    'payment_gateway_request_duration_seconds_bucket'
+                    f'{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(
+                f'payment_gateway_request_duration_seconds_sum{{{labels}}} '
+                f'{series["sum"]:.6f}')
+            lines.append(
+                f'payment_gateway_request_duration_seconds_count{{{labels}}} '
+                f'{cumulative}')
+
+        lines += [
+            '# HELP payment_gateway_requests_total '
+            'Payment gateway operations by outcome.',
+            '# TYPE payment_gateway_requests_total counter',
+        ]
+        for (gateway, operation), series in sorted(snapshot.items()):
+            for outcome, count in series['outcomes'].items():
+                lines.append(
+                    'payment_gateway_requests_total'
+                    f'{{gateway="{gateway}",operation="{operation}",'
+                    f'outcome="{outcome}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """Per gateway and operation: calls, error/timeout rates, mean and
+        approximate p95 latency (the bucket bound it falls under) in ms"""
+        rows = []
+        for (gateway, operation), series in sorted(self.snapshot().items()):
+            calls = sum(series['buckets'])
+            outcomes = series['outcomes']
+            rank = 0.95 * calls
+            cumulative = 0
+            p95 = None
+            for bound, count in zip(self.buckets + [None], series['buckets']):
+                cumulative += count
+                if cumulative >= rank:
+                    p95 = bound
+                    break
+            rows.append({
+                'gateway': gateway,
+                'operation': operation,
+                'calls': calls,
+                'errors': outcomes['error'],
+                'timeouts': outcomes['timeout'],
+                'error_rate': round(
+                    (outcomes['error'] + outcomes['timeout']) / calls, 4),
+                'mean_ms': round(series['sum'] / calls * 1000, 1),
+                # None when the slowest calls exceeded every bucket
+                'p95_ms': p95 * 1000 if p95 is not None else None,
+            })
+        return rows
+
+
+gateway_metrics = GatewayMetrics()
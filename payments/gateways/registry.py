@@ -0,0 +1,87 @@
+import threading
+
+from .breaker import CircuitBreaker
+
+
+class GatewayRegistry:
+    """
+    One gateway instance per payment method and process.
+
+    Gateways are stateless apart from their configuration and HTTP
+    session, so sharing them between requests and threads lets every
+    payment reuse the same keep-alive connections instead of paying for a
+    new TCP and TLS handshake.
+
+    The registry also owns each gateway's circuit breaker; ``available``
+    tells views and the checkout page which methods to offer.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._gateways = {}
+        self._breakers = {}
+
+    @staticmethod
+    def gateway_classes():
+        from .stripe_gateway import StripeGateway
+        from .paypal_gateway import PayPalGateway
+        from .cbe_gateway import CBEGateway
+        from .telebirr_gateway import TeleBirrGateway
+
+        return {
+            'stripe': StripeGateway,
+            'paypal': PayPalGateway,
+            'cbe': CBEGateway,
+            'telebirr': TeleBirrGateway
+        }
+
+    def get(self, payment_method):
+        gateway = self._gateways.get(payment_method)
+        if gateway is not None:
+            return gateway
+
+        gateway_class = self.gateway_classes().get(payment_method)
+        if not gateway_class:
+            raise ValueError(f"Unsupported payment method: {payment_method}")
+
+        with self._lock:
+            gateway = self._gateways.get(payment_method)
+            if gateway is None:
+                gateway = self._gateways[payment_method] = gateway_class()
+        return gateway
+
+    def breaker(self, payment_method):
+        breaker = self._breakers.get(payment_method)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(
+                    payment_method, CircuitBreaker(payment_method))
+        return breaker
+
+    def available(self, payment_method):
+        return self.breaker(payment_method).available()
+
+    def available_methods(self):
+        return [
+            payment_method for payment_method in self.gateway_classes()
+            if self.available(payment_method)
+        ]
+
+    def settlement_methods(self):
+        """Payment methods whose gateway can fetch settlement reports"""
+        return [
+            payment_method
+            for payment_method, gateway_class in self.gateway_classes().items()
+            if gateway_class.supports_settlements
+        ]
+
+    def reset(self):
+        """Close pooled connections and rebuild gateways on next use
+        (e.g. after gateway settings change)"""
+        with self._lock:
+            gateways, self._gateways = self._gateways, {}
+        for gateway in gateways.values():
+            gateway.close()
+
+
+gateway_registry = GatewayRegistry()
@@ -11,6 +11,11 @@ class StripeGateway(BasePaymentGateway):
         self.api_key = settings.STRIPE_SECRET_KEY
         self.webhook_secret = settings.STRIPE_WEBHOOK_SECRET
         stripe.api_key = self.api_key
+        # Reuse the pooled keep-alive session; Stripe retries safely with
+        # idempotency keys
+        stripe.default_http_client = stripe.RequestsClient(
+            timeout=self.timeout, session=self.session)
+        stripe.max_network_retries = settings.PAYMENT_GATEWAY_HTTP['RETRIES']
 
     def initiate_payment(self, payment, **kwargs):
         """Initiate Stripe payment"""
@@ -1,6 +1,5 @@
 import time
 import hashlib
-import requests
 from django.conf import settings
 from .base import BasePaymentGateway
 
@@ -8,6 +7,9 @@ from .base import BasePaymentGateway
 class TeleBirrGateway(BasePaymentGateway):
     """TeleBirr payment gateway implementation"""
 
+    currencies = ['ETB']
+    supports_settlements = True
+
     def __init__(self):
         super().__init__()
         self.short_code = settings.TELEBIRR_SHORT_CODE
@@ -18,6 +20,10 @@ class TeleBirrGateway(BasePaymentGateway):
 
     def initiate_payment(self, payment, **kwargs):
         """Initiate TeleBirr payment"""
+        currency_error = self.currency_error(payment)
+        if currency_error:
+            return currency_error
+
         try:
             phone_number = kwargs.get('phone_number')
             transaction_id = f"TBR{int(time.time())}{payment.id:06d}"
@@ -41,19 +47,18 @@ class TeleBirrGateway(BasePaymentGateway):
             signature = self._generate_signature(payment_data)
             payment_data['sign'] = signature
 
-            # Call TeleBirr API (simulated for now)
-            # response = requests.post(f"{self.api_url}/unifiedorder", json=payment_data)
-            # response_data = response.json()
-
-            # Simulated response
-            response_data = {
-                'code': '200',
-                'msg': 'success',
-                'outTradeNo': transaction_id,
-                'qrCode': f'https://telebirr.qr.example.com/{transaction_id}',
-                'ussd': f'*806*{transaction_id}#',
-                'deepLink': f'telebirr://payment/{transaction_id}'
-            }
+            if settings.PAYMENT_GATEWAYS_SIMULATED:
+                response_data = {
+                    'code': '200',
+                    'msg': 'success',
+                    'outTradeNo': transaction_id,
+                    'qrCode': f'https://telebirr.qr.example.com/{transaction_id}',
+                    'ussd': f'*806*{transaction_id}#',
+                    'deepLink': f'telebirr://payment/{transaction_id}'
+                }
+            else:
+                response_data = self.request(
+                    'POST', '/unifiedorder', json=payment_data)
 
             return {
                 'success': response_data.get('code') == '200',
@@ -72,16 +77,15 @@ class TeleBirrGateway(BasePaymentGateway):
     def verify_payment(self, transaction_id):
         """Verify TeleBirr payment status"""
         try:
-            # Call TeleBirr verification API (simulated)
-            # response = requests.get(f"{self.api_url}/orderquery/{transaction_id}")
-            # response_data = response.json()
-
-            # Simulated response
-            response_data = {
-                'code': '200',
-                'msg': 'success',
-                'tradeStatus': 'SUCCESS'
-            }
+            if settings.PAYMENT_GATEWAYS_SIMULATED:
+                response_data = {
+                    'code': '200',
+                    'msg': 'success',
+                    'tradeStatus': 'SUCCESS'
+                }
+            else:
+                response_data = self.request(
+                    'GET', f'/orderquery/{transaction_id}')
 
             return {
                 'success': response_data.get('code') == '200',
@@ -96,6 +100,13 @@ class TeleBirrGateway(BasePaymentGateway):
                 'error': str(e)
             }
 
+    def fetch_settlements(self, day):
+        """Settled transactions for one day"""
+        if settings.PAYMENT_GATEWAYS_SIMULATED:
+            return []
+        return self.request(
+            'GET', '/settlementquery', params={'date': day.isoformat()})
+
     def process_refund(self, payment, amount, reason):
         """Process TeleBirr refund"""
         # TeleBirr refund implementation would go here
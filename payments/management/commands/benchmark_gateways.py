@@ -0,0 +1,132 @@
+import json
+import socket
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from payments.gateways import CBEGateway
+
+
+class StubGatewayHandler(BaseHTTPRequestHandler):
+    """Answers every call like a successful CBE Birr API response"""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    delay = 0
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        if self.delay:
+            time.sleep(self.delay)
+        body = json.dumps({
+            'status': 'SUCCESS',
+            'transactionId': self.path.rsplit('/', 1)[-1],
+            'message': 'ok'
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.requests += 1
+
+    do_GET = do_POST = _respond
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out as separate writes; without this, Nagle
+        # plus delayed ACKs add ~40ms to every keep-alive response
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubGatewayServer(ThreadingHTTPServer):
+    """Local stand-in for a payment gateway API, run on a background thread"""
+
+    daemon_threads = True
+
+    def __init__(self, delay=0):
+        handler = type('Handler', (StubGatewayHandler,), {'delay': delay})
+        super().__init__(('127.0.0.1', 0), handler)
+        self.requests = self.connections = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare gateway round trips with a new connection per call and '
+        'with the pooled keep-alive session, against a local stub gateway'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--calls', type=int, default=2000,
+            help='Verification calls per strategy')
+        parser.add_argument(
+            '--concurrency', type=int, default=8,
+            help='Threads making calls at the same time')
+        parser.add_argument(
+            '--delay', type=float, default=0,
+            help='Seconds the stub gateway waits before answering')
+
+    def handle(self, *args, **options):
+        with StubGatewayServer(delay=options['delay']) as server:
+            with override_settings(
+                    CBE_API_URL=server.url, PAYMENT_GATEWAYS_SIMULATED=False):
+                gateway = CBEGateway()
+
+                def unpooled(index):
+                    # What every call cost before: a fresh connection
+                    response = requests.get(
+                        f"{server.url}/verify/TX{index}", timeout=gateway.timeout)
+                    return response.json()
+
+                def pooled(index):
+                    return gateway.verify_payment(f"TX{index}")
+
+                for name, call in [('new connection', unpooled),
+                                   ('pooled session', pooled)]:
+                    connections = server.connections
+                    latencies = self._run(call, options)
+                    self._report(
+                        name, latencies, server.connections - connections)
+                gateway.close()
+
+    def _run(self, call, options):
+        def timed(index):
+            started = time.perf_counter()
+            call(index)
+            return time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            return list(pool.map(timed, range(options['calls'])))
+
+    def _report(self, name, latencies, connections):
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        self.stdout.write(
+            f"{name:15} p50 {cuts[49] * 1000:7.2f} ms   "
+            f"p95 {cuts[94] * 1000:7.2f} ms   "
+            f"p99 {cuts[98] * 1000:7.2f} ms   "
+            f"connections opened {connections}"
+        )
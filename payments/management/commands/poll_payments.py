@@ -0,0 +1,63 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.services import PendingPaymentPoller
+
+
+class Command(BaseCommand):
+    help = (
+        'Ask CBE Birr and TeleBirr for the final status of pending payments '
+        'whose callback never arrived, once or in a loop (--loop)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int,
+            help='Seconds a payment must have been pending '
+                 '(default: PAYMENT_POLL_MIN_AGE)')
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Payments read per query (default: PAYMENT_POLL_BATCH_SIZE)')
+        parser.add_argument(
+            '--workers', type=int,
+            help='Concurrent gateway calls (default: PAYMENT_POLL_WORKERS)')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Query the gateways without updating payments')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling until interrupted')
+        parser.add_argument(
+            '--interval', type=int, default=60,
+            help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        try:
+            poller = PendingPaymentPoller(
+                min_age=options['min_age'],
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                dry_run=options['dry_run']
+            )
+        except ValueError as e:
+            # e.g. a PAYMENT_POLL_RATE_LIMITS rate that is not positive
+            raise CommandError(str(e))
+
+        if options['loop']:
+            logging.basicConfig(level=logging.INFO)
+            try:
+                poller.run_forever(options['interval'])
+            except KeyboardInterrupt:
+                pass
+            return
+
+        stats = poller.poll()
+        self.stdout.write(self.style.SUCCESS(
+            f"Polled {stats['polled']} pending payments in "
+            f"{stats['seconds']:.2f}s ({stats['per_second']:.1f}/s): "
+            f"{stats['completed']} completed, {stats['failed']} failed, "
+            f"{stats['pending']} still pending, {stats['errors']} errors"
+        ))
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: nothing was updated'))
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from payments.services import webhook_inbox
+
+
+class Command(BaseCommand):
+    help = (
+        'Apply pending webhook events from the inbox (catches up after a '
+        'restart or when events were left behind by a crashed worker)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--shard', type=int,
+            help='Only drain this shard (default: all)')
+        parser.add_argument(
+            '--requeue-after', type=int, default=10,
+            help='Minutes after which claimed but unfinished events are '
+                 'returned to the inbox')
+        parser.add_argument(
+            '--replay-unhandled', action='store_true',
+            help='Return events set aside because their gateway had no '
+                 'handler to the inbox first')
+
+    def handle(self, *args, **options):
+        if options['replay_unhandled']:
+            replayed = webhook_inbox.replay_unhandled()
+            self.stdout.write(f"Replaying {replayed} unhandled events")
+        requeued = webhook_inbox.requeue_stale(
+            timedelta(minutes=options['requeue_after']))
+        applied = webhook_inbox.drain(options['shard'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Requeued {requeued} stale events, applied {applied} events"))
@@ -0,0 +1,88 @@
+import csv
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.gateways import gateway_registry
+from payments.models import PaymentManager
+from payments.services import PaymentReconciler, SettlementParser
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconcile payments against gateway settlement reports, given as '
+        'files (--file cbe=report.csv) or fetched from the gateways '
+        '(--gateway telebirr --date 2024-01-31); gateways run in parallel'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file', action='append', default=[], metavar='GATEWAY=PATH',
+            help='Settlement report (CSV or JSON) for a gateway')
+        parser.add_argument(
+            '--gateway', action='append', default=[],
+            choices=gateway_registry.settlement_methods(),
+            help='Fetch the settlement report from this gateway')
+        parser.add_argument(
+            '--date', type=date.fromisoformat,
+            default=date.today() - timedelta(days=1),
+            help='Day to fetch settlements for (default: yesterday)')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Settlement records matched per query')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report what would change without updating payments')
+        parser.add_argument(
+            '--report', help='Write the mismatch report to this CSV file')
+
+    def handle(self, *args, **options):
+        settlements = {}
+        for spec in options['file']:
+            gateway, _, path = spec.partition('=')
+            if not path:
+                raise CommandError(f"Expected GATEWAY=PATH, got '{spec}'")
+            try:
+                settlements[gateway] = SettlementParser(gateway).parse_file(path)
+            except (OSError, ValueError) as e:
+                raise CommandError(str(e))
+
+        for gateway in options['gateway']:
+            if gateway not in gateway_registry.settlement_methods():
+                raise CommandError(f"{gateway} has no settlement report API")
+            try:
+                rows = PaymentManager.get_gateway(gateway).fetch_settlements(
+                    options['date'])
+                settlements[gateway] = SettlementParser(gateway).parse_rows(rows)
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        if not settlements:
+            raise CommandError('Give at least one --file or --gateway')
+
+        reconciler = PaymentReconciler(
+            batch_size=options['batch_size'], dry_run=options['dry_run'])
+        reports = reconciler.reconcile_many(settlements)
+
+        mismatches = []
+        for report in reports:
+            self.stdout.write(
+                f"{report['gateway']}: {report['records']} records, "
+                f"{report['matched']} matched, {report['completed']} completed, "
+                f"{report['failed']} failed, "
+                f"{len(report['mismatches'])} mismatches"
+            )
+            mismatches += [
+                dict(mismatch, gateway=report['gateway'])
+                for mismatch in report['mismatches']
+            ]
+
+        if options['report'] and mismatches:
+            with open(options['report'], 'w', newline='') as handle:
+                writer = csv.DictWriter(handle, fieldnames=list(mismatches[0]))
+                writer.writeheader()
+                writer.writerows(mismatches)
+            self.stdout.write(f"Mismatch report written to {options['report']}")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: nothing was updated'))
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gateway', models.CharField(choices=[('stripe', 'Stripe'), ('paypal', 'PayPal'), ('cbe', 'CBE Birr'), ('telebirr', 'TeleBirr'), ('bank_transfer', 'Bank Transfer'), ('cash_on_delivery', 'Cash on Delivery')], max_length=20, verbose_name='gateway')),
+                ('event_id', models.CharField(max_length=255, verbose_name='gateway event ID')),
+                ('event_type', models.CharField(blank=True, max_length=100, verbose_name='event type')),
+                ('reference', models.CharField(blank=True, max_length=100, verbose_name='reference')),
+                ('shard', models.PositiveSmallIntegerField(default=0, verbose_name='shard')),
+                ('payload', models.JSONField(verbose_name='payload')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('processed', 'Processed'), ('failed', 'Failed')], default='pending', max_length=20, verbose_name='status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='attempts')),
+                ('last_error', models.TextField(blank=True, verbose_name='last error')),
+                ('claim', models.UUIDField(blank=True, null=True, verbose_name='claim')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='received at')),
+                ('claimed_at', models.DateTimeField(blank=True, null=True, verbose_name='claimed at')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='processed at')),
+            ],
+            options={
+                'verbose_name': 'webhook event',
+                'verbose_name_plural': 'webhook events',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'shard', 'id'], name='payments_we_status_25001a_idx')],
+                'unique_together': {('gateway', 'event_id')},
+            },
+        ),
+    ]
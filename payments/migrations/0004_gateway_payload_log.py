@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:16
+
+import json
+import zlib
+
+import django.db.models.deletion
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations, models
+
+
+def move_gateway_payloads(apps, schema_editor):
+    Payment = apps.get_model('payments', 'Payment')
+    Refund = apps.get_model('payments', 'Refund')
+    CBETransaction = apps.get_model('payments', 'CBETransaction')
+    TeleBirrTransaction = apps.get_model('payments', 'TeleBirrTransaction')
+    GatewayPayload = apps.get_model('payments', 'GatewayPayload')
+
+    def payload(payment_id, gateway, source, data, refund_id=None):
+        raw = json.dumps(
+            data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+        compressed = zlib.compress(raw)
+        encoding, stored = ('zlib', compressed) if len(compressed) < len(raw) \
+            else ('json', raw)
+        return GatewayPayload(
+            payment_id=payment_id, refund_id=refund_id, gateway=gateway,
+            source=source, encoding=encoding, data=stored, size=len(raw))
+
+    sources = [
+        (Payment.objects.exclude(gateway_response=None).values_list(
+            'pk', 'payment_method', 'gateway_response'), 'response', False),
+        (Refund.objects.exclude(gateway_response=None).values_list(
+            'payment_id', 'payment__payment_method', 'gateway_response', 'pk'),
+         'refund', True),
+        (CBETransaction.objects.exclude(cbe_response=None).values_list(
+            'payment_id', 'payment__payment_method', 'cbe_response'),
+         'callback', False),
+        (TeleBirrTransaction.objects.exclude(telebirr_response=None).values_list(
+            'payment_id', 'payment__payment_method', 'telebirr_response'),
+         'callback', False),
+    ]
+    for rows, source, has_refund in sources:
+        batch = []
+        for row in rows.iterator(chunk_size=500):
+            batch.append(payload(
+                row[0], row[1], source, row[2],
+                refund_id=row[3] if has_refund else None))
+            if len(batch) >= 500:
+                GatewayPayload.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            GatewayPayload.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_webhook_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GatewayPayload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gateway', models.CharField(max_length=20, verbose_name='gateway')),
+                ('source', models.CharField(max_length=30, verbose_name='source')),
+                ('encoding', models.CharField(choices=[('json', 'JSON'), ('zlib', 'zlib'), ('zstd', 'Zstandard')], max_length=10, verbose_name='encoding')),
+                ('data', models.BinaryField(verbose_name='data')),
+                ('size', models.PositiveIntegerField(verbose_name='uncompressed size')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('payment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payloads', to='payments.payment')),
+                ('refund', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='payloads', to='payments.refund')),
+            ],
+            options={
+                'verbose_name': 'gateway payload',
+                'verbose_name_plural': 'gateway payloads',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.RunPython(move_gateway_payloads, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='cbetransaction',
+            name='cbe_response',
+        ),
+        migrations.RemoveField(
+            model_name='payment',
+            name='gateway_response',
+        ),
+        migrations.RemoveField(
+            model_name='refund',
+            name='gateway_response',
+        ),
+        migrations.RemoveField(
+            model_name='telebirrtransaction',
+            name='telebirr_response',
+        ),
+    ]
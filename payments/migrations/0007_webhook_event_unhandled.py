@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_payment_order_set_null'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='webhookevent',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('processed', 'Processed'), ('unhandled', 'Unhandled'), ('failed', 'Failed')], default='pending', max_length=20, verbose_name='status'),
+        ),
+    ]
@@ -1,14 +1,73 @@
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Q
+from django.utils.dateparse import parse_datetime
 from django.utils.translation import gettext_lazy as _
 from orders.models import Order
 import uuid
+import json
+import base64
+import zlib
 import hashlib
 import hmac
 import time
 from django.utils import timezone
 
 
+class PaymentQuerySet(models.QuerySet):
+    def for_listing(self):
+        """
+        Join what a payment list row shows (order, customer, gateway
+        transaction) and prefetch refunds: a page costs two queries
+        """
+        return self.select_related(
+            'order', 'user', 'cbe_transaction', 'telebirr_transaction'
+        ).prefetch_related('refunds')
+
+    def status_counts(self):
+        """Total and per-status payment counts in a single query"""
+        counts = {'total': Count('id')}
+        for status, _ in Payment.STATUS_CHOICES:
+            counts[status] = Count('id', filter=Q(status=status))
+        return self.aggregate(**counts)
+
+    def keyset_page(self, cursor=None, limit=20):
+        """
+        Newest first page after ``cursor`` and the cursor of the next page
+        (None on the last one). Seeking past ``(created_at, id)`` keeps
+        deep pages as cheap as the first, unlike OFFSET.
+        """
+        payments = self.order_by('-created_at', '-id')
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            payments = payments.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+        page = list(payments[:limit + 1])
+        if len(page) <= limit:
+            return page, None
+        page = page[:limit]
+        return page, self.encode_cursor(page[-1])
+
+    @staticmethod
+    def encode_cursor(payment):
+        position = f"{payment.created_at.isoformat()}|{payment.pk}"
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            created_at, pk = base64.urlsafe_b64decode(
+                cursor.encode()).decode().split('|')
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (ValueError, UnicodeError):
+            created_at = None
+        if created_at is None:
+            raise ValueError('Invalid cursor')
+        return created_at, pk
+
+
 class Payment(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -32,8 +91,11 @@ class Payment(models.Model):
     # Core payment fields
     payment_id = models.UUIDField(
         _('payment ID'), default=uuid.uuid4, unique=True)
+    # Kept when the order is archived (ArchivedOrder.payments lists them
+    # by payment_id), so reconciliation, refunds and the payload log survive
     order = models.ForeignKey(
-        Order, on_delete=models.CASCADE, related_name='payments')
+        Order, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='payments')
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
 
@@ -57,11 +119,6 @@ class Payment(models.Model):
         max_length=100,
         blank=True
     )
-    gateway_response = models.JSONField(
-        _('gateway response'),
-        blank=True,
-        null=True
-    )
 
     # Timestamps
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
@@ -70,14 +127,41 @@ class Payment(models.Model):
         _('completed at'), blank=True, null=True)
     failed_at = models.DateTimeField(_('failed at'), blank=True, null=True)
 
+    objects = PaymentQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('payment')
         verbose_name_plural = _('payments')
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pages, unfiltered and by status
+            models.Index(fields=['created_at', 'id'],
+                         name='payment_created_idx'),
+            models.Index(fields=['status', 'created_at'],
+                         name='payment_status_created_idx'),
+        ]
+
+    # Status as last read from or written to the database (None for unsaved
+    # payments); post_save compares against it to spot real transitions
+    _loaded_status = None
 
     def __str__(self):
         return f"Payment {self.payment_id}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._loaded_status = self.__dict__.get('status')
+
+    @property
+    def status_changed(self):
+        return self._loaded_status != self.status
+
     @property
     def is_successful(self):
         return self.status in ['completed', 'refunded', 'partially_refunded']
@@ -86,21 +170,28 @@ class Payment(models.Model):
     def can_be_refunded(self):
         return self.status in ['completed', 'partially_refunded']
 
-    def mark_as_completed(self, gateway_payment_id=None, response_data=None):
+    @property
+    def gateway_response(self):
+        """Latest raw gateway payload (one query; see ``GatewayPayload``)"""
+        latest = self.payloads.filter(refund__isnull=True).order_by('-id').first()
+        return latest.payload if latest else None
+
+    def mark_as_completed(self, gateway_payment_id=None, response_data=None,
+                          source='response'):
         self.status = 'completed'
         self.completed_at = timezone.now()
         if gateway_payment_id:
             self.gateway_payment_id = gateway_payment_id
-        if response_data:
-            self.gateway_response = response_data
         self.save()
+        if response_data:
+            GatewayPayload.record(self, response_data, source)
 
-    def mark_as_failed(self, response_data=None):
+    def mark_as_failed(self, response_data=None, source='response'):
         self.status = 'failed'
         self.failed_at = timezone.now()
-        if response_data:
-            self.gateway_response = response_data
         self.save()
+        if response_data:
+            GatewayPayload.record(self, response_data, source)
 
 
 class Refund(models.Model):
@@ -134,11 +225,6 @@ class Refund(models.Model):
         max_length=100,
         blank=True
     )
-    gateway_response = models.JSONField(
-        _('gateway response'),
-        blank=True,
-        null=True
-    )
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
     processed_at = models.DateTimeField(
         _('processed at'), blank=True, null=True)
@@ -226,7 +312,6 @@ class CBETransaction(models.Model):
         choices=STATUS_CHOICES,
         default='initiated'
     )
-    cbe_response = models.JSONField(_('CBE response'), blank=True, null=True)
     callback_received = models.BooleanField(
         _('callback received'), default=False)
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
@@ -268,8 +353,6 @@ class TeleBirrTransaction(models.Model):
         choices=STATUS_CHOICES,
         default='initiated'
     )
-    telebirr_response = models.JSONField(
-        _('TeleBirr response'), blank=True, null=True)
     ussd_code = models.CharField(_('USSD code'), max_length=50, blank=True)
     qr_code_url = models.URLField(_('QR code URL'), blank=True)
     callback_received = models.BooleanField(
@@ -285,6 +368,148 @@ class TeleBirrTransaction(models.Model):
         return f"TeleBirr Transaction {self.transaction_id}"
 
 
+class GatewayPayload(models.Model):
+    """
+    Append-only log of raw gateway payloads (API responses, callbacks).
+
+    Payloads used to sit in JSON columns on the payment and transaction
+    rows, which every payment listing then read. They live here instead,
+    compressed as ``PAYMENT_PAYLOAD_COMPRESSION`` says, and are only
+    loaded when someone looks at one payment.
+    """
+    ENCODING_CHOICES = [
+        ('json', 'JSON'),
+        ('zlib', 'zlib'),
+        ('zstd', 'Zstandard'),
+    ]
+
+    payment = models.ForeignKey(
+        Payment, on_delete=models.CASCADE, related_name='payloads')
+    refund = models.ForeignKey(
+        Refund,
+        on_delete=models.CASCADE,
+        related_name='payloads',
+        blank=True,
+        null=True
+    )
+    gateway = models.CharField(_('gateway'), max_length=20)
+    source = models.CharField(_('source'), max_length=30)
+    encoding = models.CharField(
+        _('encoding'), max_length=10, choices=ENCODING_CHOICES)
+    data = models.BinaryField(_('data'))
+    size = models.PositiveIntegerField(_('uncompressed size'))
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('gateway payload')
+        verbose_name_plural = _('gateway payloads')
+        ordering = ['-id']
+
+    def __str__(self):
+        return f"{self.gateway} {self.source} payload for payment {self.payment_id}"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError('Gateway payloads are append-only')
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def record(cls, payment, payload, source, refund=None):
+        data, encoding, size = cls.encode(payload)
+        return cls.objects.create(
+            payment=payment,
+            refund=refund,
+            gateway=payment.payment_method,
+            source=source,
+            encoding=encoding,
+            data=data,
+            size=size
+        )
+
+    @staticmethod
+    def encode(payload, encoding=None):
+        """``(data, encoding, uncompressed size)``; small payloads that do
+        not shrink are stored as plain JSON"""
+        raw = json.dumps(
+            payload, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+        encoding = encoding or settings.PAYMENT_PAYLOAD_COMPRESSION
+        if encoding == 'zlib':
+            data = zlib.compress(raw)
+        elif encoding == 'zstd':
+            import zstandard
+            data = zstandard.ZstdCompressor().compress(raw)
+        else:
+            data = raw
+        if encoding == 'json' or len(data) >= len(raw):
+            return raw, 'json', len(raw)
+        return data, encoding, len(raw)
+
+    @staticmethod
+    def decode(data, encoding):
+        data = bytes(data)
+        if encoding == 'zlib':
+            data = zlib.decompress(data)
+        elif encoding == 'zstd':
+            import zstandard
+            data = zstandard.ZstdDecompressor().decompress(data)
+        return json.loads(data)
+
+    @property
+    def payload(self):
+        return self.decode(self.data, self.encoding)
+
+
+class WebhookEvent(models.Model):
+    """
+    Raw gateway callback waiting in the inbox.
+
+    Webhook views only verify the signature and insert a row here, so the
+    gateway gets its 200 at once; ``payments.services.WebhookInbox`` applies
+    the events afterwards. ``(gateway, event_id)`` is unique, which turns
+    redelivered events into no-ops, and events sharing a ``reference`` (the
+    order or gateway transaction they are about) land in the same shard and
+    are applied in arrival order. Events from a gateway the inbox has no
+    handler for yet are kept as ``unhandled`` until they are replayed.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('processed', 'Processed'),
+        ('unhandled', 'Unhandled'),
+        ('failed', 'Failed'),
+    ]
+
+    gateway = models.CharField(
+        _('gateway'), max_length=20,
+        choices=Payment.PAYMENT_METHOD_CHOICES)
+    event_id = models.CharField(_('gateway event ID'), max_length=255)
+    event_type = models.CharField(_('event type'), max_length=100, blank=True)
+    reference = models.CharField(_('reference'), max_length=100, blank=True)
+    shard = models.PositiveSmallIntegerField(_('shard'), default=0)
+    payload = models.JSONField(_('payload'))
+    status = models.CharField(
+        _('status'), max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(_('attempts'), default=0)
+    last_error = models.TextField(_('last error'), blank=True)
+    claim = models.UUIDField(_('claim'), null=True, blank=True)
+    received_at = models.DateTimeField(_('received at'), auto_now_add=True)
+    claimed_at = models.DateTimeField(_('claimed at'), null=True, blank=True)
+    processed_at = models.DateTimeField(
+        _('processed at'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('webhook event')
+        verbose_name_plural = _('webhook events')
+        ordering = ['id']
+        unique_together = ['gateway', 'event_id']
+        indexes = [
+            models.Index(fields=['status', 'shard', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.gateway} {self.event_type or 'event'} {self.event_id}"
+
+
 class PaymentManager:
     GATEWAY_MAP = {
         'stripe': 'StripeGateway',
@@ -295,22 +520,10 @@ class PaymentManager:
 
     @staticmethod
     def get_gateway(payment_method):
-        """Get gateway instance for payment method"""
-        from .gateways import (
-            StripeGateway, PayPalGateway, CBEGateway, TeleBirrGateway
-        )
-
-        gateway_class = {
-            'stripe': StripeGateway,
-            'paypal': PayPalGateway,
-            'cbe': CBEGateway,
-            'telebirr': TeleBirrGateway
-        }.get(payment_method)
-
-        if not gateway_class:
-            raise ValueError(f"Unsupported payment method: {payment_method}")
+        """Get the process-wide gateway instance for payment method"""
+        from .gateways import gateway_registry
 
-        return gateway_class()
+        return gateway_registry.get(payment_method)
 
     @staticmethod
     def process_payment(payment, **kwargs):
@@ -359,7 +572,7 @@ class PaymentManager:
             user=order.user,
             payment_method=payment_method,
             amount=order.grand_total,
-            currency='ETB'  # or get from order
+            currency=order.currency
         )
         return payment
 
@@ -376,29 +589,67 @@ class PaymentManager:
         # This would integrate with PayPal API
         return True, "PayPal payment processed successfully"
 
+    @staticmethod
+    def charge_in(payment, currency):
+        """
+        Re-price a payment that is about to be initiated in ``currency``,
+        the only one its gateway charges, so the payment records what is
+        actually charged. ValueError when there is no exchange rate.
+        """
+        if payment.currency == currency:
+            return
+        from currencies.services import CurrencyConverter
+
+        payment.amount = CurrencyConverter().convert(
+            payment.amount, payment.currency, currency)
+        payment.currency = currency
+        payment.save(update_fields=['amount', 'currency', 'updated_at'])
+
     @staticmethod
     def initiate_cbe_payment(payment, phone_number):
         """Initiate CBE payment"""
+        gateway = PaymentManager.get_gateway('cbe')
+        try:
+            PaymentManager.charge_in(payment, 'ETB')
+        except ValueError:
+            return False, (
+                f"CBE Birr charges in ETB and there is no exchange rate "
+                f"for {payment.currency}"), None
+        result = gateway.initiate_payment(payment, phone_number=phone_number)
+        if not result['success']:
+            return False, result['message'], result.get('response_data')
+
         # Create CBE transaction
-        cbe_transaction = CBETransaction.objects.create(
+        CBETransaction.objects.create(
             payment=payment,
-            transaction_id=f"CBE_{payment.payment_id}",
-            merchant_id="TEST_MERCHANT",
-            terminal_id="TEST_TERMINAL",
-            invoice_number=f"INV_{payment.order.order_number}"
+            transaction_id=result['gateway_payment_id'],
+            merchant_id=gateway.merchant_id,
+            terminal_id=gateway.terminal_id,
+            invoice_number=payment.order.order_number
         )
-        return True, "CBE payment initiated", {"ussd_code": "*127*..."}
+        return True, result['message'], result['response_data']
 
     @staticmethod
     def initiate_telebirr_payment(payment, phone_number):
         """Initiate TeleBirr payment"""
+        gateway = PaymentManager.get_gateway('telebirr')
+        try:
+            PaymentManager.charge_in(payment, 'ETB')
+        except ValueError:
+            return False, (
+                f"TeleBirr charges in ETB and there is no exchange rate "
+                f"for {payment.currency}"), None
+        result = gateway.initiate_payment(payment, phone_number=phone_number)
+        if not result['success']:
+            return False, result['message'], result.get('response_data')
+
         # Create TeleBirr transaction
-        telebirr_transaction = TeleBirrTransaction.objects.create(
+        TeleBirrTransaction.objects.create(
             payment=payment,
-            transaction_id=f"TELEBIRR_{payment.payment_id}",
-            short_code="TEST_SHORT_CODE"
+            transaction_id=result['gateway_payment_id'],
+            short_code=gateway.short_code
         )
-        return True, "TeleBirr payment initiated", {"ussd_code": "*127*..."}
+        return True, result['message'], result['response_data']
 
     @staticmethod
     def verify_cbe_payment(transaction_id):
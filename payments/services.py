@@ -0,0 +1,611 @@
+import csv
+import json
+import logging
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from notifications.services import side_effects
+from orders.models import Order
+from .gateways import gateway_registry
+from .models import (
+    CBETransaction, GatewayPayload, Payment, TeleBirrTransaction, WebhookEvent
+)
+from .signals import payment_status_changed
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookInbox:
+    """
+    Durable inbox for gateway webhooks.
+
+    ``receive`` is all a webhook view does after checking the signature:
+    one INSERT that ignores an already stored ``(gateway, event_id)``. Once
+    the request commits, the event's shard is drained on the side-effect
+    worker pool. A shard is drained by one thread at a time and its events
+    are applied in arrival order, so callbacks about the same payment never
+    race each other. A failed event blocks later events for the same
+    reference until it succeeds or runs out of attempts. Events from a
+    gateway without a ``_handle_<gateway>`` method are set aside as
+    ``unhandled`` rather than processed, so ``replay_unhandled`` can feed
+    them through once the handler exists.
+    """
+
+    def __init__(self, batch_size=None, shards=None, max_attempts=None):
+        self.batch_size = batch_size or settings.WEBHOOK_INBOX_BATCH_SIZE
+        self.shards = shards or settings.WEBHOOK_INBOX_SHARDS
+        self.max_attempts = max_attempts or settings.WEBHOOK_MAX_ATTEMPTS
+        self._locks = [threading.Lock() for _ in range(self.shards)]
+        self._rerun = set()
+
+    def shard_for(self, gateway, key):
+        return zlib.crc32(f"{gateway}:{key}".encode()) % self.shards
+
+    def receive(self, gateway, event_id, payload, event_type='', reference=''):
+        shard = self.shard_for(gateway, reference or event_id)
+        WebhookEvent.objects.bulk_create([
+            WebhookEvent(
+                gateway=gateway,
+                event_id=event_id,
+                event_type=event_type,
+                reference=reference,
+                shard=shard,
+                payload=payload
+            )
+        ], ignore_conflicts=True)
+        side_effects.defer(('webhook-inbox', shard), self.drain_shard, shard)
+
+    def drain_shard(self, shard):
+        """Drain one shard unless another thread already is; that thread
+        then goes round again so nothing received meanwhile is left behind"""
+        lock = self._locks[shard]
+        # Ask for a run before trying the lock: a holder that is just
+        # finishing either sees the request after releasing, or has
+        # released early enough for the lock to be taken here
+        self._rerun.add(shard)
+        while shard in self._rerun:
+            if not lock.acquire(blocking=False):
+                return
+            try:
+                self._rerun.discard(shard)
+                self.drain(shard)
+            finally:
+                lock.release()
+
+    def drain(self, shard=None):
+        """Apply pending events batch by batch; returns how many were applied"""
+        applied = 0
+        blocked_references = set()
+        blocked_ids = set()
+        while True:
+            events = self._claim(shard, blocked_references, blocked_ids)
+            if not events:
+                return applied
+
+            for event in events:
+                if event.reference and event.reference in blocked_references:
+                    # An earlier event for this reference failed; keep order
+                    WebhookEvent.objects.filter(pk=event.pk).update(
+                        status='pending', claim=None,
+                        attempts=F('attempts') - 1)
+                    continue
+                if not hasattr(self, f'_handle_{event.gateway}'):
+                    WebhookEvent.objects.filter(pk=event.pk).update(
+                        status='unhandled', claim=None)
+                    continue
+                if self._apply(event):
+                    applied += 1
+                elif event.reference:
+                    blocked_references.add(event.reference)
+                else:
+                    blocked_ids.add(event.pk)
+
+    def requeue_stale(self, older_than):
+        """Return events claimed by a worker that died back to the inbox"""
+        return WebhookEvent.objects.filter(
+            status='processing',
+            claimed_at__lt=timezone.now() - older_than
+        ).update(status='pending', claim=None)
+
+    def replay_unhandled(self, gateway=None):
+        """Return unhandled events to the inbox; drain them afterwards"""
+        unhandled = WebhookEvent.objects.filter(status='unhandled')
+        if gateway:
+            unhandled = unhandled.filter(gateway=gateway)
+        return unhandled.update(status='pending', attempts=0, last_error='')
+
+    def _claim(self, shard, blocked_references, blocked_ids):
+        pending = WebhookEvent.objects.filter(status='pending')
+        if shard is not None:
+            pending = pending.filter(shard=shard)
+        if blocked_references or blocked_ids:
+            pending = pending.exclude(
+                Q(reference__in=blocked_references) | Q(pk__in=blocked_ids))
+        event_ids = list(
+            pending.order_by('id').values_list('pk', flat=True)[:self.batch_size])
+        if not event_ids:
+            return []
+
+        # The conditional UPDATE makes sure two workers never claim the
+        # same event
+        claim = uuid.uuid4()
+        WebhookEvent.objects.filter(pk__in=event_ids, status='pending').update(
+            status='processing', claim=claim, claimed_at=timezone.now(),
+            attempts=F('attempts') + 1)
+        return list(WebhookEvent.objects.filter(claim=claim).order_by('id'))
+
+    def _apply(self, event):
+        handler = getattr(self, f'_handle_{event.gateway}')
+        try:
+            with transaction.atomic():
+                handler(event)
+                WebhookEvent.objects.filter(pk=event.pk).update(
+                    status='processed', processed_at=timezone.now(),
+                    claim=None, last_error='')
+            return True
+        except Exception as e:
+            logger.exception('Webhook event %s failed', event)
+            status = 'failed' if event.attempts >= self.max_attempts else 'pending'
+            WebhookEvent.objects.filter(pk=event.pk).update(
+                status=status, claim=None, last_error=str(e))
+            return False
+
+    def _handle_stripe(self, event):
+        payment_intent = event.payload['data']['object']
+        order_number = (payment_intent.get('metadata') or {}).get('order_number')
+        if not order_number:
+            return
+
+        payment = Payment.objects.filter(
+            order__order_number=order_number, payment_method='stripe'
+        ).order_by('-created_at').first()
+        if payment is None or payment.status == 'completed':
+            return
+
+        if event.event_type == 'payment_intent.succeeded':
+            payment.mark_as_completed(
+                gateway_payment_id=payment_intent['id'],
+                response_data=payment_intent,
+                source='webhook'
+            )
+        elif event.event_type == 'payment_intent.payment_failed':
+            payment.mark_as_failed(response_data=payment_intent, source='webhook')
+
+    def _handle_cbe(self, event):
+        self._apply_transaction_callback(
+            CBETransaction, event, event.payload.get('status'))
+
+    def _handle_telebirr(self, event):
+        self._apply_transaction_callback(
+            TeleBirrTransaction, event, event.payload.get('tradeStatus'))
+
+    def _apply_transaction_callback(self, model, event, gateway_status):
+        gateway_transaction = model.objects.select_related('payment').get(
+            transaction_id=event.reference)
+
+        gateway_transaction.callback_received = True
+        payment = gateway_transaction.payment
+        GatewayPayload.record(payment, event.payload, 'callback')
+        if gateway_status == 'SUCCESS':
+            gateway_transaction.status = 'completed'
+            if payment.status != 'completed':
+                payment.mark_as_completed()
+        elif gateway_status in ('FAILED', 'FAILURE', 'CANCELLED'):
+            gateway_transaction.status = 'failed'
+            if payment.status != 'completed':
+                payment.mark_as_failed()
+        else:
+            gateway_transaction.status = 'pending'
+        gateway_transaction.save()
+
+
+webhook_inbox = WebhookInbox()
+
+
+class SettlementParser:
+    """
+    Read a gateway settlement report (CSV or JSON) into uniform records:
+    ``{'reference', 'status', 'amount', 'raw'}``. Gateways name their
+    columns differently; the first column found from each alias list wins.
+    """
+
+    FIELDS = {
+        'cbe': {
+            'reference': ['transactionId', 'transaction_id'],
+            'status': ['status'],
+            'amount': ['amount'],
+        },
+        'telebirr': {
+            'reference': ['outTradeNo', 'transaction_id'],
+            'status': ['tradeStatus', 'status'],
+            'amount': ['totalAmount', 'amount'],
+        },
+        'stripe': {
+            'reference': ['id', 'charge'],
+            'status': ['status'],
+            'amount': ['amount'],
+        },
+        'paypal': {
+            'reference': ['id', 'transaction_id'],
+            'status': ['status'],
+            'amount': ['amount'],
+        },
+    }
+    # Stripe reports amounts in the smallest currency unit
+    AMOUNT_DIVISORS = {'stripe': 100}
+
+    STATUSES = {
+        'SUCCESS': 'completed',
+        'SUCCEEDED': 'completed',
+        'COMPLETED': 'completed',
+        'PAID': 'completed',
+        'SETTLED': 'completed',
+        'FAILED': 'failed',
+        'FAILURE': 'failed',
+        'DECLINED': 'failed',
+        'DENIED': 'failed',
+        'CANCELLED': 'failed',
+        'EXPIRED': 'failed',
+    }
+
+    def __init__(self, gateway):
+        if gateway not in self.FIELDS:
+            raise ValueError(f"Unsupported payment method: {gateway}")
+        self.gateway = gateway
+
+    def parse_file(self, path):
+        with open(path, newline='', encoding='utf-8') as handle:
+            if str(path).lower().endswith('.json'):
+                return self.parse_rows(json.load(handle))
+            return self.parse_rows(csv.DictReader(handle))
+
+    def parse_rows(self, rows):
+        if isinstance(rows, dict):
+            rows = rows.get('data') or rows.get('transactions') or []
+        return [self.parse_row(row) for row in rows]
+
+    def parse_row(self, row):
+        fields = self.FIELDS[self.gateway]
+        reference, status, amount = (
+            next((row[key] for key in fields[name] if row.get(key) not in (None, '')), None)
+            for name in ('reference', 'status', 'amount')
+        )
+        if amount is not None:
+            amount = Decimal(str(amount)) / self.AMOUNT_DIVISORS.get(self.gateway, 1)
+        return {
+            'reference': str(reference or ''),
+            'status': self.STATUSES.get(str(status or '').upper(), 'pending'),
+            'amount': amount,
+            'raw': row,
+        }
+
+
+class PaymentReconciler:
+    """
+    Match a gateway's settlement records against local payments and bring
+    payment statuses in line, a batch at a time.
+
+    Each batch costs one query to load the matching rows (joined in memory
+    on the gateway reference) and a handful of bulk UPDATEs; completed and
+    failed payments are then announced with one ``payment_status_changed``
+    event per status. Disagreements that should not be fixed
+    automatically (amounts, a completed payment reported as failed,
+    references we do not know) go into the mismatch report instead.
+    """
+
+    TRANSACTION_MODELS = {'cbe': CBETransaction, 'telebirr': TeleBirrTransaction}
+    OPEN_STATUSES = ['pending', 'processing', 'failed']
+
+    def __init__(self, batch_size=1000, dry_run=False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+
+    def reconcile(self, gateway, records):
+        report = {
+            'gateway': gateway,
+            'records': len(records),
+            'matched': 0,
+            'completed': 0,
+            'failed': 0,
+            'mismatches': [],
+        }
+
+        settlement = {}
+        for record in records:
+            if record['reference'] in settlement:
+                report['mismatches'].append(
+                    self._mismatch(record, 'duplicate_reference'))
+                continue
+            settlement[record['reference']] = record
+
+        references = list(settlement)
+        for start in range(0, len(references), self.batch_size):
+            batch = {
+                reference: settlement[reference]
+                for reference in references[start:start + self.batch_size]
+            }
+            self._reconcile_batch(gateway, batch, report)
+        return report
+
+    def reconcile_many(self, settlements):
+        """Reconcile ``{gateway: records}`` with one thread per gateway"""
+        def run(gateway, records):
+            try:
+                return self.reconcile(gateway, records)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=max(len(settlements), 1)) as pool:
+            futures = [pool.submit(run, gateway, records)
+                       for gateway, records in settlements.items()]
+            return [future.result() for future in futures]
+
+    def _local_rows(self, gateway, references):
+        """``{reference: (payment, gateway transaction or None)}``"""
+        model = self.TRANSACTION_MODELS.get(gateway)
+        if model is not None:
+            return {
+                row.transaction_id: (row.payment, row)
+                for row in model.objects.filter(
+                    transaction_id__in=references).select_related('payment')
+            }
+        return {
+            payment.gateway_payment_id: (payment, None)
+            for payment in Payment.objects.filter(
+                payment_method=gateway, gateway_payment_id__in=references)
+        }
+
+    def _reconcile_batch(self, gateway, batch, report):
+        local = self._local_rows(gateway, list(batch))
+        updates = {'completed': ([], []), 'failed': ([], [])}
+
+        for reference, record in batch.items():
+            if reference not in local:
+                report['mismatches'].append(
+                    self._mismatch(record, 'unknown_reference'))
+                continue
+            payment, gateway_transaction = local[reference]
+            report['matched'] += 1
+
+            if record['amount'] is not None and record['amount'] != payment.amount:
+                report['mismatches'].append(self._mismatch(
+                    record, 'amount_mismatch', payment))
+                continue
+
+            settled_status = record['status']
+            if settled_status == 'failed' and payment.status == 'completed':
+                report['mismatches'].append(self._mismatch(
+                    record, 'status_conflict', payment))
+                continue
+            if settled_status not in updates:
+                continue
+
+            payment_ids, transaction_ids = updates[settled_status]
+            if payment.status in self.OPEN_STATUSES and payment.status != settled_status:
+                payment_ids.append(payment.pk)
+            if gateway_transaction is not None and \
+                    gateway_transaction.status != settled_status:
+                transaction_ids.append(gateway_transaction.pk)
+
+        for settled_status, count in self.apply(gateway, updates).items():
+            report[settled_status] += count
+
+    def apply(self, gateway, updates):
+        """
+        Bulk-apply ``{status: (payment_ids, transaction_ids)}`` for one
+        gateway and return how many payments moved to each status
+        """
+        model = self.TRANSACTION_MODELS.get(gateway)
+        now = timezone.now()
+        changed = {}
+        counts = {}
+        with transaction.atomic():
+            for settled_status, (payment_ids, transaction_ids) in updates.items():
+                counts[settled_status] = len(payment_ids)
+                if self.dry_run:
+                    continue
+                if transaction_ids:
+                    model.objects.filter(pk__in=transaction_ids).update(
+                        status=settled_status, updated_at=now)
+                if not payment_ids:
+                    continue
+
+                timestamp = 'completed_at' if settled_status == 'completed' else 'failed_at'
+                # A callback may have completed the payment since it was
+                # read; never move it back
+                Payment.objects.filter(
+                    pk__in=payment_ids, status__in=self.OPEN_STATUSES
+                ).update(
+                    status=settled_status, updated_at=now, **{timestamp: now})
+                if settled_status == 'completed':
+                    # What saving a completed payment does to its order
+                    Order.objects.filter(payments__pk__in=payment_ids).update(
+                        payment_status='paid', updated_at=now)
+                changed[settled_status] = payment_ids
+
+            for settled_status, payment_ids in changed.items():
+                payment_status_changed.send(
+                    sender=Payment, payment_ids=payment_ids,
+                    new_status=settled_status, created=False)
+        return counts
+
+    @staticmethod
+    def _mismatch(record, issue, payment=None):
+        return {
+            'reference': record['reference'],
+            'issue': issue,
+            'settlement_status': record['status'],
+            'settlement_amount': record['amount'],
+            'payment_id': payment.pk if payment else None,
+            'payment_status': payment.status if payment else None,
+            'payment_amount': payment.amount if payment else None,
+        }
+
+
+class RateLimiter:
+    """
+    Token bucket shared by the threads calling one gateway: ``rate`` calls
+    per second on average and at most ``burst`` back to back.
+    """
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.rate = float(rate)
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class PendingPaymentPoller:
+    """
+    Ask the gateways for the final status of mobile-money payments whose
+    callback never arrived.
+
+    Pending CBE Birr and TeleBirr payments older than ``min_age`` are read
+    in primary key order, a batch at a time. Their ``verify_payment`` calls
+    run on a bounded thread pool, throttled per gateway, and the answers
+    are applied with the reconciler's bulk updates. Worker threads only
+    talk to the gateways; every query runs on the calling thread.
+    """
+
+    TRANSACTION_MODELS = PaymentReconciler.TRANSACTION_MODELS
+
+    def __init__(self, min_age=None, batch_size=None, workers=None,
+                 rate_limits=None, gateways=None, dry_run=False):
+        self.min_age = timedelta(seconds=(
+            settings.PAYMENT_POLL_MIN_AGE if min_age is None else min_age))
+        self.batch_size = batch_size or settings.PAYMENT_POLL_BATCH_SIZE
+        self.workers = workers or settings.PAYMENT_POLL_WORKERS
+        if rate_limits is None:
+            rate_limits = settings.PAYMENT_POLL_RATE_LIMITS
+        self.limiters = {
+            gateway: RateLimiter(rate) for gateway, rate in rate_limits.items()
+        }
+        # Gateways by payment method; the shared instances by default
+        self.gateways = gateways or {}
+        self.reconciler = PaymentReconciler(dry_run=dry_run)
+
+    def poll(self):
+        """
+        Poll every payment that is due once and return the run's metrics:
+        payments polled, completed, failed, still pending, errors, and
+        throughput in payments per second
+        """
+        stats = {'polled': 0, 'completed': 0, 'failed': 0, 'pending': 0, 'errors': 0}
+        started = time.perf_counter()
+        cutoff = timezone.now() - self.min_age
+        last_pk = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                batch = self._due(cutoff, last_pk)
+                if not batch:
+                    break
+                last_pk = batch[-1][0].pk
+                self._poll_batch(pool, batch, stats)
+
+        stats['seconds'] = time.perf_counter() - started
+        stats['per_second'] = stats['polled'] / stats['seconds'] if stats['seconds'] else 0
+        return stats
+
+    def run_forever(self, interval, stop=None):
+        """Poll every ``interval`` seconds until ``stop`` (an Event) is set"""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            stats = self.poll()
+            logger.info(
+                'Polled %(polled)d pending payments in %(seconds).2fs '
+                '(%(per_second).1f/s): %(completed)d completed, %(failed)d '
+                'failed, %(pending)d pending, %(errors)d errors', stats)
+            stop.wait(interval)
+
+    def _due(self, cutoff, last_pk):
+        """Next batch of ``(payment, gateway transaction)`` to poll"""
+        # Each method must have its own transaction, not just any of them
+        has_transaction = Q()
+        for method in self.TRANSACTION_MODELS:
+            has_transaction |= Q(
+                payment_method=method, **{f"{method}_transaction__isnull": False})
+        payments = Payment.objects.filter(
+            has_transaction,
+            status='pending',
+            created_at__lte=cutoff,
+            pk__gt=last_pk
+        ).select_related(
+            'cbe_transaction', 'telebirr_transaction'
+        ).order_by('pk')[:self.batch_size]
+        return [
+            (payment, getattr(payment, f"{payment.payment_method}_transaction"))
+            for payment in payments
+        ]
+
+    def _poll_batch(self, pool, batch, stats):
+        futures = [
+            (pool.submit(self._verify, payment.payment_method,
+                         gateway_transaction.transaction_id),
+             payment, gateway_transaction)
+            for payment, gateway_transaction in batch
+        ]
+
+        updates = {
+            gateway: {'completed': ([], []), 'failed': ([], [])}
+            for gateway in self.TRANSACTION_MODELS
+        }
+        for future, payment, gateway_transaction in futures:
+            result = future.result()
+            stats['polled'] += 1
+            if result.get('error'):
+                stats['errors'] += 1
+                continue
+            new_status = SettlementParser.STATUSES.get(
+                str(result.get('status') or '').upper())
+            if new_status is None:
+                stats['pending'] += 1
+                continue
+            payment_ids, transaction_ids = updates[payment.payment_method][new_status]
+            payment_ids.append(payment.pk)
+            if gateway_transaction.status != new_status:
+                transaction_ids.append(gateway_transaction.pk)
+
+        for gateway, gateway_updates in updates.items():
+            for new_status, count in self.reconciler.apply(
+                    gateway, gateway_updates).items():
+                stats[new_status] += count
+
+    def _verify(self, payment_method, transaction_id):
+        limiter = self.limiters.get(payment_method)
+        if limiter is not None:
+            limiter.acquire()
+        gateway = self.gateways.get(payment_method) or \
+            gateway_registry.get(payment_method)
+        try:
+            return gateway.verify_payment(transaction_id)
+        except Exception as e:
+            logger.exception('Verifying %s payment %s failed',
+                             payment_method, transaction_id)
+            return {'success': False, 'error': str(e)}
+
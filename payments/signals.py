@@ -1,17 +1,71 @@
+import logging
+
 from orders.models import Order  # Add this import at the top
-from django.db.models.signals import post_save, pre_save
-from django.dispatch import receiver
-from django.core.mail import send_mail
+from django.db.models.signals import post_save
+from django.dispatch import Signal, receiver
+from django.core.mail import send_mail, send_mass_mail
 from django.conf import settings
+from django.utils import timezone
+from notifications.services import side_effects
 from .models import Payment, Refund
 
+# The one payment event: sent once per status transition with payment_ids,
+# new_status and created. Saving a Payment sends it only when the status
+# actually changed from what was loaded; bulk updates (reconciliation,
+# polling) send it once per batch. Email, in-app and admin notifications
+# all hang off this signal and do their work after the commit.
+payment_status_changed = Signal()
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_EMAIL_EVENTS = ['created', 'completed', 'failed']
+
 
 @receiver(post_save, sender=Payment)
-def send_payment_notification(sender, instance, created, **kwargs):
+def emit_payment_status_change(sender, instance, created, **kwargs):
     """
-    Send email notifications for payment events
+    Turn a Payment save into a payment_status_changed event, but only
+    when the status moved
     """
-    if created:
+    previous = instance._loaded_status
+    instance._loaded_status = instance.status
+    if not created and previous == instance.status:
+        return
+
+    if not created:
+        logger.info(
+            "Payment %s status changed from %s to %s",
+            instance.payment_id, previous, instance.status)
+
+    if instance.status == 'completed':
+        # Mark the order paid without loading and re-saving it
+        Order.objects.filter(pk=instance.order_id).exclude(
+            payment_status='paid'
+        ).update(payment_status='paid', updated_at=timezone.now())
+
+    payment_status_changed.send(
+        sender=Payment, payment_ids=[instance.pk],
+        new_status=instance.status, created=created)
+
+
+@receiver(payment_status_changed)
+def send_payment_notification(sender, payment_ids, new_status, created=False, **kwargs):
+    """
+    Send email notifications for payment events once the save commits
+    """
+    event = 'created' if created else new_status
+    if event not in PAYMENT_EMAIL_EVENTS:
+        return
+
+    side_effects.defer(
+        ('payment_email', event, frozenset(payment_ids)),
+        email_payment_event, list(payment_ids), event
+    )
+
+
+def build_payment_email(instance, event):
+    """``(subject, message)`` for a payment event"""
+    if event == 'created':
         # Send payment initiated email
         subject = f"Payment Initiated - Order #{instance.order.order_number}"
         message = f"""
@@ -27,68 +81,78 @@ def send_payment_notification(sender, instance, created, **kwargs):
         Hagerbet E-Commerce Team
         """
 
-        try:
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [instance.user.email],
-                fail_silently=True,
-            )
-            print(f"Payment initiation email sent to {instance.user.email}")
-        except Exception as e:
-            print(f"Failed to send payment email: {e}")
-
     # Send payment status update emails
-    if not created and instance.status in ['completed', 'failed']:
-        if instance.status == 'completed':
-            subject = f"Payment Confirmed - Order #{instance.order.order_number}"
-            message = f"""
-            Dear {instance.user.username},
-            
-            Your payment for Order #{instance.order.order_number} has been confirmed!
-            Amount: {instance.amount} {instance.currency}
-            
-            Your order is now being processed.
-            
-            Thank you for your purchase!
-            
-            Best regards,
-            Hagerbet E-Commerce Team
-            """
-        else:  # failed
-            subject = f"Payment Failed - Order #{instance.order.order_number}"
-            message = f"""
-            Dear {instance.user.username},
-            
-            Unfortunately, your payment for Order #{instance.order.order_number} has failed.
-            Amount: {instance.amount} {instance.currency}
-            
-            Please try again or contact support if the problem persists.
-            
-            Best regards,
-            Hagerbet E-Commerce Team
-            """
-
-        try:
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [instance.user.email],
-                fail_silently=True,
-            )
-            print(f"Payment status email sent to {instance.user.email}")
-        except Exception as e:
-            print(f"Failed to send payment status email: {e}")
+    elif event == 'completed':
+        subject = f"Payment Confirmed - Order #{instance.order.order_number}"
+        message = f"""
+        Dear {instance.user.username},
+        
+        Your payment for Order #{instance.order.order_number} has been confirmed!
+        Amount: {instance.amount} {instance.currency}
+        
+        Your order is now being processed.
+        
+        Thank you for your purchase!
+        
+        Best regards,
+        Hagerbet E-Commerce Team
+        """
+    else:  # failed
+        subject = f"Payment Failed - Order #{instance.order.order_number}"
+        message = f"""
+        Dear {instance.user.username},
+        
+        Unfortunately, your payment for Order #{instance.order.order_number} has failed.
+        Amount: {instance.amount} {instance.currency}
+        
+        Please try again or contact support if the problem persists.
+        
+        Best regards,
+        Hagerbet E-Commerce Team
+        """
+    return subject, message
+
+
+def email_payment_event(payment_ids, event):
+    # Payments of archived orders have no order to write about
+    payments = Payment.objects.select_related('order', 'user').filter(
+        pk__in=payment_ids, order__isnull=False)
+    if event != 'created':
+        # A later transition in the same batch sends its own email
+        payments = payments.filter(status=event)
+
+    messages = [
+        (*build_payment_email(instance, event),
+         settings.DEFAULT_FROM_EMAIL, [instance.user.email])
+        for instance in payments
+    ]
+    if not messages:
+        return
+
+    # One SMTP connection for the whole batch
+    try:
+        send_mass_mail(messages)
+    except Exception:
+        logger.exception("Failed to send %s payment %s emails", len(messages), event)
+    else:
+        logger.info("Sent %s payment %s emails", len(messages), event)
 
 
 @receiver(post_save, sender=Refund)
 def send_refund_notification(sender, instance, created, **kwargs):
     """
-    Send email notifications for refund events
+    Send email notifications for refund events once the save commits
     """
     if created and instance.status == 'processed':
+        side_effects.defer(
+            ('refund_email', instance.pk), email_refund_processed, instance.pk)
+
+
+def email_refund_processed(refund_id):
+    instance = Refund.objects.select_related(
+        'payment__order', 'payment__user').filter(
+        pk=refund_id, payment__order__isnull=False).first()
+    if instance is not None:
         subject = f"Refund Processed - Order #{instance.payment.order.order_number}"
         message = f"""
         Dear {instance.payment.user.username},
@@ -109,31 +173,12 @@ def send_refund_notification(sender, instance, created, **kwargs):
                 message,
                 settings.DEFAULT_FROM_EMAIL,
                 [instance.payment.user.email],
-                fail_silently=True,
             )
-            print(f"Refund email sent to {instance.payment.user.email}")
-        except Exception as e:
-            print(f"Failed to send refund email: {e}")
-
-
-@receiver(pre_save, sender=Payment)
-def record_payment_status_change(sender, instance, **kwargs):
-    """
-    Record payment status changes and trigger related actions
-    """
-    if instance.pk:
-        try:
-            old_instance = Payment.objects.get(pk=instance.pk)
-            if old_instance.status != instance.status:
-                print(
-                    f"Payment {instance.payment_id} status changed from {old_instance.status} to {instance.status}")
-
-                # Trigger order status update when payment is completed
-                if instance.status == 'completed':
-                    instance.order.payment_status = 'paid'
-                    instance.order.save()
-        except Payment.DoesNotExist:
-            pass  # New instance
+        except Exception:
+            logger.exception(
+                "Failed to send refund email to %s", instance.payment.user.email)
+        else:
+            logger.info("Refund email sent to %s", instance.payment.user.email)
 
 
 @receiver(post_save, sender=Order)
@@ -153,9 +198,10 @@ def create_payment_for_new_order(sender, instance, created, **kwargs):
                     payment_method=instance.payment_method or 'manual'
                 )
 
-                print(
-                    f"✅ Created payment {payment.payment_id} for order {instance.order_number}")
+                logger.info(
+                    "Created payment %s for order %s",
+                    payment.payment_id, instance.order_number)
 
-        except Exception as e:
-            print(
-                f"❌ Failed to create payment for order {instance.order_number}: {e}")
+        except Exception:
+            logger.exception(
+                "Failed to create payment for order %s", instance.order_number)
@@ -1,8 +1,36 @@
-from django.test import TestCase
+import os
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import requests
+
+from django.conf import settings
+from django.core import mail
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import Payment, Refund, CBETransaction, TeleBirrTransaction
+from .models import (
+    Payment, PaymentManager, Refund, CBETransaction, TeleBirrTransaction,
+    GatewayPayload, WebhookEvent
+)
+from .gateways import BasePaymentGateway, gateway_metrics, gateway_registry
+from .services import (
+    PaymentReconciler, PendingPaymentPoller, RateLimiter, SettlementParser,
+    WebhookInbox
+)
+from .signals import payment_status_changed
+from admin_dashboard.models import AdminNotification
+from currencies.models import ExchangeRate
+from currencies.services import exchange_rates
+from notifications.models import Notification
 from orders.models import Order
 from users.models import User
 from products.models import Product, Category, Brand
@@ -81,6 +109,10 @@ class PaymentAPITests(APITestCase):
         )
 
         self.client.force_authenticate(user=self.user)
+        # Mobile money charges in ETB; orders default to USD
+        self.addCleanup(exchange_rates.invalidate)
+        with self.captureOnCommitCallbacks(execute=True):
+            ExchangeRate.objects.create(currency='ETB', rate=Decimal('50'))
 
         self.payment_list_url = reverse('payments:payment-list')
         self.payment_create_url = reverse(
@@ -108,6 +140,26 @@ class PaymentAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertIn('transaction', response.data)
 
+        payment = TeleBirrTransaction.objects.get().payment
+        self.assertEqual(
+            (payment.currency, payment.amount), ('ETB', Decimal('5000.00')))
+
+    def test_mobile_money_without_etb_rate_is_rejected(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ExchangeRate.objects.all().delete()
+        response = self.client.post(
+            reverse('payments:telebirr-payment-initiate',
+                    kwargs={'order_id': self.order.id}),
+            {'phone_number': '+251911223344'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('no exchange rate for USD', response.data['error'])
+        self.assertFalse(TeleBirrTransaction.objects.exists())
+
+        from .gateways import CBEGateway
+        payment = self.order.payments.get(payment_method='telebirr')
+        self.assertIn('only charges ETB', CBEGateway().initiate_payment(
+            payment, phone_number='+251911223344')['message'])
+
 
 class GatewayTests(TestCase):
     def setUp(self):
@@ -132,6 +184,48 @@ class GatewayTests(TestCase):
             self.fail(f"Gateway config retrieval failed: {e}")
 
 
+class GatewayRegistryTests(TestCase):
+    def test_gateways_are_shared_per_process(self):
+        gateway = PaymentManager.get_gateway('cbe')
+        self.assertIs(PaymentManager.get_gateway('cbe'), gateway)
+        self.assertIs(gateway.session, gateway.session)
+
+        with self.assertRaises(ValueError):
+            PaymentManager.get_gateway('bitcoin')
+
+    def test_only_settlement_gateways_can_be_fetched(self):
+        self.assertEqual(
+            gateway_registry.settlement_methods(), ['cbe', 'telebirr'])
+        with self.assertRaisesMessage(CommandError, 'invalid choice'):
+            call_command('reconcile_payments', '--gateway', 'stripe')
+        with self.assertRaisesMessage(
+                CommandError, 'paypal has no settlement report API'):
+            call_command('reconcile_payments', gateway=['paypal'])
+
+    def test_only_idempotent_calls_are_retried(self):
+        from .gateways import CBEGateway
+
+        adapter = CBEGateway().session.get_adapter('https://cbe-api.example.com')
+        self.assertIn('GET', adapter.max_retries.allowed_methods)
+        self.assertNotIn('POST', adapter.max_retries.allowed_methods)
+
+    def test_calls_reuse_keep_alive_connections(self):
+        from .gateways import CBEGateway
+        from .management.commands.benchmark_gateways import StubGatewayServer
+
+        with StubGatewayServer() as server:
+            with override_settings(
+                    CBE_API_URL=server.url, PAYMENT_GATEWAYS_SIMULATED=False):
+                gateway = CBEGateway()
+                for index in range(5):
+                    result = gateway.verify_payment(f'TX{index}')
+                    self.assertTrue(result['success'])
+                gateway.close()
+
+        self.assertEqual(server.requests, 5)
+        self.assertEqual(server.connections, 1)
+
+
 class WebhookTests(APITestCase):
     def test_stripe_webhook_endpoint(self):
         url = reverse('payments:stripe-webhook')
@@ -148,3 +242,704 @@ class WebhookTests(APITestCase):
         url = reverse('payments:telebirr-webhook')
         response = self.client.post(url, {})
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class WebhookInboxTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass'
+        )
+        self.order = Order.objects.create(
+            user=self.user,
+            shipping_address={},
+            billing_address={},
+            payment_method='cbe',
+            subtotal=100.00,
+            grand_total=100.00
+        )
+        self.payment = self.order.payments.get()
+        self.cbe_transaction = CBETransaction.objects.create(
+            payment=self.payment,
+            transaction_id='CBE123456789',
+            merchant_id='TEST_MERCHANT',
+            terminal_id='TEST_TERMINAL',
+            invoice_number=self.order.order_number
+        )
+        self.url = reverse('payments:cbe-webhook')
+
+    def callback(self, transaction_id, callback_status):
+        return self.client.post(self.url, {
+            'transactionId': transaction_id, 'status': callback_status
+        }, format='json')
+
+    def test_callback_is_stored_then_applied(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.callback('CBE123456789', 'SUCCESS')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.status, 'pending')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+
+        for callback in callbacks:
+            callback()
+        event.refresh_from_db()
+        self.payment.refresh_from_db()
+        self.cbe_transaction.refresh_from_db()
+        self.assertEqual(event.status, 'processed')
+        self.assertEqual(self.payment.status, 'completed')
+        self.assertEqual(self.cbe_transaction.status, 'completed')
+        self.assertTrue(self.cbe_transaction.callback_received)
+
+    def test_redelivered_callback_is_a_no_op(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.callback('CBE123456789', 'SUCCESS')
+            response = self.callback('CBE123456789', 'SUCCESS')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+
+    def test_failed_event_holds_back_later_events_for_the_payment(self):
+        inbox = WebhookInbox(shards=2)
+        for event_id, callback_status in [('1', 'PENDING'), ('2', 'SUCCESS')]:
+            inbox.receive('cbe', event_id, {'status': callback_status},
+                          event_type=callback_status, reference='CBE999')
+
+        with self.assertLogs('payments.services', level='ERROR'):
+            self.assertEqual(inbox.drain(), 0)
+        self.assertEqual(
+            list(WebhookEvent.objects.values_list('status', 'attempts')),
+            [('pending', 1), ('pending', 0)])
+
+        # The transaction shows up; both events now apply, in order
+        self.cbe_transaction.transaction_id = 'CBE999'
+        self.cbe_transaction.save()
+        self.assertEqual(inbox.drain(), 2)
+        self.cbe_transaction.refresh_from_db()
+        self.assertEqual(self.cbe_transaction.status, 'completed')
+
+    def test_busy_shard_is_rerun_by_its_holder(self):
+        inbox = WebhookInbox(shards=1)
+        holder_sees_rerun = []
+
+        class HeldLock:
+            def acquire(self, blocking=True):
+                # The holder finishing right now releases and then checks
+                # whether another drain was asked for
+                holder_sees_rerun.append(0 in inbox._rerun)
+                return False
+
+        inbox._locks[0] = HeldLock()
+        inbox.drain_shard(0)
+        self.assertEqual(holder_sees_rerun, [True])
+
+    def test_callback_without_transaction_is_rejected(self):
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_events_without_a_handler_are_kept_for_replay(self):
+        inbox = WebhookInbox(shards=1)
+        inbox.receive('paypal', 'WH-1', {'id': 'WH-1'},
+                      event_type='PAYMENT.CAPTURE.COMPLETED', reference='CAP1')
+
+        self.assertEqual(inbox.drain(), 0)
+        self.assertEqual(WebhookEvent.objects.get().status, 'unhandled')
+        self.assertEqual(inbox.drain(), 0)
+
+        handled = []
+        inbox._handle_paypal = handled.append
+        self.assertEqual(inbox.replay_unhandled('paypal'), 1)
+        self.assertEqual(inbox.drain(), 1)
+        self.assertEqual(WebhookEvent.objects.get().status, 'processed')
+        self.assertEqual([event.event_id for event in handled], ['WH-1'])
+
+
+class PaymentReconcilerTests(TestCase):
+    FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'settlements')
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass'
+        )
+        self.cbe = {}
+        for transaction_id, amount, payment_status in [
+                ('CBE0001', 100, 'pending'), ('CBE0002', 250, 'pending'),
+                ('CBE0003', 300, 'pending'), ('CBE0004', 100, 'completed')]:
+            payment = self.create_payment('cbe', amount, payment_status)
+            CBETransaction.objects.create(
+                payment=payment,
+                transaction_id=transaction_id,
+                merchant_id='TEST_MERCHANT',
+                terminal_id='TEST_TERMINAL',
+                invoice_number=payment.order.order_number
+            )
+            self.cbe[transaction_id] = payment
+
+    def create_payment(self, method, amount, payment_status='pending'):
+        order = Order.objects.create(
+            user=self.user,
+            shipping_address={},
+            billing_address={},
+            payment_method=method,
+            subtotal=amount,
+            grand_total=amount
+        )
+        payment = order.payments.get()
+        Payment.objects.filter(pk=payment.pk).update(
+            amount=amount, status=payment_status)
+        payment.refresh_from_db()
+        return payment
+
+    def reconcile(self, gateway, filename, **kwargs):
+        records = SettlementParser(gateway).parse_file(
+            os.path.join(self.FIXTURES, filename))
+        return PaymentReconciler(**kwargs).reconcile(gateway, records)
+
+    def test_settlement_file_updates_payments_in_bulk(self):
+        announced = []
+
+        def receiver(sender, payment_ids, new_status, **kwargs):
+            announced.append((new_status, sorted(payment_ids)))
+        payment_status_changed.connect(receiver)
+        self.addCleanup(payment_status_changed.disconnect, receiver)
+
+        report = self.reconcile('cbe', 'cbe.csv')
+
+        self.assertEqual(
+            (report['records'], report['matched'], report['completed'],
+             report['failed']),
+            (6, 4, 1, 1))
+        statuses = dict(Payment.objects.filter(
+            cbe_transaction__isnull=False
+        ).values_list('cbe_transaction__transaction_id', 'status'))
+        self.assertEqual(statuses, {
+            'CBE0001': 'completed', 'CBE0002': 'failed',
+            'CBE0003': 'pending', 'CBE0004': 'completed'})
+        self.assertEqual(
+            CBETransaction.objects.get(transaction_id='CBE0001').status,
+            'completed')
+        self.cbe['CBE0001'].order.refresh_from_db()
+        self.assertEqual(self.cbe['CBE0001'].order.payment_status, 'paid')
+        self.assertEqual(sorted(announced), [
+            ('completed', [self.cbe['CBE0001'].pk]),
+            ('failed', [self.cbe['CBE0002'].pk])])
+
+    def test_mismatch_report(self):
+        report = self.reconcile('cbe', 'cbe.csv')
+        issues = sorted(
+            (mismatch['reference'], mismatch['issue'])
+            for mismatch in report['mismatches'])
+        self.assertEqual(issues, [
+            ('CBE0001', 'duplicate_reference'),
+            ('CBE0003', 'amount_mismatch'),
+            ('CBE0004', 'status_conflict'),
+            ('CBE9999', 'unknown_reference'),
+        ])
+
+    def test_json_report_and_dry_run(self):
+        payment = self.create_payment('telebirr', '75.50')
+        TeleBirrTransaction.objects.create(
+            payment=payment, transaction_id='TBR0001', short_code='123456')
+
+        report = self.reconcile('telebirr', 'telebirr.json', dry_run=True)
+        self.assertEqual(report['completed'], 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'pending')
+
+        self.reconcile('telebirr', 'telebirr.json')
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'completed')
+
+
+class FakeStatusGateway(BasePaymentGateway):
+    """Answers ``verify_payment`` from a dict instead of the network"""
+
+    def __init__(self, statuses):
+        super().__init__()
+        self.statuses = statuses
+        self.calls = []
+        self._lock = threading.Lock()
+        # Failures from earlier tests must not leave the breaker open
+        gateway_registry.breaker(self.metrics_name).reset()
+
+    def initiate_payment(self, payment, **kwargs):
+        raise NotImplementedError
+
+    def verify_payment(self, transaction_id):
+        with self._lock:
+            self.calls.append(transaction_id)
+        status = self.statuses.get(transaction_id)
+        if status is None:
+            return {'success': False, 'error': 'Gateway timeout'}
+        return {'success': status == 'SUCCESS', 'status': status}
+
+    def process_refund(self, payment, amount, reason):
+        raise NotImplementedError
+
+    def handle_webhook(self, payload):
+        raise NotImplementedError
+
+
+class PendingPaymentPollerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass'
+        )
+        self.gateway = FakeStatusGateway({
+            'CBE0001': 'SUCCESS', 'CBE0002': 'FAILED', 'CBE0003': 'PENDING',
+            'CBE0005': 'SUCCESS', 'TBR0001': 'SUCCESS',
+        })
+        self.payments = {}
+        for transaction_id, minutes_old in [
+                ('CBE0001', 30), ('CBE0002', 30), ('CBE0003', 30),
+                ('CBE0004', 30), ('CBE0005', 1)]:
+            self.payments[transaction_id] = self.create_payment(
+                CBETransaction, transaction_id, minutes_old,
+                merchant_id='TEST_MERCHANT', terminal_id='TEST_TERMINAL',
+                invoice_number=transaction_id)
+        self.payments['TBR0001'] = self.create_payment(
+            TeleBirrTransaction, 'TBR0001', 30, short_code='123456')
+
+    def create_payment(self, transaction_model, transaction_id, minutes_old,
+                       **transaction_fields):
+        method = 'cbe' if transaction_model is CBETransaction else 'telebirr'
+        order = Order.objects.create(
+            user=self.user,
+            shipping_address={},
+            billing_address={},
+            payment_method=method,
+            subtotal=100,
+            grand_total=100
+        )
+        payment = order.payments.get()
+        Payment.objects.filter(pk=payment.pk).update(
+            created_at=timezone.now() - timedelta(minutes=minutes_old))
+        transaction_model.objects.create(
+            payment=payment, transaction_id=transaction_id, **transaction_fields)
+        return payment
+
+    def poller(self, **kwargs):
+        kwargs.setdefault('gateways', {
+            'cbe': self.gateway, 'telebirr': self.gateway})
+        return PendingPaymentPoller(
+            min_age=600, batch_size=2, workers=4, rate_limits={}, **kwargs)
+
+    def statuses(self):
+        return dict(
+            (transaction_id, Payment.objects.get(pk=payment.pk).status)
+            for transaction_id, payment in self.payments.items()
+        )
+
+    def test_poll_applies_gateway_statuses(self):
+        stats = self.poller().poll()
+
+        self.assertEqual(
+            {key: stats[key] for key in
+             ('polled', 'completed', 'failed', 'pending', 'errors')},
+            {'polled': 5, 'completed': 2, 'failed': 1, 'pending': 1, 'errors': 1})
+        self.assertEqual(self.statuses(), {
+            'CBE0001': 'completed', 'CBE0002': 'failed', 'CBE0003': 'pending',
+            'CBE0004': 'pending', 'CBE0005': 'pending', 'TBR0001': 'completed'})
+        # Too recent to poll
+        self.assertNotIn('CBE0005', self.gateway.calls)
+        self.assertEqual(
+            TeleBirrTransaction.objects.get(transaction_id='TBR0001').status,
+            'completed')
+        self.payments['CBE0001'].order.refresh_from_db()
+        self.assertEqual(self.payments['CBE0001'].order.payment_status, 'paid')
+
+    def test_settled_payments_are_not_polled_again(self):
+        self.poller().poll()
+        self.gateway.calls.clear()
+
+        self.poller().poll()
+        self.assertEqual(
+            sorted(self.gateway.calls), ['CBE0003', 'CBE0004'])
+
+    def test_dry_run(self):
+        stats = self.poller(dry_run=True).poll()
+        self.assertEqual(stats['completed'], 2)
+        self.assertEqual(set(self.statuses().values()), {'pending'})
+
+    def test_payments_without_their_method_transaction_are_skipped(self):
+        # A CBE transaction on a payment that was switched to TeleBirr
+        Payment.objects.filter(pk=self.payments['CBE0004'].pk).update(
+            payment_method='telebirr')
+
+        stats = self.poller().poll()
+        self.assertEqual(stats['polled'], 4)
+        self.assertNotIn('CBE0004', self.gateway.calls)
+
+    def test_rate_limiter_spaces_calls(self):
+        limiter = RateLimiter(rate=50, burst=1)
+        started = time.monotonic()
+        for _ in range(5):
+            limiter.acquire()
+        # The first call is free, the other four wait 20ms each
+        self.assertGreaterEqual(time.monotonic() - started, 0.075)
+
+    def test_rates_must_be_positive(self):
+        for rate in [0, -1]:
+            with self.assertRaises(ValueError):
+                RateLimiter(rate=rate)
+        with override_settings(PAYMENT_POLL_RATE_LIMITS={'cbe': 0}):
+            with self.assertRaisesMessage(CommandError, 'Rate must be positive'):
+                call_command('poll_payments')
+
+
+class GatewayPayloadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass'
+        )
+        self.order = Order.objects.create(
+            user=self.user,
+            shipping_address={},
+            billing_address={},
+            payment_method='stripe',
+            subtotal=100,
+            grand_total=100
+        )
+        self.payment = self.order.payments.get()
+
+    def test_large_payloads_are_compressed(self):
+        charge = {'id': 'ch_1', 'status': 'succeeded', 'metadata': {
+            f"key{index}": 'value' * 20 for index in range(50)}}
+        self.payment.mark_as_completed(
+            gateway_payment_id='ch_1', response_data=charge)
+
+        payload = self.payment.payloads.get()
+        self.assertEqual(payload.encoding, 'zlib')
+        self.assertLess(len(bytes(payload.data)), payload.size)
+        self.assertEqual(payload.source, 'response')
+        self.assertEqual(self.payment.gateway_response, charge)
+
+    def test_small_payloads_stay_plain_json(self):
+        payload = GatewayPayload.record(
+            self.payment, {'status': 'SUCCESS'}, 'callback')
+        self.assertEqual(payload.encoding, 'json')
+        self.assertEqual(payload.payload, {'status': 'SUCCESS'})
+
+    def test_payloads_are_append_only(self):
+        payload = GatewayPayload.record(self.payment, {'status': 'ok'}, 'callback')
+        with self.assertRaises(ValueError):
+            payload.save()
+
+    def test_payment_rows_carry_no_payload(self):
+        self.assertNotIn(
+            'gateway_response',
+            [field.name for field in Payment._meta.concrete_fields])
+
+
+class PaymentListingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass'
+        )
+        self.staff = User.objects.create_user(
+            email='staff@example.com',
+            username='staff',
+            password='testpass',
+            is_staff=True
+        )
+        for index in range(5):
+            self.create_payment('completed' if index % 2 else 'pending')
+
+    def create_payment(self, payment_status='pending'):
+        order = Order.objects.create(
+            user=self.user,
+            shipping_address={},
+            billing_address={},
+            payment_method='cbe',
+            subtotal=100,
+            grand_total=100
+        )
+        payment = order.payments.get()
+        Payment.objects.filter(pk=payment.pk).update(status=payment_status)
+        CBETransaction.objects.create(
+            payment=payment,
+            transaction_id=f"CBE{payment.pk:04d}",
+            merchant_id='TEST_MERCHANT',
+            terminal_id='TEST_TERMINAL',
+            invoice_number=order.order_number
+        )
+        Refund.objects.create(payment=payment, amount=10, reason='Damaged')
+        return payment
+
+    def test_status_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            counts = Payment.objects.status_counts()
+        self.assertEqual(
+            (counts['total'], counts['pending'], counts['completed'], counts['failed']),
+            (5, 3, 2, 0))
+
+    def test_keyset_pages_walk_every_payment_once(self):
+        seen, cursor = [], None
+        while True:
+            page, cursor = Payment.objects.keyset_page(cursor, limit=2)
+            seen += [payment.pk for payment in page]
+            if cursor is None:
+                break
+        self.assertEqual(
+            seen, list(Payment.objects.order_by('-created_at', '-id')
+                       .values_list('pk', flat=True)))
+
+        with self.assertRaises(ValueError):
+            Payment.objects.keyset_page('not-a-cursor')
+
+    def test_management_api_query_count_does_not_grow_with_rows(self):
+        self.client.force_login(self.staff)
+        url = reverse('admin_dashboard:api-payments')
+
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.get(url, {'limit': 2})
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(url, {'limit': 5})
+
+        self.assertEqual(len(few), len(many))
+        page = response.json()
+        self.assertEqual(len(page['results']), 2)
+        self.assertEqual(len(page['results'][0]['refunds']), 1)
+        self.assertTrue(page['results'][0]['gateway_transaction']['transaction_id'])
+
+        response = self.client.get(
+            url, {'limit': 5, 'cursor': page['next_cursor'], 'status': 'pending'})
+        self.assertEqual(
+            [row['status'] for row in response.json()['results']], ['pending'] * 2)
+
+
+
+class PaymentEventTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass'
+        )
+        order = Order.objects.create(
+            user=self.user,
+            shipping_address={},
+            billing_address={},
+            payment_method='stripe',
+            subtotal=100.00,
+            grand_total=100.00
+        )
+        self.payment = Payment.objects.get(order=order)
+        self.events = []
+
+        def receiver(sender, payment_ids, new_status, created, **kwargs):
+            self.events.append((new_status, list(payment_ids), created))
+        payment_status_changed.connect(receiver)
+        self.addCleanup(payment_status_changed.disconnect, receiver)
+
+    def test_save_without_status_change_emits_nothing(self):
+        self.payment.gateway_payment_id = 'gw_1'
+        with self.assertNumQueries(1):
+            self.payment.save()
+        self.assertEqual(self.events, [])
+
+    def test_transition_emits_one_event(self):
+        self.payment.mark_as_completed()
+        self.payment.save()
+        self.assertEqual(self.events, [('completed', [self.payment.pk], False)])
+        self.payment.order.refresh_from_db()
+        self.assertEqual(self.payment.order.payment_status, 'paid')
+
+    def test_refresh_from_db_resets_tracked_status(self):
+        Payment.objects.filter(pk=self.payment.pk).update(status='failed')
+        self.payment.refresh_from_db()
+        self.payment.save()
+        self.assertEqual(self.events, [])
+
+    def test_failed_payment_fans_out_after_commit(self):
+        mail.outbox = []
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payment.mark_as_failed()
+            self.payment.save()
+
+        # The payment email, and the in-app notification's own delivery
+        order_number = self.payment.order.order_number
+        self.assertEqual(sorted(message.subject for message in mail.outbox), [
+            f'Payment Failed - Order #{order_number}',
+            f'Payment Failed: Order {order_number}'])
+        self.assertEqual(Notification.objects.filter(
+            user=self.user, notification_type='payment').count(), 1)
+        self.assertEqual(AdminNotification.objects.filter(
+            notification_type='payment', related_object_id=self.payment.pk
+        ).count(), 1)
+
+
+class TimingOutSession:
+    def request(self, method, url, **kwargs):
+        raise requests.Timeout('Read timed out')
+
+
+class GatewayMetricsTests(TestCase):
+    def setUp(self):
+        gateway_metrics.reset()
+        self.addCleanup(gateway_metrics.reset)
+        self.gateway = FakeStatusGateway({'CBE0001': 'SUCCESS'})
+
+    def test_calls_are_timed_and_counted_by_outcome(self):
+        class TimingOutGateway(FakeStatusGateway):
+            def verify_payment(self, transaction_id):
+                try:
+                    return self.request('GET', f'/verify/{transaction_id}')
+                except Exception as e:
+                    return {'success': False, 'error': str(e)}
+
+        timing_out = TimingOutGateway({})
+        timing_out._session = TimingOutSession()
+
+        with self.assertLogs('payments.gateways.metrics', 'WARNING') as logs:
+            self.gateway.verify_payment('CBE0001')
+            self.gateway.verify_payment('CBE0001')
+            self.gateway.verify_payment('CBE0404')
+            timing_out.verify_payment('CBE0002')
+            with self.assertRaises(NotImplementedError):
+                self.gateway.process_refund(None, 1, '')
+        self.assertEqual(len(logs.records), 3)
+
+        rows = {
+            (row['gateway'], row['operation']): row
+            for row in gateway_metrics.summary()
+        }
+        verify = rows[('fakestatus', 'verify_payment')]
+        self.assertEqual(
+            (verify['calls'], verify['errors'], verify['timeouts']), (3, 1, 0))
+        self.assertEqual(rows[('timingout', 'verify_payment')]['timeouts'], 1)
+        self.assertEqual(rows[('timingout', 'verify_payment')]['error_rate'], 1)
+        self.assertIn(
+            'payment_gateway_requests_total{gateway="fakestatus",'
+            'operation="process_refund",outcome="error"} 1',
+            gateway_metrics.render())
+
+    def test_prometheus_endpoint(self):
+        self.gateway.verify_payment('CBE0001')
+        url = reverse('payments:gateway-metrics')
+
+        self.assertEqual(self.client.get(url).status_code, 403)
+        with override_settings(PAYMENT_METRICS_TOKEN='scrape'):
+            response = self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape')
+            self.assertEqual(
+                self.client.get(url, HTTP_AUTHORIZATION='Bearer nope').status_code,
+                403)
+
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn(
+            '# TYPE payment_gateway_request_duration_seconds histogram', body)
+        self.assertIn(
+            'payment_gateway_request_duration_seconds_bucket{gateway="fakestatus",'
+            'operation="verify_payment",le="+Inf"} 1', body)
+        self.assertIn(
+            'payment_gateway_requests_total{gateway="fakestatus",'
+            'operation="verify_payment",outcome="success"} 1', body)
+
+        staff = User.objects.create_user(
+            email='staff@example.com',
+            username='staff',
+            password='testpass',
+            is_staff=True
+        )
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        panel = self.client.get(reverse('admin_dashboard:api-payments-gateways'))
+        self.assertEqual(panel.json()['operations'][0]['calls'], 1)
+
+
+@override_settings(PAYMENT_GATEWAY_BREAKER={
+    'FAILURE_RATE': 0.5, 'MIN_CALLS': 4, 'SLOW_CALL_SECONDS': 5,
+    'WINDOW': 60, 'OPEN_SECONDS': 30})
+class CircuitBreakerTests(APITestCase):
+    def setUp(self):
+        self.gateway = FakeStatusGateway({'CBE0001': 'SUCCESS'})
+        self.breaker = gateway_registry.breaker('fakestatus')
+        self.breaker.reset()
+        self.addCleanup(self.breaker.reset)
+
+    def test_process_local_cache_is_flagged(self):
+        from .checks import check_shared_cache
+
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual(
+                [warning.id for warning in check_shared_cache(None)],
+                ['payments.W001'])
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'LOCATION': 'redis://localhost:6379'}}):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_failures_open_the_breaker_and_calls_fail_fast(self):
+        with self.assertLogs('payments.gateways', 'WARNING') as logs:
+            for transaction_id in ['CBE0001', 'CBE0404', 'CBE0001', 'CBE0404']:
+                self.gateway.verify_payment(transaction_id)
+        self.assertIn('fakestatus circuit opened for 30s', logs.output[-1])
+        self.assertEqual(self.breaker.state, 'open')
+
+        result = self.gateway.verify_payment('CBE0001')
+        self.assertTrue(result['unavailable'])
+        self.assertEqual(len(self.gateway.calls), 4)
+
+    def test_half_open_lets_one_probe_through(self):
+        with self.settings(PAYMENT_GATEWAY_BREAKER={
+                **settings.PAYMENT_GATEWAY_BREAKER, 'OPEN_SECONDS': 0}):
+            with self.assertLogs('payments.gateways', 'WARNING'):
+                for _ in range(4):
+                    self.breaker.record(failed=True)
+            self.assertEqual(self.breaker.state, 'half_open')
+            self.assertTrue(self.breaker.available())
+
+            self.assertTrue(self.breaker.allow())
+            self.assertFalse(self.breaker.allow())
+            self.breaker.record(failed=False)
+            self.assertEqual(self.breaker.state, 'closed')
+
+    def test_open_gateway_is_hidden_and_initiation_fails_fast(self):
+        breaker = gateway_registry.breaker('telebirr')
+        self.addCleanup(breaker.reset)
+        with self.assertLogs('payments.gateways', 'WARNING'):
+            for _ in range(4):
+                breaker.record(failed=True)
+
+        methods = {
+            method['code']: method['available']
+            for method in self.client.get(reverse('payments:payment-methods')).data
+        }
+        self.assertEqual(
+            methods, {'stripe': True, 'paypal': True, 'cbe': True, 'telebirr': False})
+
+        user = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass'
+        )
+        order = Order.objects.create(
+            user=user,
+            shipping_address={},
+            billing_address={},
+            payment_method='telebirr',
+            subtotal=100.00,
+            grand_total=100.00
+        )
+        self.client.force_authenticate(user=user)
+        response = self.client.post(
+            reverse('payments:telebirr-payment-initiate',
+                    kwargs={'order_id': order.id}),
+            {'phone_number': '+251911223344'})
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        # Only the payment created with the order
+        self.assertEqual(order.payments.count(), 1)
@@ -9,6 +9,10 @@ urlpatterns = [
     path('', views.PaymentListView.as_view(), name='payment-list'),
     path('<int:pk>/', views.PaymentDetailView.as_view(), name='payment-detail'),
 
+    # Methods the checkout page should offer
+    path('methods/', views.PaymentMethodListView.as_view(),
+         name='payment-methods'),
+
     # Order-specific payment creation
     path('order/<int:order_id>/create/',
          views.PaymentCreateView.as_view(), name='payment-create'),
@@ -38,6 +42,9 @@ urlpatterns = [
     path('webhooks/telebirr/', views.TeleBirrWebhookView.as_view(),
          name='telebirr-webhook'),
     path('webhooks/paypal/', views.paypal_webhook, name='paypal-webhook'),
+
+    # Gateway metrics (Prometheus scrape target)
+    path('metrics/', views.gateway_metrics_view, name='gateway-metrics'),
 ]
 
 # Admin router
@@ -7,7 +7,10 @@ from rest_framework.decorators import api_view, permission_classes
 from django.shortcuts import get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
+import hmac
 import json
+from django.conf import settings
+from django.http import HttpResponse
 from .models import Payment, Refund, PaymentGateway, PaymentManager
 from .serializers import (
     PaymentSerializer, PaymentCreateSerializer, RefundSerializer,
@@ -15,9 +18,37 @@ from .serializers import (
     CBETransactionSerializer, TeleBirrTransactionSerializer  # Added these
 )
 from orders.models import Order
+from .gateways import gateway_metrics, gateway_registry
+from .services import webhook_inbox
 # Remove this duplicate import: from payments.serializers import CBETransactionSerializer, TeleBirrTransactionSerializer
 
 
+def gateway_unavailable(payment_method):
+    """503 response when the method's circuit breaker is open, else None"""
+    if gateway_registry.available(payment_method):
+        return None
+    label = dict(Payment.PAYMENT_METHOD_CHOICES).get(payment_method, payment_method)
+    return Response(
+        {'error': f'{label} is temporarily unavailable, please choose '
+                  f'another payment method',
+         'payment_method': payment_method},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+
+class PaymentMethodListView(APIView):
+    """Payment methods the checkout page should offer right now"""
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        available = set(gateway_registry.available_methods())
+        return Response([
+            {'code': code, 'name': name, 'available': code in available}
+            for code, name in Payment.PAYMENT_METHOD_CHOICES
+            if code in gateway_registry.gateway_classes()
+        ])
+
+
 class PaymentCreateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -35,6 +66,9 @@ class PaymentCreateView(APIView):
 
         if serializer.is_valid():
             payment_method = serializer.validated_data['payment_method']
+            unavailable = gateway_unavailable(payment_method)
+            if unavailable:
+                return unavailable
 
             # Create payment
             payment = PaymentManager.create_payment(order, payment_method)
@@ -74,7 +108,8 @@ class PaymentDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Payment.objects.filter(user=self.request.user)
+        return Payment.objects.filter(
+            user=self.request.user).select_related('order', 'user')
 
 
 class PaymentListView(generics.ListAPIView):
@@ -82,7 +117,8 @@ class PaymentListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Payment.objects.filter(user=self.request.user).select_related('order')
+        return Payment.objects.filter(
+            user=self.request.user).select_related('order', 'user')
 
 
 class RefundCreateView(APIView):
@@ -190,70 +226,46 @@ class StripeWebhookView(APIView):
             # Invalid signature
             return HttpResponse(status=400)
 
-        # Handle the event
-        if event['type'] == 'payment_intent.succeeded':
-            payment_intent = event['data']['object']
-            self.handle_payment_succeeded(payment_intent)
-        elif event['type'] == 'payment_intent.payment_failed':
-            payment_intent = event['data']['object']
-            self.handle_payment_failed(payment_intent)
+        # Store the event and answer at once; the inbox applies it
+        data = json.loads(payload)
+        event_object = data.get('data', {}).get('object', {})
+        webhook_inbox.receive(
+            'stripe', event['id'], data,
+            event_type=event['type'],
+            reference=(event_object.get('metadata') or {}).get('order_number')
+            or event_object.get('id', '')
+        )
 
         return HttpResponse(status=200)
 
-    def handle_payment_succeeded(self, payment_intent):
-        """Handle successful payment from Stripe"""
-        try:
-            order_number = payment_intent['metadata'].get('order_number')
-            if order_number:
-                order = Order.objects.get(order_number=order_number)
-                payment = getattr(order, 'payment', None)
-                if payment:
-                    payment.mark_as_completed(
-                        gateway_payment_id=payment_intent['id'],
-                        response_data=payment_intent
-                    )
-        except Exception as e:
-            print(f"Error handling successful payment: {e}")
-
-    def handle_payment_failed(self, payment_intent):
-        """Handle failed payment from Stripe"""
-        try:
-            order_number = payment_intent['metadata'].get('order_number')
-            if order_number:
-                order = Order.objects.get(order_number=order_number)
-                payment = getattr(order, 'payment', None)
-                if payment:
-                    payment.mark_as_failed(response_data=payment_intent)
-        except Exception as e:
-            print(f"Error handling failed payment: {e}")
-
 
 @api_view(['POST'])
 @permission_classes([])
 @csrf_exempt
 def paypal_webhook(request):
     """Handle PayPal webhooks"""
-    # PayPal webhook implementation would go here
-    # This is a simplified version
+    # PayPal webhook verification would go here
     try:
         data = json.loads(request.body)
-        event_type = data.get('event_type')
-
-        # Handle different PayPal events
-        if event_type == 'PAYMENT.CAPTURE.COMPLETED':
-            # Handle completed payment
-            pass
-        elif event_type == 'PAYMENT.CAPTURE.DENIED':
-            # Handle denied payment
-            pass
-
-        return Response(status=200)
-    except Exception as e:
+    except ValueError as e:
         return Response(
             {'error': str(e)},
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    if not data.get('id'):
+        return Response(
+            {'error': 'Missing event id'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    webhook_inbox.receive(
+        'paypal', data['id'], data,
+        event_type=data.get('event_type', ''),
+        reference=(data.get('resource') or {}).get('id', '')
+    )
+    return Response(status=200)
+
 
 # ... previous views remain the same
 
@@ -271,6 +283,10 @@ class CBEPaymentInitiateView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        unavailable = gateway_unavailable('cbe')
+        if unavailable:
+            return unavailable
+
         # Create payment
         payment = PaymentManager.create_payment(order, 'cbe')
         phone_number = request.data.get('phone_number')
@@ -309,6 +325,10 @@ class TeleBirrPaymentInitiateView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        unavailable = gateway_unavailable('telebirr')
+        if unavailable:
+            return unavailable
+
         # Create payment
         payment = PaymentManager.create_payment(order, 'telebirr')
         phone_number = request.data.get('phone_number')
@@ -394,26 +414,7 @@ class CBEWebhookView(APIView):
     permission_classes = []  # No authentication for webhooks
 
     def post(self, request):
-        try:
-            callback_data = request.data
-
-            # Verify callback signature (in real implementation)
-            success, message = PaymentManager.handle_cbe_callback(
-                callback_data)
-
-            if success:
-                return Response({'status': 'success'}, status=status.HTTP_200_OK)
-            else:
-                return Response(
-                    {'status': 'error', 'message': message},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-        except Exception as e:
-            return Response(
-                {'status': 'error', 'message': str(e)},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        return receive_gateway_callback(request, 'cbe', 'status')
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -421,23 +422,55 @@ class TeleBirrWebhookView(APIView):
     permission_classes = []  # No authentication for webhooks
 
     def post(self, request):
-        try:
-            callback_data = request.data
-
-            # Verify callback signature (in real implementation)
-            success, message = PaymentManager.handle_telebirr_callback(
-                callback_data)
+        return receive_gateway_callback(request, 'telebirr', 'tradeStatus')
+
+
+def receive_gateway_callback(request, gateway, status_field):
+    """
+    Verify a CBE Birr / TeleBirr callback and store it in the webhook
+    inbox. A callback is identified by its transaction and reported
+    status, so a redelivered callback is stored only once.
+    """
+    payload = request.data.dict() if hasattr(request.data, 'dict') \
+        else dict(request.data)
+    result = PaymentManager.get_gateway(gateway).handle_webhook(payload)
+    if not result['success']:
+        return Response(
+            {'status': 'error', 'message': result['error']},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
-            if success:
-                return Response({'status': 'success'}, status=status.HTTP_200_OK)
-            else:
-                return Response(
-                    {'status': 'error', 'message': message},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+    transaction_id = result.get('transaction_id')
+    if not transaction_id:
+        return Response(
+            {'status': 'error', 'message': 'Missing transaction id'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
-        except Exception as e:
-            return Response(
-                {'status': 'error', 'message': str(e)},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+    event_status = payload.get(status_field) or ''
+    webhook_inbox.receive(
+        gateway,
+        payload.get('eventId') or f"{transaction_id}:{event_status}",
+        payload,
+        event_type=event_status,
+        reference=transaction_id
+    )
+    return Response({'status': 'success'}, status=status.HTTP_200_OK)
+
+
+def gateway_metrics_view(request):
+    """
+    Gateway latency and outcome metrics of this process in Prometheus text
+    format, for staff or a scraper sending the PAYMENT_METRICS_TOKEN bearer
+    token
+    """
+    token = settings.PAYMENT_METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if not authorized and token:
+        authorized = hmac.compare_digest(authorization, f"Bearer {token}")
+    if not authorized:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+
+    return HttpResponse(
+        gateway_metrics.render(), content_type='text/plain; version=0.0.4')
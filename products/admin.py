@@ -73,7 +73,7 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('price', 'compare_price', 'cost_per_item')
         }),
         ('Inventory', {
-            'fields': ('sku', 'barcode', 'track_quantity', 'quantity', 'low_stock_threshold')
+            'fields': ('sku', 'barcode', 'track_quantity', 'quantity', 'low_stock_threshold', 'weight')
         }),
         ('Status & SEO', {
             'fields': ('status', 'is_featured', 'is_digital', 'meta_title', 'meta_description')
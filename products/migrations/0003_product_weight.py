@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='weight',
+            field=models.DecimalField(decimal_places=3, default=0, help_text='Shipping weight of one unit', max_digits=8, verbose_name='weight (kg)'),
+        ),
+    ]
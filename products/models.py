@@ -128,6 +128,13 @@ class Product(models.Model):
     )
     is_featured = models.BooleanField(_('is featured'), default=False)
     is_digital = models.BooleanField(_('is digital product'), default=False)
+    weight = models.DecimalField(
+        _('weight (kg)'),
+        max_digits=8,
+        decimal_places=3,
+        default=0,
+        help_text=_('Shipping weight of one unit')
+    )
 
     # SEO
     meta_title = models.CharField(max_length=200, blank=True)
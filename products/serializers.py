@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from currencies.serializers import DisplayCurrencyField, DisplayMoneyField
 from .models import Category, Brand, Product, ProductImage, ProductVariant, ProductAttribute
 
 
@@ -59,12 +60,16 @@ class ProductListSerializer(serializers.ModelSerializer):
     brand = BrandSerializer(read_only=True)
     primary_image = serializers.SerializerMethodField()
     discount_percentage = serializers.ReadOnlyField()
+    display_price = DisplayMoneyField(source='price')
+    display_compare_price = DisplayMoneyField(source='compare_price')
+    display_currency = DisplayCurrencyField()
 
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'slug', 'short_description', 'category', 'brand',
-            'price', 'compare_price', 'discount_percentage', 'quantity',
+            'price', 'compare_price', 'discount_percentage', 'display_price',
+            'display_compare_price', 'display_currency', 'quantity',
             'is_in_stock', 'is_low_stock', 'primary_image', 'is_featured',
             'status', 'created_at'
         ]
@@ -88,7 +93,7 @@ class ProductDetailSerializer(ProductListSerializer):
         fields = ProductListSerializer.Meta.fields + [
             'description', 'images', 'variants', 'attributes', 'sku',
             'barcode', 'cost_per_item', 'low_stock_threshold', 'is_digital',
-            'meta_title', 'meta_description', 'published_at'
+            'weight', 'meta_title', 'meta_description', 'published_at'
         ]
 
 
@@ -99,7 +104,8 @@ class ProductCreateSerializer(serializers.ModelSerializer):
             'name', 'description', 'short_description', 'category', 'brand',
             'price', 'compare_price', 'cost_per_item', 'sku', 'barcode',
             'track_quantity', 'quantity', 'low_stock_threshold', 'status',
-            'is_featured', 'is_digital', 'meta_title', 'meta_description'
+            'is_featured', 'is_digital', 'weight', 'meta_title',
+            'meta_description'
         ]
 
     def create(self, validated_data):
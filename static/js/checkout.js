@@ -228,7 +228,7 @@ class CheckoutManager {
     async loadPaymentMethods() {
         const container = document.getElementById('payment-methods');
         container.innerHTML = `
-            <div class="border rounded-lg p-4 cursor-pointer payment-option" onclick="checkoutManager.selectPaymentMethod('stripe')">
+            <div class="border rounded-lg p-4 cursor-pointer payment-option" data-method="stripe" onclick="checkoutManager.selectPaymentMethod('stripe')">
                 <div class="flex items-center justify-between">
                     <div class="flex items-center">
                         <i class="fab fa-cc-stripe text-2xl text-blue-600 mr-3"></i>
@@ -241,7 +241,7 @@ class CheckoutManager {
                 </div>
             </div>
             
-            <div class="border rounded-lg p-4 cursor-pointer payment-option" onclick="checkoutManager.selectPaymentMethod('cbe')">
+            <div class="border rounded-lg p-4 cursor-pointer payment-option" data-method="cbe" onclick="checkoutManager.selectPaymentMethod('cbe')">
                 <div class="flex items-center justify-between">
                     <div class="flex items-center">
                         <i class="fas fa-university text-2xl text-green-600 mr-3"></i>
@@ -254,7 +254,7 @@ class CheckoutManager {
                 </div>
             </div>
             
-            <div class="border rounded-lg p-4 cursor-pointer payment-option" onclick="checkoutManager.selectPaymentMethod('telebirr')">
+            <div class="border rounded-lg p-4 cursor-pointer payment-option" data-method="telebirr" onclick="checkoutManager.selectPaymentMethod('telebirr')">
                 <div class="flex items-center justify-between">
                     <div class="flex items-center">
                         <i class="fas fa-mobile-alt text-2xl text-purple-600 mr-3"></i>
@@ -267,6 +267,27 @@ class CheckoutManager {
                 </div>
             </div>
         `;
+        await this.hideUnavailablePaymentMethods();
+    }
+
+    async hideUnavailablePaymentMethods() {
+        // Methods whose gateway is failing are skipped until it recovers;
+        // if the list cannot be loaded every method stays on offer
+        try {
+            const response = await fetch('/api/payments/methods/');
+            if (!response.ok) return;
+            const methods = await response.json();
+            methods.filter(method => !method.available).forEach(method => {
+                const option = document.querySelector(`.payment-option[data-method="${method.code}"]`);
+                if (option) option.classList.add('hidden');
+                if (this.paymentMethod === method.code) {
+                    this.paymentMethod = null;
+                    this.updatePlaceOrderButton();
+                }
+            });
+        } catch (error) {
+            console.error('Failed to load payment methods:', error);
+        }
     }
 
     selectPaymentMethod(method) {